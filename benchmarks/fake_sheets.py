@@ -0,0 +1,289 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import requests
+from gspread.cell import Cell
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import (
+    a1_range_to_grid_range,
+    get_a1_from_absolute_range,
+    rowcol_to_a1,
+)
+
+ANONCES_HEADERS = [
+    "Название блюда",
+    "Описание блюда",
+    "Текст сообщения",
+    "Цена",
+    "Время",
+    "Отправлено",
+]
+
+
+def _quota_error() -> APIError:
+    """Ошибка 429 в том виде, в каком ее возвращает gspread"""
+    response = requests.Response()
+    response.status_code = 429
+    response._content = json.dumps(
+        {
+            "error": {
+                "code": 429,
+                "message": "Quota exceeded for quota metric 'Read requests'",
+                "status": "RESOURCE_EXHAUSTED",
+            }
+        }
+    ).encode()
+    return APIError(response)
+
+
+class FakeSpreadsheet:
+    """Таблица в памяти с API, которым пользуется GoogleSheetsClient.
+
+    Каждый вызов засыпает на latency секунд (с разбросом jitter) и с
+    вероятностью error_rate завершается ошибкой 429. Все вызовы
+    подсчитываются в calls по ключу (лист, метод).
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sheets: Dict[str, FakeWorksheet] = {}
+        self._next_id = 1
+        self.add_worksheet("Users", 1000, 3, _record=False).rows.append(
+            ["user_id", "language", "status"]
+        )
+        self.add_worksheet("Anonces", 1000, 6, _record=False).rows.append(
+            list(ANONCES_HEADERS)
+        )
+        self.add_worksheet("Orders", 1000, 8, _record=False).rows.append(
+            [
+                "user_id",
+                "username",
+                "room",
+                "portions",
+                "date",
+                "dish_name",
+                "order_id",
+                "status",
+            ]
+        )
+
+    def call(self, sheet: str, method: str):
+        """Учесть вызов API: задержка и, возможно, ошибка квоты"""
+        with self._lock:
+            self.calls[(sheet, method)] += 1
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors[(sheet, method)] += 1
+            raise _quota_error()
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def add_announcement(self, dish_name: str, price: int, sent: bool = False) -> int:
+        """Добавить анонс без учета вызова и вернуть номер его строки"""
+        anonces = self._sheets["Anonces"]
+        anonces.rows.append(
+            [
+                dish_name,
+                f"Описание: {dish_name}",
+                "Успейте заказать!",
+                str(price),
+                "19:00",
+                "TRUE" if sent else "FALSE",
+            ]
+        )
+        return len(anonces.rows)
+
+    def worksheet(self, title: str) -> "FakeWorksheet":
+        self.call("meta", "worksheet")
+        worksheet = self._sheets.get(title)
+        if worksheet is None:
+            raise WorksheetNotFound(title)
+        return worksheet
+
+    def worksheets(self) -> List["FakeWorksheet"]:
+        self.call("meta", "worksheets")
+        return list(self._sheets.values())
+
+    def add_worksheet(
+        self, title: str, rows: int, cols: int, _record: bool = True, **kwargs
+    ) -> "FakeWorksheet":
+        if _record:
+            self.call("meta", "add_worksheet")
+        worksheet = FakeWorksheet(self, title, self._next_id)
+        self._next_id += 1
+        self._sheets[title] = worksheet
+        return worksheet
+
+    def batch_update(self, body: Dict[str, Any]):
+        self.call("meta", "batch_update")
+        with self._lock:
+            for request in body["requests"]:
+                grid = request["deleteDimension"]["range"]
+                worksheet = next(
+                    ws for ws in self._sheets.values() if ws.id == grid["sheetId"]
+                )
+                del worksheet.rows[grid["startIndex"] : grid["endIndex"]]
+
+
+class FakeWorksheet:
+    """Лист в памяти: строки хранятся списками строк, как их отдает API"""
+
+    def __init__(self, spreadsheet: FakeSpreadsheet, title: str, sheet_id: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.rows: List[List[str]] = []
+
+    @property
+    def row_count(self) -> int:
+        return max(len(self.rows), 1000)
+
+    def _call(self, method: str):
+        self.spreadsheet.call(self.title, method)
+
+    def _get(self, row: int, col: int) -> str:
+        if row - 1 < len(self.rows) and col - 1 < len(self.rows[row - 1]):
+            return self.rows[row - 1][col - 1]
+        return ""
+
+    def _set(self, row: int, col: int, value: Any):
+        while len(self.rows) < row:
+            self.rows.append([])
+        values = self.rows[row - 1]
+        while len(values) < col:
+            values.append("")
+        values[col - 1] = str(value)
+
+    @staticmethod
+    def _grid(a1: str):
+        grid = a1_range_to_grid_range(get_a1_from_absolute_range(a1))
+        return (
+            grid.get("startRowIndex", 0) + 1,
+            grid.get("startColumnIndex", 0) + 1,
+            grid.get("endRowIndex"),
+            grid.get("endColumnIndex"),
+        )
+
+    def _read(self, a1: str) -> List[List[str]]:
+        first_row, first_col, last_row, last_col = self._grid(a1)
+        last_row = last_row or len(self.rows)
+        result = []
+        for row in range(first_row, last_row + 1):
+            values = self.rows[row - 1] if row - 1 < len(self.rows) else []
+            values = (
+                values[first_col - 1 : last_col]
+                if last_col
+                else values[first_col - 1 :]
+            )
+            result.append(list(values))
+        while result and not result[-1]:
+            result.pop()
+        return result
+
+    def _write(self, a1: str, values: List[List[Any]]):
+        first_row, first_col, _, _ = self._grid(a1)
+        for row_offset, row in enumerate(values):
+            for col_offset, value in enumerate(row):
+                self._set(first_row + row_offset, first_col + col_offset, value)
+
+    def _append(self, values: List[List[Any]]) -> Dict[str, Any]:
+        with self.spreadsheet._lock:
+            start = len(self.rows) + 1
+            for row in values:
+                self.rows.append([str(value) for value in row])
+            end = len(self.rows)
+        last = rowcol_to_a1(end, max(len(row) for row in values))
+        return {"updates": {"updatedRange": f"'{self.title}'!A{start}:{last}"}}
+
+    def row_values(self, row: int, **kwargs) -> List[str]:
+        self._call("row_values")
+        return list(self.rows[row - 1]) if row - 1 < len(self.rows) else []
+
+    def col_values(self, col: int, **kwargs) -> List[str]:
+        self._call("col_values")
+        return [self._get(row, col) for row in range(1, len(self.rows) + 1)]
+
+    def get_all_values(self, **kwargs) -> List[List[str]]:
+        self._call("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self, **kwargs) -> List[Dict[str, str]]:
+        self._call("get_all_records")
+        headers = self.rows[0]
+        return [
+            dict(zip(headers, row + [""] * (len(headers) - len(row))))
+            for row in self.rows[1:]
+        ]
+
+    def find(self, query: str, **kwargs) -> Optional[Cell]:
+        self._call("find")
+        for row_index, row in enumerate(self.rows, start=1):
+            for col_index, value in enumerate(row, start=1):
+                if value == query:
+                    return Cell(row_index, col_index, value)
+        return None
+
+    def cell(self, row: int, col: int, **kwargs) -> Cell:
+        self._call("cell")
+        return Cell(row, col, self._get(row, col))
+
+    def get(self, range_name: str, **kwargs) -> List[List[str]]:
+        self._call("get")
+        return self._read(range_name)
+
+    def batch_get(self, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+        self._call("batch_get")
+        return [self._read(a1) for a1 in ranges]
+
+    def update_cell(self, row: int, col: int, value: Any):
+        self._call("update_cell")
+        self._set(row, col, value)
+
+    def update(self, range_name=None, values=None, **kwargs):
+        self._call("update")
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        self._write(range_name, values)
+
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs):
+        self._call("batch_update")
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def append_row(self, values: List[Any], **kwargs) -> Dict[str, Any]:
+        self._call("append_row")
+        return self._append([values])
+
+    def append_rows(self, values: List[List[Any]], **kwargs) -> Dict[str, Any]:
+        self._call("append_rows")
+        return self._append(values)
+
+    def delete_rows(self, start: int, end: Optional[int] = None):
+        self._call("delete_rows")
+        with self.spreadsheet._lock:
+            del self.rows[start - 1 : end or start]
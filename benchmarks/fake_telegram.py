@@ -0,0 +1,70 @@
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия Bot API без сети: запросы считаются и отвечают успехом.
+
+    Методы, возвращающие сообщение, получают сообщение с новым message_id
+    в том же чате, остальные - True. latency имитирует время ответа API.
+    Скачиваемые файлы (чеки) состоят из file_size нулевых байт.
+    """
+
+    def __init__(self, latency: float = 0.0, file_size: int = 64 * 1024, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.file_size = file_size
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1_000_000)
+
+    async def close(self):
+        pass
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None,
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is not Message:
+            return True
+        chat_id = getattr(method, "chat_id", None) or 0
+        return Message.model_validate(
+            {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": getattr(method, "text", None),
+            },
+            context={"bot": bot},
+        )
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Dict[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        """Скачивание файла: отдает file_size нулевых байт кусками chunk_size"""
+        self.calls["stream_content"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        left = self.file_size
+        while left > 0:
+            chunk = min(chunk_size, left)
+            left -= chunk
+            yield b"\0" * chunk
@@ -0,0 +1,351 @@
+"""Нагрузочный сценарий "час пик": N жителей одновременно оформляют заказ.
+
+Каждый житель проходит /start -> "Забронировать" -> порции -> блок -> чек
+через настоящие роутеры и middleware бота. Google Sheets заменяется
+таблицей в памяти (benchmarks.fake_sheets), Bot API - сессией без сети
+(benchmarks.fake_telegram).
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.load_test --users 200 --sheets-latency 0.15
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from benchmarks.fake_sheets import FakeSpreadsheet
+from benchmarks.fake_telegram import FakeTelegramSession
+from callbacks.reserve import ReserveCallback
+from config.settings import Config, DbConfig, TgBot
+from keyboards.inline import get_reserve_keyboard
+from middlewares import (
+    DependencyMiddleware,
+    I18nMiddleware,
+    InstrumentationMiddleware,
+    ThrottlingMiddleware,
+)
+from routers import callbacks, commands
+from services.api_client import PENDING_STATUS, GoogleSheetsClient, QuotaGovernor
+from services.async_client import AsyncSheetsClient
+from services.broadcast import BroadcastEngine
+from services.delivery_ledger import DeliveryLedger
+from services.order_store import OrderStore
+from services.storage import SheetsRepository, SqliteFSMStorage, SqliteRepository
+from services.user_registry import UserRegistry
+from utils.logger import setup_logging
+from utils.metrics import REGISTRY
+from services.write_buffer import WriteBuffer
+
+ADMIN_ID = 1
+BOT_ID = 42
+FIRST_RESIDENT_ID = 100_000
+STEPS = ["start", "reserve", "portions", "room", "receipt"]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Scenario:
+    """Бот целиком на заглушках и генератор апдейтов от жителей"""
+
+    def __init__(self, args: argparse.Namespace, workdir: str):
+        self.args = args
+        self.spreadsheet = FakeSpreadsheet(
+            latency=args.sheets_latency,
+            jitter=args.sheets_jitter,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )
+        for index in range(args.existing_users):
+            self.spreadsheet._sheets["Users"].rows.append(
+                [str(10 + index), "ru", "active"]
+            )
+        self.announcement_id = self.spreadsheet.add_announcement("Плов", 250)
+
+        self.session = FakeTelegramSession(latency=args.telegram_latency)
+        self.bot = Bot(token=f"{BOT_ID}:FAKE-TOKEN", session=self.session)
+        self.config = Config(
+            tg_bot=TgBot(token=self.bot.token, admin_ids=[ADMIN_ID]),
+            db=DbConfig(
+                creds_file="",
+                backend=args.backend,
+                sqlite_path=os.path.join(workdir, "gourmet.db"),
+                journal_file=os.path.join(workdir, "writes.journal"),
+                delivery_ledger=os.path.join(workdir, "delivery.json"),
+                fsm_path=os.path.join(workdir, "fsm.db"),
+            ),
+        )
+        self.storage = SqliteFSMStorage(self.config.db.fsm_path)
+        self.dp = Dispatcher(storage=self.storage)
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.errors: Counter = Counter()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    async def start(self):
+        db = self.config.db
+        self.sheets = AsyncSheetsClient(
+            GoogleSheetsClient(db.creds_file, spreadsheet=self.spreadsheet),
+            max_workers=db.workers,
+            per_sheet_limit=db.sheet_concurrency,
+            timeout=db.timeout,
+            governor=(
+                QuotaGovernor(
+                    read_per_minute=self.args.quota, write_per_minute=self.args.quota
+                )
+                if self.args.quota
+                else None
+            ),
+        )
+        registry = UserRegistry(self.sheets, refresh_interval=db.users_refresh)
+        writes = WriteBuffer(
+            self.sheets,
+            db.journal_file,
+            flush_interval=db.flush_interval,
+            max_ops=db.flush_max_ops,
+        )
+        orders = OrderStore(self.sheets, writes)
+        self.repo = SheetsRepository(self.sheets, registry, orders, writes)
+        if db.backend == "sqlite":
+            self.repo = SqliteRepository(db.sqlite_path, mirror=self.repo)
+        await self.repo.start()
+        ledger = DeliveryLedger(db.delivery_ledger, self.repo)
+        broadcaster = BroadcastEngine(self.bot, ledger=ledger)
+
+        self.dp.include_router(commands.router)
+        self.dp.include_router(callbacks.router)
+        throttling = ThrottlingMiddleware(
+            exempt=self.config.tg_bot.admin_ids, language=self.repo.get_language
+        )
+        self.dp.message.outer_middleware(throttling)
+        self.dp.callback_query.outer_middleware(throttling)
+        instrumentation = InstrumentationMiddleware()
+        self.dp.message.middleware(instrumentation)
+        self.dp.callback_query.middleware(instrumentation)
+        services = dict(repo=self.repo, broadcaster=broadcaster, ledger=ledger)
+        self.dp.message.middleware(
+            DependencyMiddleware(self.config, self.sheets, **services)
+        )
+        self.dp.callback_query.middleware(
+            DependencyMiddleware(self.config, self.sheets, **services)
+        )
+        self.dp.message.middleware(I18nMiddleware())
+        self.dp.callback_query.middleware(I18nMiddleware())
+
+    async def stop(self):
+        await self.repo.stop()
+        await self.sheets.close()
+        await self.storage.close()
+        await self.bot.session.close()
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": "Resident",
+            "username": f"resident{user_id}",
+        }
+
+    def _message(self, user_id: int, **fields: Any) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            **fields,
+        }
+
+    def _update(self, **fields: Any) -> Update:
+        return Update.model_validate(
+            {"update_id": next(self._update_ids), **fields},
+            context={"bot": self.bot},
+        )
+
+    def resident_updates(self, user_id: int) -> List[Update]:
+        """Апдейты одного жителя по шагам сценария"""
+        keyboard = get_reserve_keyboard(announcement_id=self.announcement_id)
+        announcement = self._message(
+            user_id,
+            text="🍽 Плов",
+            reply_markup=keyboard.model_dump(exclude_none=True),
+        )
+        announcement["from"] = {"id": BOT_ID, "is_bot": True, "first_name": "Bot"}
+        photo = {"file_id": f"receipt-{user_id}", "file_unique_id": f"u{user_id}"}
+        return [
+            self._update(message=self._message(user_id, text="/start")),
+            self._update(
+                callback_query={
+                    "id": str(user_id),
+                    "from": self._user(user_id),
+                    "chat_instance": str(user_id),
+                    "message": announcement,
+                    "data": ReserveCallback(
+                        announcement_id=self.announcement_id
+                    ).pack(),
+                }
+            ),
+            self._update(message=self._message(user_id, text="2")),
+            self._update(message=self._message(user_id, text="804a")),
+            self._update(
+                message=self._message(
+                    user_id, photo=[dict(photo, width=800, height=600)]
+                )
+            ),
+        ]
+
+    async def resident(self, user_id: int, delay: float):
+        await asyncio.sleep(delay)
+        for step, update in zip(STEPS, self.resident_updates(user_id)):
+            started = time.perf_counter()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.errors[f"{step}: {type(e).__name__}"] += 1
+            self.latencies[step].append(time.perf_counter() - started)
+            if self.args.think:
+                await asyncio.sleep(self.args.think)
+
+
+def report(scenario: Scenario, elapsed: float, drained: float):
+    args = scenario.args
+    print(
+        f"\nResidents: {args.users}, backend: {args.backend}, "
+        f"sheets latency: {args.sheets_latency * 1000:.0f} ms, "
+        f"429 rate: {args.error_rate:.0%}"
+    )
+    print(f"\n{'step':<10}{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}{'max, ms':>10}")
+    all_latencies = []
+    for step in STEPS:
+        values = scenario.latencies[step]
+        all_latencies.extend(values)
+        print(
+            f"{step:<10}"
+            + "".join(
+                f"{percentile(values, q) * 1000:>10.1f}" for q in (50, 95, 99, 100)
+            )
+        )
+    print(
+        f"{'all':<10}"
+        + "".join(
+            f"{percentile(all_latencies, q) * 1000:>10.1f}" for q in (50, 95, 99, 100)
+        )
+    )
+
+    updates = len(all_latencies)
+    print(
+        f"\nThroughput: {updates / elapsed:.1f} updates/s, "
+        f"{args.users / elapsed:.1f} flows/s ({elapsed:.2f} s)"
+    )
+    print(f"Write-behind drain on shutdown: {drained:.2f} s")
+
+    calls = scenario.spreadsheet.calls
+    total = sum(calls.values())
+    print(f"\nSheets calls: {total} total, {total / args.users:.2f} per flow")
+    for (sheet, method), count in sorted(calls.items()):
+        errors = scenario.spreadsheet.errors.get((sheet, method), 0)
+        suffix = f" ({errors} x 429)" if errors else ""
+        print(f"  {sheet + '.' + method:<28}{count:>7}{suffix}")
+
+    print("\nBot API calls:")
+    for method, count in sorted(scenario.session.calls.items()):
+        print(f"  {method:<28}{count:>7}")
+
+    orders = [
+        row
+        for row in scenario.spreadsheet._sheets["Orders"].rows[1:]
+        if row[-1] == PENDING_STATUS
+    ]
+    print(f"\nOrders written to Sheets: {len(orders)} of {args.users}")
+    if scenario.errors:
+        print("Handler errors:")
+        for error, count in scenario.errors.most_common():
+            print(f"  {error}: {count}")
+
+
+async def run(args: argparse.Namespace):
+    with tempfile.TemporaryDirectory() as workdir:
+        scenario = Scenario(args, workdir)
+        await scenario.start()
+        # Прогрев в замеры не входит: реестр пользователей и чтение
+        # анонсов, которое делает /send_menu перед рассылкой
+        await scenario.repo.list_user_ids()
+        await scenario.repo.get_unsent_announcements()
+        scenario.spreadsheet.reset_counters()
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                scenario.resident(
+                    FIRST_RESIDENT_ID + index, args.ramp * index / args.users
+                )
+                for index in range(args.users)
+            )
+        )
+        elapsed = time.perf_counter() - started
+
+        stop_started = time.perf_counter()
+        await scenario.stop()
+        drained = time.perf_counter() - stop_started
+        report(scenario, elapsed, drained)
+        if args.metrics:
+            print("\n" + REGISTRY.render())
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100, help="жителей в пике")
+    parser.add_argument(
+        "--existing-users", type=int, default=500, help="строк в листе Users"
+    )
+    parser.add_argument("--backend", choices=["sheets", "sqlite"], default="sheets")
+    parser.add_argument(
+        "--sheets-latency", type=float, default=0.1, help="задержка вызова, с"
+    )
+    parser.add_argument(
+        "--sheets-jitter", type=float, default=0.05, help="случайная добавка, с"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="доля вызовов с ошибкой 429"
+    )
+    parser.add_argument(
+        "--quota",
+        type=float,
+        default=0.0,
+        help="квота чтений и записей в минуту с повтором 429 (0 - без лимита)",
+    )
+    parser.add_argument(
+        "--telegram-latency", type=float, default=0.03, help="задержка Bot API, с"
+    )
+    parser.add_argument(
+        "--ramp", type=float, default=0.0, help="растянуть старт жителей на N секунд"
+    )
+    parser.add_argument(
+        "--think", type=float, default=0.0, help="пауза жителя между шагами, с"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="не скрывать логи бота")
+    parser.add_argument(
+        "--metrics", action="store_true", help="вывести метрики в формате Prometheus"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging("INFO" if args.verbose else "ERROR")
+    asyncio.run(run(args))
@@ -1,43 +1,236 @@
+import time
+
+# Отсчет времени запуска ведется до импортов: aiogram грузится заметное время
+STARTED_AT = time.monotonic()
+
 import asyncio
 import logging
+from typing import Any, List, Optional
+
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 
-from config.settings import load_config
+from config.settings import Config, load_config
 from routers import commands, callbacks
-from middlewares import DependencyMiddleware
-from services.api_client import GoogleSheetsClient
+from middlewares import (
+    DependencyMiddleware,
+    I18nMiddleware,
+    FirstUpdateMiddleware,
+    InstrumentationMiddleware,
+    ThrottlingMiddleware,
+)
+from middlewares.instrumentation import STARTUP_SECONDS
+from services.api_client import GoogleSheetsClient, QuotaGovernor
+from services.async_client import AsyncSheetsClient
+from services.user_registry import UserRegistry
+from services.order_store import OrderStore
+from services.write_buffer import WriteBuffer
+from services.broadcast import BroadcastEngine
+from services.delivery_ledger import DeliveryLedger
+from services.announcement_cache import AnnouncementCache
+from services.capacity import PortionCapacity
+from services.webhook import run_webhook
+from services.cluster import (
+    ClusterBroadcaster,
+    ClusterCapacity,
+    Front,
+    HashRing,
+    WorkerContext,
+    partition_config,
+    serve_inbox,
+)
+from services.storage import SheetsRepository, SqliteFSMStorage, SqliteRepository
+from utils.logger import setup_logging
+from utils.metrics import start_metrics_server
 
+logger = logging.getLogger(__name__)
 
-async def main():
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    )
 
+async def main():
     config = load_config()
+    setup_logging(config.monitoring.log_level, config.monitoring.log_format)
+    if config.cluster.workers > 1:
+        if config.db.backend == "sqlite":
+            # У каждого воркера была бы своя база: /send_menu и /summary
+            # не видели бы пользователей и заказы других воркеров
+            raise ValueError("STORAGE_BACKEND=sqlite does not support BOT_WORKERS > 1")
+        if config.db.archive_interval > 0:
+            logger.warning(
+                "Orders archiving is disabled with several workers",
+                extra={"workers": config.cluster.workers},
+            )
+        # Фронт только принимает апдейты, роутеры работают в воркерах
+        probe = Dispatcher()
+        probe.include_routers(commands.router, callbacks.router)
+        front = Front(config, run_worker)
+        await front.run(allowed_updates=probe.resolve_used_update_types())
+        return
+    await serve(config)
+
+
+def run_worker(config: Config, index: int, inboxes: List[Any]):
+    """Точка входа процесса-воркера"""
+    setup_logging(config.monitoring.log_level, config.monitoring.log_format)
+    worker = WorkerContext(index=index, inboxes=inboxes, ring=HashRing(len(inboxes)))
+    logger.info("Worker starting", extra={"worker": index})
+    try:
+        asyncio.run(serve(partition_config(config, index), worker))
+    except KeyboardInterrupt:
+        pass
+
+
+async def warm_up(sheets: AsyncSheetsClient, orders: OrderStore):
+    """Подключиться к таблице, пока бот уже принимает апдейты"""
+    try:
+        await sheets.connect()
+        await orders.ensure_loaded()
+    except Exception as e:
+        # Первый запрос к таблице попробует подключиться снова
+        logger.warning("Google Sheets warm-up failed: %s", e)
+        return
+    elapsed = time.monotonic() - STARTED_AT
+    STARTUP_SECONDS.set(elapsed, "sheets_ready")
+    logger.info("Google Sheets ready", extra={"seconds": round(elapsed, 3)})
+
+
+async def serve(config: Config, worker: Optional[WorkerContext] = None):
+    """Собрать бота и обрабатывать апдейты до остановки"""
     bot = Bot(
         token=config.tg_bot.token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    storage = MemoryStorage()
+    # Состояния FSM хранятся на диске и переживают перезапуск
+    storage = SqliteFSMStorage(config.db.fsm_path, ttl=config.db.fsm_ttl)
+    storage.start()
     dp = Dispatcher(storage=storage)
 
     # Инициализация Google Sheets клиента
-    sheets = GoogleSheetsClient(config.db.creds_file)
+    # Клиент создается без обращения к сети, подключение - в фоне
+    sheets = AsyncSheetsClient(
+        GoogleSheetsClient(
+            config.db.creds_file,
+            spreadsheet_key=config.db.spreadsheet_key,
+            spreadsheet_title=config.db.spreadsheet_title,
+        ),
+        max_workers=config.db.workers,
+        per_sheet_limit=config.db.sheet_concurrency,
+        timeout=config.db.timeout,
+        governor=QuotaGovernor(
+            read_per_minute=config.db.read_quota,
+            write_per_minute=config.db.write_quota,
+            max_retries=config.db.max_retries,
+        ),
+    )
+    registry = UserRegistry(sheets, refresh_interval=config.db.users_refresh)
+    writes = WriteBuffer(
+        sheets,
+        config.db.journal_file,
+        flush_interval=config.db.flush_interval,
+        max_ops=config.db.flush_max_ops,
+    )
+    orders = OrderStore(sheets, writes)
+    announcements = AnnouncementCache(sheets, ttl=config.db.announcement_ttl)
+    capacity = PortionCapacity(
+        hold_ttl=config.db.checkout_hold_ttl,
+        shard=config.db.capacity_shard,
+        shards=config.db.capacity_shards,
+        state_path=config.db.capacity_state,
+        check_interval=config.db.capacity_check_interval,
+    )
+    if config.db.backend == "sqlite":
+        # Локальная база на горячем пути, таблица обновляется в фоне
+        repo = SqliteRepository(
+            config.db.sqlite_path,
+            mirror=SheetsRepository(sheets, registry, orders, writes, announcements),
+            capacity=capacity,
+        )
+    else:
+        repo = SheetsRepository(
+            sheets, registry, orders, writes, announcements, capacity=capacity
+        )
+    warming = asyncio.create_task(warm_up(sheets, orders))
+    await repo.start()
+    orders.start_archiving(config.db.archive_after_days, config.db.archive_interval)
+    repo.manifest.start_reconciling(config.db.summary_interval)
+    ledger = DeliveryLedger(config.db.delivery_ledger, repo)
+    ledger.load()
+    broadcaster = BroadcastEngine(
+        bot,
+        rate_limit=config.tg_bot.broadcast_rate,
+        per_chat_interval=config.tg_bot.per_chat_interval,
+        workers=config.tg_bot.broadcast_workers,
+        ledger=ledger,
+    )
+    if worker is not None:
+        # Каждый воркер рассылает своим чатам
+        broadcaster = ClusterBroadcaster(broadcaster, worker)
+        # Порции занимаются у других воркеров, отмены уходят владельцу заказа
+        cluster_capacity = ClusterCapacity(capacity, worker)
 
     # Регистрация роутеров
     dp.include_router(commands.router)
     dp.include_router(callbacks.router)
 
-    # Регистрация middleware
-    dp.message.middleware(DependencyMiddleware(config, sheets))
-    dp.callback_query.middleware(DependencyMiddleware(config, sheets))
+    # Регистрация middleware: ограничение частоты - до фильтров и хендлеров
+    throttling = ThrottlingMiddleware(
+        rate=config.tg_bot.throttle_rate,
+        burst=config.tg_bot.throttle_burst,
+        exempt=config.tg_bot.admin_ids,
+        language=repo.get_language,
+    )
+    dp.update.outer_middleware(FirstUpdateMiddleware(STARTED_AT))
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    instrumentation = InstrumentationMiddleware()
+    dp.message.middleware(instrumentation)
+    dp.callback_query.middleware(instrumentation)
+    services = dict(repo=repo, broadcaster=broadcaster, ledger=ledger)
+    dp.message.middleware(DependencyMiddleware(config, sheets, **services))
+    dp.callback_query.middleware(DependencyMiddleware(config, sheets, **services))
+    # Язык пользователя - после зависимостей, ему нужен repo
+    dp.message.middleware(I18nMiddleware())
+    dp.callback_query.middleware(I18nMiddleware())
+
+    metrics = None
+    if config.monitoring.metrics_port:
+        metrics = await start_metrics_server(
+            config.monitoring.metrics_host, config.monitoring.metrics_port
+        )
+        logger.info(
+            "Serving metrics",
+            extra={"port": config.monitoring.metrics_port},
+        )
 
     # Запуск бота
-    await dp.start_polling(bot)
+    elapsed = time.monotonic() - STARTED_AT
+    STARTUP_SECONDS.set(elapsed, "ready")
+    logger.info("Bot ready", extra={"seconds": round(elapsed, 3)})
+    try:
+        if worker is not None:
+            await serve_inbox(
+                dp,
+                bot,
+                worker.inboxes[worker.index],
+                broadcaster,
+                cluster_capacity,
+            )
+        elif config.webhook.mode == "webhook":
+            await run_webhook(dp, bot, config.webhook)
+        else:
+            # Пока зарегистрирован вебхук, getUpdates не работает
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        warming.cancel()
+        await broadcaster.stop()
+        ledger.save()
+        await repo.stop()
+        await storage.close()
+        await sheets.close()
+        await bot.session.close()
+        if metrics is not None:
+            await metrics.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,8 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class BulkOrdersCallback(CallbackData, prefix="bulk"):
+    # confirm или reject
+    action: str
+    # Какой список /confirm_all показан: кнопки старых списков не срабатывают
+    token: str
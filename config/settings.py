@@ -1,22 +1,92 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from environs import Env
 
 
 @dataclass
 class DbConfig:
     creds_file: str
+    # Ключ таблицы из URL; пустой - поиск таблицы по названию через Drive
+    spreadsheet_key: str = ""
+    spreadsheet_title: str = "Gourmet"
+    backend: str = "sheets"
+    sqlite_path: str = "data/gourmet.db"
+    fsm_path: str = "data/fsm.db"
+    fsm_ttl: float = 21600.0
+    announcement_ttl: float = 300.0
+    workers: int = 4
+    sheet_concurrency: int = 2
+    timeout: float = 15.0
+    # Квоты Google Sheets API на запросы в минуту
+    read_quota: float = 60.0
+    write_quota: float = 60.0
+    max_retries: int = 5
+    users_refresh: float = 300.0
+    journal_file: str = "data/writes.journal"
+    flush_interval: float = 0.3
+    flush_max_ops: int = 50
+    delivery_ledger: str = "data/delivery.json"
+    archive_after_days: int = 14
+    archive_interval: float = 86400.0
+    # Сверка сводки /summary с хранилищем, в секундах
+    summary_interval: float = 300.0
+    # Сколько порции удерживаются за жителем, пока он оформляет заказ
+    checkout_hold_ttl: float = 900.0
+    # Доля лимита порций этого процесса: номер воркера и число воркеров
+    capacity_shard: int = 0
+    capacity_shards: int = 1
+    # Списанные порции и заказы этого процесса между перезапусками
+    capacity_state: str = "data/capacity.json"
+    # Сверка списанных порций с хранилищем, в секундах (0 - только при запуске)
+    capacity_check_interval: float = 1800.0
 
 
 @dataclass
 class TgBot:
     token: str
     admin_ids: list[int]
+    broadcast_rate: float = 30.0
+    per_chat_interval: float = 1.0
+    broadcast_workers: int = 10
+    broadcast_digest: bool = True
+    throttle_rate: float = 1.0
+    throttle_burst: int = 5
+
+
+@dataclass
+class WebhookConfig:
+    # polling или webhook
+    mode: str = "polling"
+    # Публичный адрес за reverse proxy; пустой - вебхук не регистрируется
+    url: str = ""
+    path: str = "/webhook"
+    secret: str = ""
+    host: str = "0.0.0.0"
+    port: int = 8080
+
+
+@dataclass
+class ClusterConfig:
+    # Больше одного - фронт-процесс и воркеры с привязкой чатов
+    workers: int = 1
+
+
+@dataclass
+class MonitoringConfig:
+    # text или json
+    log_format: str = "text"
+    log_level: str = "INFO"
+    # 0 - эндпоинт /metrics не запускается
+    metrics_port: int = 0
+    metrics_host: str = "127.0.0.1"
 
 
 @dataclass
 class Config:
     tg_bot: TgBot
     db: DbConfig
+    webhook: WebhookConfig = field(default_factory=WebhookConfig)
+    cluster: ClusterConfig = field(default_factory=ClusterConfig)
+    monitoring: MonitoringConfig = field(default_factory=MonitoringConfig)
 
 
 def load_config(path: str = None) -> Config:
@@ -25,7 +95,55 @@ def load_config(path: str = None) -> Config:
 
     return Config(
         tg_bot=TgBot(
-            token=env.str("BOT_TOKEN"), admin_ids=list(map(int, env.list("ADMINS")))
+            token=env.str("BOT_TOKEN"),
+            admin_ids=list(map(int, env.list("ADMINS"))),
+            broadcast_rate=env.float("BROADCAST_RATE", 30.0),
+            per_chat_interval=env.float("BROADCAST_PER_CHAT_INTERVAL", 1.0),
+            broadcast_workers=env.int("BROADCAST_WORKERS", 10),
+            broadcast_digest=env.bool("BROADCAST_DIGEST", True),
+            throttle_rate=env.float("THROTTLE_RATE", 1.0),
+            throttle_burst=env.int("THROTTLE_BURST", 5),
+        ),
+        db=DbConfig(
+            creds_file=env.str("CREDS_FILE", "creds.json"),
+            spreadsheet_key=env.str("SPREADSHEET_KEY", ""),
+            spreadsheet_title=env.str("SPREADSHEET_TITLE", "Gourmet"),
+            backend=env.str("STORAGE_BACKEND", "sheets"),
+            sqlite_path=env.str("SQLITE_PATH", "data/gourmet.db"),
+            fsm_path=env.str("FSM_STORAGE", "data/fsm.db"),
+            fsm_ttl=env.float("FSM_TTL", 21600.0),
+            announcement_ttl=env.float("ANNOUNCEMENT_CACHE_TTL", 300.0),
+            workers=env.int("SHEETS_WORKERS", 4),
+            sheet_concurrency=env.int("SHEETS_CONCURRENCY", 2),
+            timeout=env.float("SHEETS_TIMEOUT", 15.0),
+            read_quota=env.float("SHEETS_READ_QUOTA", 60.0),
+            write_quota=env.float("SHEETS_WRITE_QUOTA", 60.0),
+            max_retries=env.int("SHEETS_MAX_RETRIES", 5),
+            users_refresh=env.float("USERS_REFRESH_INTERVAL", 300.0),
+            journal_file=env.str("WRITE_JOURNAL", "data/writes.journal"),
+            flush_interval=env.float("WRITE_FLUSH_INTERVAL", 0.3),
+            flush_max_ops=env.int("WRITE_FLUSH_MAX_OPS", 50),
+            delivery_ledger=env.str("DELIVERY_LEDGER", "data/delivery.json"),
+            archive_after_days=env.int("ORDERS_ARCHIVE_AFTER_DAYS", 14),
+            archive_interval=env.float("ORDERS_ARCHIVE_INTERVAL", 86400.0),
+            summary_interval=env.float("SUMMARY_RECONCILE_INTERVAL", 300.0),
+            checkout_hold_ttl=env.float("CHECKOUT_HOLD_TTL", 900.0),
+            capacity_state=env.str("CAPACITY_STATE", "data/capacity.json"),
+            capacity_check_interval=env.float("CAPACITY_CHECK_INTERVAL", 1800.0),
+        ),
+        webhook=WebhookConfig(
+            mode=env.str("BOT_MODE", "polling"),
+            url=env.str("WEBHOOK_URL", ""),
+            path=env.str("WEBHOOK_PATH", "/webhook"),
+            secret=env.str("WEBHOOK_SECRET", ""),
+            host=env.str("WEBHOOK_HOST", "0.0.0.0"),
+            port=env.int("WEBHOOK_PORT", 8080),
+        ),
+        cluster=ClusterConfig(workers=env.int("BOT_WORKERS", 1)),
+        monitoring=MonitoringConfig(
+            log_format=env.str("LOG_FORMAT", "text"),
+            log_level=env.str("LOG_LEVEL", "INFO"),
+            metrics_port=env.int("METRICS_PORT", 0),
+            metrics_host=env.str("METRICS_HOST", "127.0.0.1"),
         ),
-        db=DbConfig(creds_file=env.str("CREDS_FILE", "creds.json")),
     )
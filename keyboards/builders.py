@@ -0,0 +1,100 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from callbacks.reserve import ReserveCallback
+from keyboards.inline import get_reserve_keyboard
+from utils.formatters import CATALOG, DEFAULT_LANGUAGE
+
+# (announcement_id, название блюда) для кнопок дайджеста
+Dishes = Tuple[Tuple[int, str], ...]
+
+
+def _dishes(announcements: List[Dict[str, Any]]) -> Dishes:
+    return tuple(
+        (int(announcement["row_index"]), str(announcement["Название блюда"]))
+        for announcement in announcements
+    )
+
+
+def _digest_keyboard(dishes: Dishes, language: str) -> InlineKeyboardMarkup:
+    i18n = CATALOG.get(language)
+    builder = InlineKeyboardBuilder()
+    for announcement_id, dish_name in dishes:
+        builder.button(
+            text=i18n("reserve_dish_button", dish_name=dish_name),
+            callback_data=ReserveCallback(announcement_id=announcement_id),
+        )
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+def build_digest_keyboard(
+    announcements: List[Dict[str, Any]], language: str = DEFAULT_LANGUAGE
+) -> InlineKeyboardMarkup:
+    """Клавиатура дайджеста: кнопка бронирования для каждого блюда"""
+    return _digest_keyboard(_dishes(announcements), language)
+
+
+def dump_markup(markup: InlineKeyboardMarkup) -> str:
+    """Клавиатура в JSON - в том виде, в каком ее отправляет aiogram"""
+    return json.dumps(
+        markup.model_dump(mode="json", exclude_none=True), ensure_ascii=False
+    )
+
+
+# Клавиатуры рассылки одинаковы для всех получателей одного языка: строим и
+# сериализуем их один раз. Результат - JSON для OutgoingMessage.reply_markup.
+
+
+@lru_cache(maxsize=256)
+def prepared_reserve_keyboard(
+    announcement_id: int, language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Готовый JSON клавиатуры бронирования анонса"""
+    return dump_markup(get_reserve_keyboard(announcement_id, language))
+
+
+@lru_cache(maxsize=64)
+def _prepared_digest_keyboard(dishes: Dishes, language: str) -> str:
+    return dump_markup(_digest_keyboard(dishes, language))
+
+
+def prepared_digest_keyboard(
+    announcements: List[Dict[str, Any]], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Готовый JSON клавиатуры дайджеста"""
+    return _prepared_digest_keyboard(_dishes(announcements), language)
+
+
+def mark_sold_out(
+    markup: Optional[InlineKeyboardMarkup],
+    announcement_id: int,
+    language: str = DEFAULT_LANGUAGE,
+) -> Optional[InlineKeyboardMarkup]:
+    """Та же клавиатура, где кнопка бронирования анонса заменена на "Распродано"
+
+    Кнопка остается нажимаемой: повторное нажатие снова проверит лимит.
+    """
+    if markup is None:
+        return None
+    i18n = CATALOG.get(language)
+    data = ReserveCallback(announcement_id=announcement_id).pack()
+    rows = []
+    for row in markup.inline_keyboard:
+        buttons = []
+        for button in row:
+            if button.callback_data == data:
+                # "Забронировать: Плов" -> "Распродано: Плов"
+                dish = button.text.partition(": ")[2]
+                if dish:
+                    text = i18n("sold_out_dish_button", dish_name=dish)
+                else:
+                    text = i18n("sold_out_button")
+                button = button.model_copy(update={"text": text})
+            buttons.append(button)
+        rows.append(buttons)
+    return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -1,15 +1,19 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from callbacks.orders import BulkOrdersCallback
 from callbacks.reserve import ReserveCallback, CancelCallback
+from utils.formatters import CATALOG, DEFAULT_LANGUAGE
 
 
-def get_reserve_keyboard(announcement_id: int) -> InlineKeyboardMarkup:
+def get_reserve_keyboard(
+    announcement_id: int, language: str = DEFAULT_LANGUAGE
+) -> InlineKeyboardMarkup:
     """Клавиатура для бронирования"""
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="Забронировать",
+                    text=CATALOG.get(language)("reserve_button"),
                     callback_data=ReserveCallback(
                         announcement_id=announcement_id
                     ).pack(),
@@ -19,13 +23,14 @@ def get_reserve_keyboard(announcement_id: int) -> InlineKeyboardMarkup:
     )
 
 
-def get_cancel_keyboard() -> InlineKeyboardMarkup:
+def get_cancel_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     """Клавиатура для отмены бронирования"""
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="❌ Отменить", callback_data=CancelCallback().pack()
+                    text=CATALOG.get(language)("cancel_button"),
+                    callback_data=CancelCallback().pack(),
                 )
             ]
         ]
@@ -41,17 +46,47 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_order_confirmation_keyboard(order_id: str) -> InlineKeyboardMarkup:
+def get_order_confirmation_keyboard(
+    order_id: str, language: str = DEFAULT_LANGUAGE
+) -> InlineKeyboardMarkup:
     """Клавиатура для подтверждения заказа"""
+    i18n = CATALOG.get(language)
     return InlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
-                    text="✅ Подтвердить", callback_data=f"confirm_{order_id}"
+                    text=i18n("confirm_button"), callback_data=f"confirm_{order_id}"
                 ),
                 InlineKeyboardButton(
-                    text="❌ Отклонить", callback_data=f"reject_{order_id}"
+                    text=i18n("reject_button"), callback_data=f"reject_{order_id}"
                 ),
             ]
         ]
     )
+
+
+def get_bulk_orders_keyboard(
+    token: str, count: int, language: str = DEFAULT_LANGUAGE
+) -> InlineKeyboardMarkup:
+    """Клавиатура для подтверждения всех показанных заказов"""
+    i18n = CATALOG.get(language)
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text=i18n("bulk_confirm_button", count=count),
+                    callback_data=BulkOrdersCallback(
+                        action="confirm", token=token
+                    ).pack(),
+                )
+            ],
+            [
+                InlineKeyboardButton(
+                    text=i18n("bulk_reject_button", count=count),
+                    callback_data=BulkOrdersCallback(
+                        action="reject", token=token
+                    ).pack(),
+                )
+            ],
+        ]
+    )
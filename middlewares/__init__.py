@@ -2,14 +2,18 @@ from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
 from aiogram.types import TelegramObject
 from config.settings import Config
-from services.api_client import GoogleSheetsClient
+from services.async_client import AsyncSheetsClient
+from middlewares.throttling import ThrottlingMiddleware
+from middlewares.i18n import I18nMiddleware
+from middlewares.instrumentation import FirstUpdateMiddleware, InstrumentationMiddleware
 
 
 class DependencyMiddleware(BaseMiddleware):
-    def __init__(self, config: Config, sheets: GoogleSheetsClient):
+    def __init__(self, config: Config, sheets: AsyncSheetsClient, **services: Any):
         super().__init__()
         self.config = config
         self.sheets = sheets
+        self.services = services
 
     async def __call__(
         self,
@@ -19,4 +23,5 @@ class DependencyMiddleware(BaseMiddleware):
     ) -> Any:
         data["config"] = self.config
         data["sheets"] = self.sheets
+        data.update(self.services)
         return await handler(event, data)
@@ -0,0 +1,29 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from utils.formatters import CATALOG
+
+
+class I18nMiddleware(BaseMiddleware):
+    """Передает хендлерам i18n - сообщения на языке пользователя.
+
+    Язык берется из хранилища, которое держит языки пользователей в
+    памяти, поэтому к Google Sheets здесь обращений нет. Регистрируется
+    после DependencyMiddleware: нужен repo.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        repo = data.get("repo")
+        if user is not None and repo is not None:
+            data["i18n"] = CATALOG.get(await repo.get_language(user.id))
+        else:
+            data["i18n"] = CATALOG.get(CATALOG.default)
+        return await handler(event, data)
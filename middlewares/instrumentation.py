@@ -0,0 +1,78 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from utils.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+HANDLER_LATENCY = histogram(
+    "bot_handler_seconds", "Handler latency", ["router", "handler"]
+)
+HANDLER_ERRORS = counter(
+    "bot_handler_errors_total", "Handler errors", ["router", "handler", "error"]
+)
+STARTUP_SECONDS = gauge(
+    "bot_startup_seconds", "Seconds from process start to a startup phase", ["phase"]
+)
+
+
+class InstrumentationMiddleware(BaseMiddleware):
+    """Время выполнения и ошибки хендлеров по роутеру и имени хендлера.
+
+    Регистрируется как внутренний middleware: только там известен
+    выбранный хендлер.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+        callback = handler_object.callback
+        labels = (callback.__module__, callback.__name__)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(*labels, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, *labels)
+
+
+class FirstUpdateMiddleware(BaseMiddleware):
+    """Время от запуска процесса до первого апдейта и ответа на него"""
+
+    def __init__(self, started: float):
+        super().__init__()
+        self.started = started
+        self.seen = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.seen:
+            return await handler(event, data)
+        self.seen = True
+        received = time.monotonic() - self.started
+        STARTUP_SECONDS.set(received, "first_update")
+        try:
+            return await handler(event, data)
+        finally:
+            handled = time.monotonic() - self.started
+            STARTUP_SECONDS.set(handled, "first_update_handled")
+            logger.info(
+                "First update handled",
+                extra={"received": round(received, 3), "handled": round(handled, 3)},
+            )
@@ -0,0 +1,126 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from utils.formatters import CATALOG
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Корзина токенов: до capacity событий подряд, далее rate в секунду"""
+
+    __slots__ = ("tokens", "updated", "warned")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+        self.warned = False
+
+    def take(self, rate: float, capacity: float, now: float) -> bool:
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.warned = False
+            return True
+        return False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты апдейтов от одного пользователя.
+
+    Для каждой пары (пользователь, тип события) ведется своя корзина
+    токенов, лишние апдейты отбрасываются до обращения к хендлерам и
+    Google Sheets. Повторное нажатие той же кнопки, пока первое еще
+    обрабатывается, сразу получает ответ и дальше не идет. Администраторы
+    не ограничиваются. Ответ о превышении лимита - на языке пользователя
+    из language (middleware стоит до I18nMiddleware).
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 5,
+        exempt: Iterable[int] = (),
+        idle_after: float = 600.0,
+        language: Optional[Callable[[int], Awaitable[str]]] = None,
+    ):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.exempt = set(exempt)
+        self.idle_after = idle_after
+        self.language = language
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        self._in_flight: Set[Tuple[int, str]] = set()
+        self._next_cleanup = 0.0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            key = (user.id, event.data or "")
+            if key in self._in_flight:
+                # Двойное нажатие: первое нажатие еще обрабатывается
+                await event.answer()
+                return None
+
+        now = time.monotonic()
+        self._cleanup(now)
+        bucket_key = (user.id, type(event).__name__)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = TokenBucket(self.burst, now)
+        if not bucket.take(self.rate, self.burst, now):
+            await self._throttled(event, bucket, user.id)
+            return None
+
+        if not isinstance(event, CallbackQuery):
+            return await handler(event, data)
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
+
+    async def _throttled(
+        self, event: TelegramObject, bucket: TokenBucket, user_id: int
+    ):
+        """Сообщить о превышении лимита один раз за серию"""
+        if isinstance(event, CallbackQuery):
+            key = "throttled_callback"
+        elif isinstance(event, Message) and not bucket.warned:
+            key = "throttled_message"
+        else:
+            bucket.warned = True
+            return
+        try:
+            language = CATALOG.default
+            if self.language is not None:
+                language = await self.language(user_id)
+            await event.answer(CATALOG.get(language)(key))
+        except Exception as e:
+            logger.warning("Error answering throttled update: %s", e)
+        bucket.warned = True
+
+    def _cleanup(self, now: float):
+        """Забыть корзины пользователей, которые давно неактивны"""
+        if now < self._next_cleanup:
+            return
+        self._next_cleanup = now + self.idle_after
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if now - bucket.updated < self.idle_after
+        }
@@ -1,13 +1,20 @@
+import logging
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from services.api_client import GoogleSheetsClient
+from services.async_client import AsyncSheetsClient
+from services.storage import Repository, new_order_id
+from keyboards.builders import mark_sold_out
 from keyboards.inline import get_cancel_keyboard, get_order_confirmation_keyboard
 from callbacks.reserve import ReserveCallback, CancelCallback
 from config.settings import Config
+from utils.formatters import CATALOG, Translator
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
@@ -23,14 +30,28 @@ async def process_reserve(
     callback: CallbackQuery,
     callback_data: ReserveCallback,
     state: FSMContext,
-    sheets: GoogleSheetsClient,
+    repo: Repository,
+    i18n: Translator,
 ):
-    print(f"Processing reserve callback for user {callback.from_user.id}")
     try:
         # Получаем данные анонса
-        announcement = sheets.get_announcement_by_id(callback_data.announcement_id)
+        announcement = await repo.get_announcement(callback_data.announcement_id)
         if not announcement:
-            await callback.answer("Анонс не найден", show_alert=True)
+            await callback.answer(i18n("announcement_not_found"), show_alert=True)
+            return
+
+        announcement_id = callback_data.announcement_id
+        left = repo.capacity.remaining(announcement_id, callback.from_user.id)
+        if left == 0 and not await repo.capacity.top_up(
+            announcement_id, callback.from_user.id, 1
+        ):
+            # Лимит известен из памяти - кнопку меняем без запросов к таблице
+            markup = mark_sold_out(
+                callback.message.reply_markup, announcement_id, i18n.language
+            )
+            if markup != callback.message.reply_markup:
+                await callback.message.edit_reply_markup(reply_markup=markup)
+            await callback.answer(i18n("sold_out"), show_alert=True)
             return
 
         # Сохраняем данные в состояние
@@ -41,24 +62,30 @@ async def process_reserve(
         )
 
         # Отправка сообщения с запросом количества порций
-        await callback.message.edit_text(
-            f"🍽 *{announcement['Название блюда']}*\n\n"
-            f"💰 Цена за порцию: {announcement['Цена']}\n\n"
-            f"Пожалуйста, введите количество порций:",
-            reply_markup=get_cancel_keyboard(),
+        text = i18n(
+            "ask_amount",
+            dish_name=announcement["Название блюда"],
+            price=announcement["Цена"],
         )
+        markup = callback.message.reply_markup
+        if markup and len(markup.inline_keyboard) > 1:
+            # Дайджест с несколькими блюдами не затираем - отвечаем отдельно
+            await callback.answer()
+            await callback.message.answer(text, reply_markup=get_cancel_keyboard(i18n.language))
+        else:
+            await callback.message.edit_text(text, reply_markup=get_cancel_keyboard(i18n.language))
 
         # Устанавливаем состояние ожидания количества порций
         await state.set_state(ReserveStates.waiting_for_amount)
 
-    except Exception as e:
-        print(f"Error in process_reserve: {e}")
-        await callback.answer("Произошла ошибка", show_alert=True)
+    except Exception:
+        logger.exception("Error in process_reserve")
+        await callback.answer(i18n("error"), show_alert=True)
 
 
 @router.message(ReserveStates.waiting_for_amount)
 async def process_amount(
-    message: Message, state: FSMContext, sheets: GoogleSheetsClient
+    message: Message, state: FSMContext, repo: Repository, i18n: Translator
 ):
     try:
         try:
@@ -67,31 +94,53 @@ async def process_amount(
                 raise ValueError
         except ValueError:
             await message.answer(
-                "Пожалуйста, введите корректное количество порций (целое положительное число):",
-                reply_markup=get_cancel_keyboard(),
+                i18n("invalid_amount"),
+                reply_markup=get_cancel_keyboard(i18n.language),
             )
             return
 
         data = await state.get_data()
         price = data["price"]
         total_amount = int(price) * portions
+
+        # Порции удерживаются за жителем до оформления заказа или отмены
+        announcement_id = data["announcement_id"]
+        held = repo.capacity.hold(announcement_id, message.from_user.id, portions)
+        if not held and await repo.capacity.top_up(
+            announcement_id, message.from_user.id, portions
+        ):
+            # Своя доля кончилась, недостающие порции дали другие воркеры
+            held = repo.capacity.hold(announcement_id, message.from_user.id, portions)
+        if not held:
+            left = repo.capacity.remaining(announcement_id, message.from_user.id)
+            if not left:
+                await state.clear()
+                await message.answer(i18n("sold_out"))
+                return
+            await message.answer(
+                i18n("portions_left", left=left),
+                reply_markup=get_cancel_keyboard(i18n.language),
+            )
+            return
         await state.update_data(portions=portions)
 
         await message.answer(
-            "Укажите ваш блок (например: 804a):",
-            reply_markup=get_cancel_keyboard(),
+            i18n("ask_block"),
+            reply_markup=get_cancel_keyboard(i18n.language),
         )
         await state.set_state(ReserveStates.waiting_for_room)
-    except Exception as e:
-        print(f"Error in process_amount: {e}")
+    except Exception:
+        logger.exception("Error in process_amount")
         await message.answer(
-            "Произошла ошибка. Попробуйте начать бронирование заново.",
-            reply_markup=get_cancel_keyboard(),
+            i18n("reservation_error"),
+            reply_markup=get_cancel_keyboard(i18n.language),
         )
 
 
 @router.message(ReserveStates.waiting_for_room)
-async def process_room(message: Message, state: FSMContext, sheets: GoogleSheetsClient):
+async def process_room(
+    message: Message, state: FSMContext, sheets: AsyncSheetsClient, i18n: Translator
+):
     room = message.text.strip()
     await state.update_data(room=room)
     data = await state.get_data()
@@ -99,21 +148,25 @@ async def process_room(message: Message, state: FSMContext, sheets: GoogleSheets
     price = data["price"]
     total_amount = int(price) * int(portions)
     await message.answer(
-        f"🍽 *{data['dish_name']}*\n"
-        f"Блок: {room}\n"
-        f"Количество порций: {portions}\n"
-        f"💰 Общая сумма: {total_amount}\n\n"
-        f"💳 Реквизиты для оплаты:\n"
-        f"Тинькофф: +777777777777\n\n"
-        f"Пожалуйста, переведите {total_amount} рублей и отправьте скриншот чека:",
-        reply_markup=get_cancel_keyboard(),
+        i18n(
+            "payment_details",
+            dish_name=data["dish_name"],
+            room=room,
+            portions=portions,
+            total=total_amount,
+        ),
+        reply_markup=get_cancel_keyboard(i18n.language),
     )
     await state.set_state(ReserveStates.waiting_for_receipt)
 
 
 @router.message(ReserveStates.waiting_for_receipt, F.photo)
 async def process_receipt(
-    message: Message, state: FSMContext, sheets: GoogleSheetsClient, config: Config
+    message: Message,
+    state: FSMContext,
+    repo: Repository,
+    config: Config,
+    i18n: Translator,
 ):
     try:
         data = await state.get_data()
@@ -123,8 +176,8 @@ async def process_receipt(
         room = data.get("room")
         if not all([announcement_id, dish_name, portions, room]):
             await message.answer(
-                "Ошибка: не все данные сохранены. Попробуйте начать бронирование заново.",
-                reply_markup=get_cancel_keyboard(),
+                i18n("order_data_missing"),
+                reply_markup=get_cancel_keyboard(i18n.language),
             )
             return
         photo = message.photo[-1]
@@ -133,55 +186,100 @@ async def process_receipt(
 
         dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         username = message.from_user.username or "-"
-        order_id = str(message.message_id)
-        sheets.add_order(
-            user_id=message.from_user.id,
-            username=username,
-            room=room,
-            portions=portions,
-            dt=dt,
-            dish_name=dish_name,
-            order_id=order_id,
-            canceled="Ожидает подтверждения",
+        order_id = new_order_id(message)
+        committed = repo.capacity.commit(
+            announcement_id, message.from_user.id, portions, order_id
         )
+        if not committed and await repo.capacity.top_up(
+            announcement_id, message.from_user.id, portions
+        ):
+            committed = repo.capacity.commit(
+                announcement_id, message.from_user.id, portions, order_id
+            )
+        if not committed:
+            # Удержание истекло, а свободных порций уже нет
+            await state.clear()
+            await message.answer(i18n("paid_sold_out"))
+            languages = await repo.get_languages(config.tg_bot.admin_ids)
+            for admin_id in config.tg_bot.admin_ids:
+                try:
+                    await message.bot.send_photo(
+                        chat_id=admin_id,
+                        photo=file_id,
+                        caption=CATALOG.get(languages[admin_id])(
+                            "admin_paid_sold_out",
+                            dish_name=dish_name,
+                            user_id=message.from_user.id,
+                            username=username,
+                            portions=portions,
+                        ),
+                    )
+                except Exception as e:
+                    logger.warning(
+                        "Error notifying admin: %s", e, extra={"admin_id": admin_id}
+                    )
+            return
+        try:
+            await repo.add_order(
+                user_id=message.from_user.id,
+                username=username,
+                room=room,
+                portions=portions,
+                dt=dt,
+                dish_name=dish_name,
+                order_id=order_id,
+                canceled="Ожидает подтверждения",
+            )
+        except Exception:
+            repo.capacity.release_order(order_id)
+            raise
+        # Уведомление и кнопки - на языке каждого администратора
+        languages = await repo.get_languages(config.tg_bot.admin_ids)
         for admin_id in config.tg_bot.admin_ids:
             try:
                 await message.bot.send_photo(
                     chat_id=admin_id,
                     photo=file_id,
-                    caption=f"🆕 Новый заказ!\n\n"
-                    f"🍽 Блюдо: {dish_name}\n"
-                    f"👤 Пользователь: {message.from_user.id} (@{username})\n"
-                    f"🏢 Блок: {room}\n"
-                    f"🍽 Количество порций: {portions}",
-                    reply_markup=get_order_confirmation_keyboard(order_id),
+                    caption=CATALOG.get(languages[admin_id])(
+                        "admin_new_order",
+                        dish_name=dish_name,
+                        user_id=message.from_user.id,
+                        username=username,
+                        room=room,
+                        portions=portions,
+                    ),
+                    reply_markup=get_order_confirmation_keyboard(
+                        order_id, languages[admin_id]
+                    ),
                 )
             except Exception as e:
-                print(f"Error sending notification to admin {admin_id}: {e}")
+                logger.warning(
+                    "Error notifying admin: %s", e, extra={"admin_id": admin_id}
+                )
         await message.answer(
-            f"✅ Заказ успешно создан!\n\n"
-            f"🍽 Блюдо: {dish_name}\n"
-            f"🏢 Блок: {room}\n"
-            f"🍽 Количество порций: {portions}\n\n"
-            f"Спасибо за заказ! Мы проверим оплату и подтвердим ваш заказ."
+            i18n("order_created", dish_name=dish_name, room=room, portions=portions)
         )
         await state.clear()
-    except Exception as e:
-        print(f"Error in process_receipt: {e}")
-        await message.answer(
-            "Произошла ошибка при обработке заказа. Пожалуйста, попробуйте позже."
-        )
+    except Exception:
+        logger.exception("Error in process_receipt")
+        await message.answer(i18n("order_error"))
 
 
 @router.callback_query(CancelCallback.filter())
-async def process_cancel(callback: CallbackQuery, state: FSMContext):
+async def process_cancel(
+    callback: CallbackQuery, state: FSMContext, repo: Repository, i18n: Translator
+):
     try:
-
+        announcement_id = (await state.get_data()).get("announcement_id")
+        if announcement_id:
+            repo.capacity.release(announcement_id, callback.from_user.id)
         await state.clear()
 
         # Отправка сообщения об отмене
-        await callback.message.edit_text("❌ Бронирование отменено.", reply_markup=None)
+        await callback.message.edit_text(
+            i18n("reservation_canceled"), reply_markup=None
+        )
 
-    except Exception as e:
-        print(f"Error in process_cancel: {e}")
-        await callback.answer("Произошла ошибка при отмене", show_alert=True)
+    except Exception:
+        logger.exception("Error in process_cancel")
+        await callback.answer(i18n("cancel_error"), show_alert=True)
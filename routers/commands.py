@@ -1,367 +1,491 @@
+import logging
+from typing import Dict, List
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 
 from config.settings import Config
-from services.api_client import GoogleSheetsClient
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS, REJECTED_STATUS
+from services.storage import Repository
+from services.broadcast import BroadcastEngine, BroadcastStats, OutgoingMessage
+from services.delivery_ledger import DeliveryLedger
 from keyboards.inline import (
     get_reserve_keyboard,
     get_language_keyboard,
-    get_order_confirmation_keyboard,
+    get_bulk_orders_keyboard,
+)
+from keyboards.builders import (
+    build_digest_keyboard,
+    prepared_digest_keyboard,
+    prepared_reserve_keyboard,
 )
-from states import OrderStates, LanguageStates
+from callbacks.orders import BulkOrdersCallback
+from states import LanguageStates
 from filters.admin_filter import AdminFilter
+from utils.formatters import (
+    CATALOG,
+    Translator,
+    format_announcement,
+    format_digest,
+    format_kitchen_summary,
+    format_order_confirmed,
+    format_order_rejected,
+    format_pending_orders,
+    split_digest,
+)
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Поля заказа, которые нужны для уведомлений после массового решения
+_BULK_ORDER_FIELDS = ("order_id", "user_id", "dish_name", "room", "portions")
+
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, sheets: GoogleSheetsClient):
-    print(f"Processing /start command for user {message.from_user.id}")
+async def cmd_start(
+    message: Message, repo: Repository, ledger: DeliveryLedger, i18n: Translator
+):
     user_id = message.from_user.id
 
+    if await repo.ensure_user(user_id):
+        logger.info("New user", extra={"user_id": user_id})
+    # Пользователь снова пишет боту - возвращаем его в рассылки
+    await ledger.reactivate(user_id)
 
-    users = sheets.get_all_users()
-    user_exists = any(str(user["user_id"]) == str(user_id) for user in users)
-
-    if not user_exists:
-        print(f"Adding new user {user_id}")
-        sheets.add_user(user_id)
-
-    #Язык пользователя
-    user_language = next(
-        (user["language"] for user in users if str(user["user_id"]) == str(user_id)),
-        "ru",
-    )
-    print(f"User language: {user_language}")
-
-    # Приветсвие
+    # Приветсвие на языке пользователя
     await message.answer(
-        f"Привет! Я бот для управления анонсами блюд.\n"
-        f"Текущий язык: {user_language}\n"
-        f"Используйте /language для смены языка.",
+        i18n("start", language=i18n.language),
         reply_markup=get_language_keyboard(),
     )
 
 
 @router.message(Command("language"))
-async def cmd_language(message: Message, state: FSMContext):
+async def cmd_language(message: Message, state: FSMContext, i18n: Translator):
     await state.set_state(LanguageStates.waiting_for_language)
-    await message.answer(
-        "Выберите язык / Choose language:", reply_markup=get_language_keyboard()
-    )
+    await message.answer(i18n("choose_language"), reply_markup=get_language_keyboard())
 
 
 @router.callback_query(F.data.startswith("lang_"))
 async def process_language_selection(
-    callback: CallbackQuery, state: FSMContext, sheets: GoogleSheetsClient
+    callback: CallbackQuery, state: FSMContext, repo: Repository
 ):
     lang = callback.data.split("_")[1]
     user_id = callback.from_user.id
-    sheets.update_user_language(user_id, lang)
+    await repo.set_language(user_id, lang)
     await state.clear()
-    await callback.message.edit_text(
-        "Язык успешно изменен!" if lang == "ru" else "Language successfully changed!"
-    )
+    await callback.message.edit_text(CATALOG.get(lang)("language_changed"))
 
 
 @router.message(Command("send_menu"))
-async def cmd_send_menu(message: Message, sheets: GoogleSheetsClient, config: Config):
-    print(f"Processing /send_menu command from user {message.from_user.id}")
+async def cmd_send_menu(
+    message: Message,
+    repo: Repository,
+    broadcaster: BroadcastEngine,
+    ledger: DeliveryLedger,
+    config: Config,
+    i18n: Translator,
+):
     admin_filter = AdminFilter(config.tg_bot.admin_ids)
     if not await admin_filter(message):
-        print(f"User {message.from_user.id} is not admin")
-        await message.answer("Нет доступа.")
+        logger.warning(
+            "Admin command from non-admin", extra={"user_id": message.from_user.id}
+        )
+        await message.answer(i18n("no_access"))
         return
 
-    print("User is admin, getting unsent announcements")
-    unsent = sheets.get_unsent_announcements()
-    print(f"Found {len(unsent)} unsent announcements")
+    unsent = await repo.get_unsent_announcements()
 
     if not unsent:
-        await message.answer("Нет новых анонсов для отправки.")
+        await message.answer(i18n("menu_no_announcements"))
         return
 
-    users = sheets.get_all_users()
-    print(f"Found {len(users)} users to send announcements to")
+    users = ledger.filter(await repo.list_user_ids())
+    logger.info(
+        "Sending menu",
+        extra={"announcements": len(unsent), "recipients": len(users)},
+    )
 
     if not users:
-        await message.answer("Нет пользователей для рассылки.")
+        await message.answer(i18n("no_recipients"))
         return
 
-    # сообщение админу
-    try:
-        await message.answer(
-            f"🍽 *{unsent[0]['Название блюда']}*\n\n"
-            f"{unsent[0]['Описание блюда']}\n\n"
-            f"{unsent[0]['Текст сообщения']}\n\n"
-            f"💰 Цена: {unsent[0]['Цена']}\n"
-            f"⏰ Время: {unsent[0]['Время']}",
-            reply_markup=get_reserve_keyboard(announcement_id=unsent[0]["row_index"]),
-        )
-        print(f"Successfully sent to admin {message.from_user.id}")
-    except Exception as e:
-        print(f"Error sending message to admin: {e}")
+    # Дайджест: все анонсы одним сообщением на пользователя
+    digest = config.tg_bot.broadcast_digest and len(unsent) > 1
 
-    # Отправка пользователям
-    for announcement in unsent:
-        print(f"Processing announcement: {announcement['Название блюда']}")
-        for user in users:
-            try:
-                user_id = user["user_id"]
-                if int(user_id) == message.from_user.id:
-                    continue  # Пропускаем админа, так как уже отправили
-
-                print(f"Sending to user {user_id}")
-                await message.bot.send_message(
-                    chat_id=int(user_id),
-                    text=f"🍽 *{announcement['Название блюда']}*\n\n"
-                    f"{announcement['Описание блюда']}\n\n"
-                    f"💰 Цена: {announcement['Цена']}\n"
-                    f"⏰ Время: {announcement['Время']}",
-                    reply_markup=get_reserve_keyboard(
-                        announcement_id=announcement["row_index"]
-                    ),
+    def build_payloads(language: str):
+        # Клавиатура - готовый JSON, общий для всех получателей языка
+        if digest:
+            return [
+                (
+                    format_digest(chunk, language),
+                    prepared_digest_keyboard(chunk, language),
                 )
-                print(f"Successfully sent to user {user_id}")
-            except Exception as e:
-                print(f"Error sending message to user {user_id}: {e}")
-
-        print(f"Marking announcement as sent (row {announcement['row_index']})")
-        sheets.mark_announcement_sent(announcement["row_index"])
-
-    await message.answer("Рассылка завершена!")
-
-
-@router.callback_query(F.data == "reserve")
-async def process_reserve(callback: CallbackQuery, state: FSMContext):
-    await state.set_state(OrderStates.waiting_for_room)
-    await callback.message.answer("Введите номер вашей комнаты:")
-
-
-@router.message(OrderStates.waiting_for_room)
-async def process_room(message: Message, state: FSMContext):
-    await state.update_data(room=message.text)
-    await state.set_state(OrderStates.waiting_for_portions)
-    await message.answer("Введите количество порций:")
+                for chunk in split_digest(unsent, language)
+            ]
+        return [
+            (
+                format_announcement(announcement, language),
+                prepared_reserve_keyboard(announcement["row_index"], language),
+            )
+            for announcement in unsent
+        ]
 
+    # Сообщения собираются один раз на язык, а не на каждого получателя
+    audience: Dict[str, List[int]] = {}
+    for user_id, language in (await repo.get_languages(users)).items():
+        if user_id != message.from_user.id:  # админу превью отправляется ниже
+            audience.setdefault(language, []).append(user_id)
+    payloads = {language: build_payloads(language) for language in audience}
 
-@router.message(OrderStates.waiting_for_portions)
-async def process_portions(message: Message, state: FSMContext):
+    # сообщение админу
     try:
-        portions = int(message.text)
-        if portions <= 0:
-            raise ValueError
-        await state.update_data(portions=portions)
-        await state.set_state(OrderStates.waiting_for_payment)
-        await message.answer("Отправьте скриншот оплаты:")
-    except ValueError:
-        await message.answer("Пожалуйста, введите корректное число порций.")
-
+        if digest:
+            for chunk in split_digest(unsent, i18n.language):
+                await message.answer(
+                    format_digest(chunk, i18n.language),
+                    reply_markup=build_digest_keyboard(chunk, i18n.language),
+                )
+        else:
+            await message.answer(
+                format_announcement(unsent[0], i18n.language),
+                reply_markup=get_reserve_keyboard(
+                    unsent[0]["row_index"], i18n.language
+                ),
+            )
+    except Exception as e:
+        logger.warning("Error sending menu preview to admin: %s", e)
 
-@router.message(OrderStates.waiting_for_payment, F.photo)
-async def process_payment(
-    message: Message, state: FSMContext, sheets: GoogleSheetsClient
-):
-    data = await state.get_data()
-    photo = message.photo[-1]
-    file_id = photo.file_id
-
-    # Сохраняем заказ
-    sheets.add_order(
-        user_id=message.from_user.id,
-        dish_name=data["dish_name"],
-        room=data["room"],
-        portions=data["portions"],
-        payment_screenshot=file_id,
+    # Отправка пользователям
+    outgoing = [
+        OutgoingMessage(chat_id=user_id, text=text, reply_markup=keyboard)
+        for language, recipients in audience.items()
+        for text, keyboard in payloads[language]
+        for user_id in recipients
+    ]
+    logger.debug(
+        "Prepared broadcast",
+        extra={
+            "messages": len(outgoing),
+            "digest": digest,
+            "languages": len(audience),
+        },
     )
 
-    # Отправка уведомления админам
-    for admin_id in Config.tg_bot.admin_ids:
-        try:
-            await message.bot.send_photo(
-                chat_id=admin_id,
-                photo=file_id,
-                caption=f"Новый заказ!\nКомната: {data['room']}\nПорций: {data['portions']}",
-                reply_markup=get_order_confirmation_keyboard(str(message.message_id)),
-            )
-        except Exception as e:
-            print(f"Error sending notification to admin {admin_id}: {e}")
+    async def mark_sent(stats: BroadcastStats):
+        for announcement in unsent:
+            await repo.mark_announcement_sent(announcement["row_index"])
 
-    await state.clear()
-    await message.answer("Спасибо за заказ! Ожидайте подтверждения от администратора.")
+    # Рассылка идет в фоне, прогресс обновляется в одном сообщении
+    progress = await message.answer(i18n("broadcast_started"))
+    broadcaster.start(outgoing, progress, title=i18n("menu_title"), on_done=mark_sent)
 
 
 @router.callback_query(F.data.startswith(("confirm_", "reject_")))
 async def process_order_confirmation(
-    callback: CallbackQuery, sheets: GoogleSheetsClient, config: Config
+    callback: CallbackQuery, repo: Repository, config: Config, i18n: Translator
 ):
-    action, order_id = callback.data.split("_")
-    orders_ws = sheets.get_worksheet("Orders")
-    order_cell = orders_ws.find(order_id)
-    if not order_cell:
-        await callback.answer("Заказ не найден", show_alert=True)
+    action, order_id = callback.data.split("_", 1)
+    # Получаем данные заказа
+    order_data = await repo.get_order(order_id)
+    if not order_data:
+        await callback.answer(i18n("order_not_found"), show_alert=True)
         return
 
-    # Получаем данные заказа
-    order_data = {
-        "user_id": orders_ws.cell(order_cell.row, 1).value,
-        "username": orders_ws.cell(order_cell.row, 2).value,
-        "room": orders_ws.cell(order_cell.row, 3).value,
-        "portions": orders_ws.cell(order_cell.row, 4).value,
-        "dish_name": orders_ws.cell(order_cell.row, 6).value,
-    }
+    # Статус меняется, только если заказ еще ожидает подтверждения: проверка
+    # идет под той же блокировкой, что и /cancel жителя
+    status = CONFIRMED_STATUS if action == "confirm" else REJECTED_STATUS
+    if not await repo.resolve_pending_orders([order_id], status):
+        await callback.answer(i18n("order_already_processed"), show_alert=True)
+        await callback.message.edit_reply_markup(reply_markup=None)
+        return
 
+    # Уведомление - на языке жителя, а не администратора
+    language = await repo.get_language(order_data["user_id"])
     if action == "confirm":
-        sheets.update_order_status(order_id, "Подтвержден")
         await callback.message.bot.send_message(
             chat_id=order_data["user_id"],
-            text=f"✅ Ваш заказ подтвержден!\n\n"
-            f"🍽 Блюдо: {order_data['dish_name']}\n"
-            f"🏢 Блок: {order_data['room']}\n"
-            f"🍽 Количество порций: {order_data['portions']}\n\n"
-            f"Приятного аппетита! 🍽",
+            text=format_order_confirmed(order_data, language),
         )
     else:
-        sheets.update_order_status(order_id, "Отменен")
-        # Отправляем уведомление всем админам
+        # Отправляем уведомление всем админам, каждому на его языке
+        languages = await repo.get_languages(config.tg_bot.admin_ids)
         for admin_id in config.tg_bot.admin_ids:
             try:
                 await callback.message.bot.send_message(
                     chat_id=admin_id,
-                    text=f"❌ Заказ отменен!\n\n"
-                    f"🍽 Блюдо: {order_data['dish_name']}\n"
-                    f"👤 Пользователь: {order_data['user_id']} (@{order_data['username']})\n"
-                    f"🏢 Блок: {order_data['room']}\n"
-                    f"🍽 Количество порций: {order_data['portions']}",
+                    text=CATALOG.get(languages[admin_id])(
+                        "admin_order_rejected",
+                        dish_name=order_data["dish_name"],
+                        user_id=order_data["user_id"],
+                        username=order_data["username"],
+                        room=order_data["room"],
+                        portions=order_data["portions"],
+                    ),
                 )
             except Exception as e:
-                print(f"Error sending notification to admin {admin_id}: {e}")
+                logger.warning(
+                    "Error notifying admin: %s", e, extra={"admin_id": admin_id}
+                )
 
         await callback.message.bot.send_message(
             chat_id=order_data["user_id"],
-            text=f"❌ Ваш заказ был отменен администратором.\n\n"
-            f"🍽 Блюдо: {order_data['dish_name']}\n"
-            f"🏢 Блок: {order_data['room']}\n"
-            f"🍽 Количество порций: {order_data['portions']}\n\n"
-            f"Если у вас есть вопросы, пожалуйста, свяжитесь с администратором.",
+            text=format_order_rejected(order_data, language),
         )
 
     await callback.message.edit_reply_markup(reply_markup=None)
 
 
+@router.message(Command("confirm_all"))
+async def cmd_confirm_all(
+    message: Message,
+    command: CommandObject,
+    state: FSMContext,
+    repo: Repository,
+    config: Config,
+    i18n: Translator,
+):
+    admin_filter = AdminFilter(config.tg_bot.admin_ids)
+    if not await admin_filter(message):
+        logger.warning(
+            "Admin command from non-admin", extra={"user_id": message.from_user.id}
+        )
+        await message.answer(i18n("no_access"))
+        return
+
+    # /confirm_all <блюдо> или /confirm_all для всех блюд
+    dish_name = (command.args or "").strip()
+    orders = await repo.list_pending_orders(dish_name or None)
+    if not orders:
+        await message.answer(i18n("bulk_no_pending"))
+        return
+
+    # Кнопки относятся ровно к показанным заказам: запоминаем их у админа
+    token = str(message.message_id)
+    await state.update_data(
+        bulk_orders={
+            "token": token,
+            "orders": [
+                {field: order[field] for field in _BULK_ORDER_FIELDS}
+                for order in orders
+            ],
+        }
+    )
+    texts = format_pending_orders(dish_name, orders, i18n.language)
+    for text in texts[:-1]:
+        await message.answer(text)
+    await message.answer(
+        texts[-1],
+        reply_markup=get_bulk_orders_keyboard(token, len(orders), i18n.language),
+    )
+
+
+@router.callback_query(BulkOrdersCallback.filter())
+async def process_bulk_orders(
+    callback: CallbackQuery,
+    callback_data: BulkOrdersCallback,
+    state: FSMContext,
+    repo: Repository,
+    broadcaster: BroadcastEngine,
+    config: Config,
+    i18n: Translator,
+):
+    admin_filter = AdminFilter(config.tg_bot.admin_ids)
+    if not await admin_filter(callback):
+        await callback.answer(i18n("no_access"), show_alert=True)
+        return
+
+    shown = (await state.get_data()).get("bulk_orders") or {}
+    if shown.get("token") != callback_data.token:
+        await callback.answer(i18n("bulk_stale"), show_alert=True)
+        return
+    await state.update_data(bulk_orders=None)
+    await callback.message.edit_reply_markup(reply_markup=None)
+
+    confirm = callback_data.action == "confirm"
+    status = CONFIRMED_STATUS if confirm else REJECTED_STATUS
+    orders = shown["orders"]
+    # Одно чтение уже было при показе списка, здесь - одна запись всех статусов
+    updated = set(
+        await repo.resolve_pending_orders(
+            [order["order_id"] for order in orders], status
+        )
+    )
+    logger.info(
+        "Bulk order decision",
+        extra={"status": status, "orders": len(orders), "updated": len(updated)},
+    )
+    format_notice = format_order_confirmed if confirm else format_order_rejected
+    notified = [order for order in orders if order["order_id"] in updated]
+    languages = await repo.get_languages(
+        [int(order["user_id"]) for order in notified]
+    )
+    outgoing = [
+        OutgoingMessage(
+            chat_id=int(order["user_id"]),
+            text=format_notice(order, languages[int(order["user_id"])]),
+        )
+        for order in notified
+    ]
+    skipped = len(orders) - len(updated)
+    summary = i18n("bulk_confirmed" if confirm else "bulk_rejected", count=len(updated))
+    if skipped:
+        summary += "\n" + i18n("bulk_skipped", count=skipped)
+    if not outgoing:
+        await callback.message.answer(summary)
+        return
+
+    async def report(stats: BroadcastStats):
+        await callback.message.answer(
+            summary + "\n" + i18n("bulk_notified", sent=stats.sent, total=stats.total)
+        )
+
+    # Уведомления жителям - через общий ограничитель скорости рассылки
+    progress = await callback.message.answer(i18n("bulk_sending"))
+    broadcaster.start(outgoing, progress, title=i18n("bulk_title"), on_done=report)
+
+
 @router.message(Command("nofood"))
-async def cmd_nofood(message: Message, sheets: GoogleSheetsClient, config: Config):
-    print(f"Processing /nofood command from user {message.from_user.id}")
+async def cmd_nofood(
+    message: Message,
+    repo: Repository,
+    broadcaster: BroadcastEngine,
+    ledger: DeliveryLedger,
+    config: Config,
+    i18n: Translator,
+):
     admin_filter = AdminFilter(config.tg_bot.admin_ids)
     if not await admin_filter(message):
-        print(f"User {message.from_user.id} is not admin")
-        await message.answer("Нет доступа.")
+        logger.warning(
+            "Admin command from non-admin", extra={"user_id": message.from_user.id}
+        )
+        await message.answer(i18n("no_access"))
         return
 
-    users = sheets.get_all_users()
-    print(f"Found {len(users)} users to send notification to")
+    users = ledger.filter(await repo.list_user_ids())
+    logger.info("Sending no-food notice", extra={"recipients": len(users)})
 
     if not users:
-        await message.answer("Нет пользователей для рассылки.")
+        await message.answer(i18n("no_recipients"))
         return
 
-    # Отправляем сообщение всем пользователям
-    success_count = 0
-    for user in users:
-        try:
-            user_id = user["user_id"]
-            await message.bot.send_message(
-                chat_id=int(user_id),
-                text="⚠️ *Важное объявление*\n\n"
-                "Сегодня еды не будет.\n"
-                "Приносим извинения за неудобства.",
+    # Отправляем сообщение всем пользователям: текст - один на язык
+    languages = await repo.get_languages(users)
+    texts = {
+        language: CATALOG.get(language)("nofood")
+        for language in set(languages.values())
+    }
+    outgoing = [
+        OutgoingMessage(chat_id=user_id, text=texts[languages[user_id]])
+        for user_id in users
+    ]
+
+    async def report(stats: BroadcastStats):
+        await message.answer(i18n("nofood_sent", sent=stats.sent, total=stats.total))
+
+    progress = await message.answer(i18n("broadcast_started"))
+    broadcaster.start(outgoing, progress, title=i18n("nofood_title"), on_done=report)
+
+
+@router.message(Command("summary"))
+async def cmd_summary(
+    message: Message,
+    command: CommandObject,
+    repo: Repository,
+    config: Config,
+    i18n: Translator,
+):
+    admin_filter = AdminFilter(config.tg_bot.admin_ids)
+    if not await admin_filter(message):
+        logger.warning(
+            "Admin command from non-admin", extra={"user_id": message.from_user.id}
+        )
+        await message.answer(i18n("no_access"))
+        return
+
+    # /summary или /summary 2024-05-20
+    from datetime import datetime
+
+    day = (command.args or "").strip() or datetime.now().strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        await message.answer(i18n("summary_bad_date"))
+        return
+    if day < repo.manifest.since():
+        await message.answer(
+            i18n(
+                "summary_retention",
+                days=repo.manifest.days,
+                since=repo.manifest.since(),
             )
-            success_count += 1
-        except Exception as e:
-            print(f"Error sending notification to user {user_id}: {e}")
+        )
+        return
 
-    await message.answer(
-        f"✅ Уведомление отправлено {success_count} пользователям из {len(users)}"
-    )
+    # Сводка собирается из счетчиков в памяти, таблица не читается
+    dishes = await repo.kitchen_summary(day)
+    for text in format_kitchen_summary(day, dishes, i18n.language):
+        await message.answer(text)
 
 
 @router.message(Command("cancel"))
-async def cmd_cancel(message: Message, sheets: GoogleSheetsClient, config: Config):
-    print(f"Processing /cancel command from user {message.from_user.id}")
-    
-    # последний заказ пользователя
-    last_order = sheets.get_last_user_order(message.from_user.id)
+async def cmd_cancel(
+    message: Message, repo: Repository, config: Config, i18n: Translator
+):
+    # последний ожидающий подтверждения заказ пользователя
+    last_order = await repo.get_last_pending_order(message.from_user.id)
     if not last_order:
-        await message.answer("У вас нет активных заказов для отмены.")
+        await message.answer(i18n("no_active_orders"))
         return
 
-    # Получаем заголовки таблицы для правильного доступа к полям
-    orders_ws = sheets.get_worksheet("Orders")
-    headers = orders_ws.row_values(1)
-    status_column = headers[7]  # 8-й столбец (индекс 7) - статус заказа
-    order_id_column = headers[6]  # 7-й столбец (индекс 6) - ID заказа
-    dish_name_column = headers[5]  # 6-й столбец (индекс 5) - название блюда
-    room_column = headers[2]  # 3-й столбец (индекс 2) - блок
-    portions_column = headers[3]  # 4-й столбец (индекс 3) - количество порций
-    username_column = headers[1]  # 2-й столбец (индекс 1) - username
-
     # Проверяем, что заказ еще не отменен
-    if last_order[status_column] != "Ожидает подтверждения":
-        await message.answer("Этот заказ уже обработан и не может быть отменен.")
+    if last_order["status"] != PENDING_STATUS:
+        await message.answer(i18n("order_processed"))
         return
 
     # Формируем статус отмены с датой
     from datetime import datetime
-    cancel_status = f"Отменен пользователем {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    
+
+    canceled_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cancel_status = f"Отменен пользователем {canceled_at}"
+
     # Обновляем статус заказа
-    sheets.update_order_status(last_order[order_id_column], cancel_status)
+    await repo.update_order_status(last_order["order_id"], cancel_status)
 
-    # Отправляем уведомление админам
+    # Отправляем уведомление админам, каждому на его языке
+    languages = await repo.get_languages(config.tg_bot.admin_ids)
     for admin_id in config.tg_bot.admin_ids:
         try:
             await message.bot.send_message(
                 chat_id=admin_id,
-                text=f"❌ Заказ отменен пользователем!\n\n"
-                     f"🍽 Блюдо: {last_order[dish_name_column]}\n"
-                     f"👤 Пользователь: {last_order['user_id']} (@{last_order[username_column]})\n"
-                     f"🏢 Блок: {last_order[room_column]}\n"
-                     f"🍽 Количество порций: {last_order[portions_column]}\n"
-                     f"⏰ Время отмены: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                text=CATALOG.get(languages[admin_id])(
+                    "admin_order_canceled",
+                    dish_name=last_order["dish_name"],
+                    user_id=last_order["user_id"],
+                    username=last_order["username"],
+                    room=last_order["room"],
+                    portions=last_order["portions"],
+                    time=canceled_at,
+                ),
             )
         except Exception as e:
-            print(f"Error sending notification to admin {admin_id}: {e}")
+            logger.warning(
+                "Error notifying admin: %s", e, extra={"admin_id": admin_id}
+            )
 
     # Отправляем подтверждение пользователю
     await message.answer(
-        f"✅ Ваш последний заказ отменен:\n\n"
-        f"🍽 Блюдо: {last_order[dish_name_column]}\n"
-        f"🏢 Блок: {last_order[room_column]}\n"
-        f"🍽 Количество порций: {last_order[portions_column]}\n\n"
-        f"Администраторы уведомлены об отмене."
+        i18n(
+            "order_canceled",
+            dish_name=last_order["dish_name"],
+            room=last_order["room"],
+            portions=last_order["portions"],
+        )
     )
 
 
 @router.message(Command("help"))
-async def cmd_help(message: Message):
-    help_text = (
-        "🤖 *Dormitory Gourmet Bot*\n\n"
-        "Этот бот помогает организовать заказы еды в общежитии.\n\n"
-        "*Доступные команды:*\n"
-        "• /start - Начать работу с ботом\n"
-        "• /language - Изменить язык бота\n"
-        "• /cancel - Отменить последний заказ\n"
-        "• /help - Показать это сообщение\n\n"
-        "*Как пользоваться ботом:*\n"
-        "1. Дождитесь анонса блюда от администратора\n"
-        "2. Нажмите кнопку 'Забронировать'\n"
-        "3. Укажите количество порций\n"
-        "4. Укажите ваш блок\n"
-        "5. Оплатите заказ и отправьте скриншот чека\n"
-        "6. Дождитесь подтверждения от администратора\n\n"
-        "Если у вас возникли вопросы, обратитесь к администратору."
-    )
-    
-    await message.answer(help_text, parse_mode="Markdown")
+async def cmd_help(message: Message, i18n: Translator):
+    await message.answer(i18n("help"), parse_mode="Markdown")
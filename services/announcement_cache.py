@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from services.async_client import AsyncSheetsClient
+
+
+class AnnouncementCache:
+    """Кэш анонсов по номеру строки листа Anonces.
+
+    Заполняется при рассылке (/send_menu читает все неотправленные анонсы),
+    поэтому нажатия "Забронировать" после рассылки не обращаются к таблице.
+    Одновременные промахи по одной строке объединяются в один запрос.
+    Запись живет ttl секунд и сбрасывается при отметке анонса отправленным.
+    """
+
+    def __init__(self, sheets: AsyncSheetsClient, ttl: float = 300.0):
+        self.sheets = sheets
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def put(self, row_index: int, announcement: Dict[str, Any]):
+        data = {key: value for key, value in announcement.items() if key != "row_index"}
+        self._entries[int(row_index)] = (self._now(), data)
+
+    def put_many(self, announcements: Iterable[Dict[str, Any]]):
+        """Запомнить анонсы, прочитанные целиком (у каждого есть row_index)"""
+        for announcement in announcements:
+            self.put(announcement["row_index"], announcement)
+
+    def invalidate(self, row_index: int):
+        self._entries.pop(int(row_index), None)
+
+    async def get(self, row_index: int) -> Optional[Dict[str, Any]]:
+        row_index = int(row_index)
+        entry = self._entries.get(row_index)
+        if entry is not None and self._now() - entry[0] < self.ttl:
+            self.hits += 1
+            return dict(entry[1])
+
+        self.misses += 1
+        loading = self._loading.get(row_index)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(row_index))
+            self._loading[row_index] = loading
+        announcement = await asyncio.shield(loading)
+        return dict(announcement) if announcement is not None else None
+
+    async def _load(self, row_index: int) -> Optional[Dict[str, Any]]:
+        try:
+            announcement = await self.sheets.get_announcement_by_id(row_index)
+            if announcement:
+                self.put(row_index, announcement)
+            return announcement
+        finally:
+            self._loading.pop(row_index, None)
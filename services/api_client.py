@@ -1,35 +1,423 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from typing import List, Dict, Any, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Awaitable, Callable, Iterable
+from typing import TYPE_CHECKING
 
+from utils.metrics import counter, histogram, instrument_methods
 
+# gspread и google-auth импортируются только при подключении к таблице:
+# вместе они заметно замедляют запуск бота
+if TYPE_CHECKING:
+    import gspread
+
+logger = logging.getLogger(__name__)
+
+SHEETS_LATENCY = histogram(
+    "sheets_call_seconds", "Google Sheets client call latency", ["method"]
+)
+SHEETS_ERRORS = counter(
+    "sheets_call_errors_total", "Google Sheets client call errors", ["method", "error"]
+)
+
+
+# Столбцы листа Users по порядку
+USERS_HEADERS = ["user_id", "language", "status"]
+USERS_STATUS_COLUMN = USERS_HEADERS.index("status") + 1
+
+# Столбцы листа Orders по порядку
+ORDER_FIELDS = [
+    "user_id",
+    "username",
+    "room",
+    "portions",
+    "date",
+    "dish_name",
+    "order_id",
+    "status",
+]
+ORDER_ID_COLUMN = ORDER_FIELDS.index("order_id") + 1
+ORDER_STATUS_COLUMN = ORDER_FIELDS.index("status") + 1
+ORDER_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+PENDING_STATUS = "Ожидает подтверждения"
+CONFIRMED_STATUS = "Подтвержден"
+REJECTED_STATUS = "Отменен"
+
+# Закрытые заказы переносятся в помесячные листы Orders_YYYY_MM
+ARCHIVE_PREFIX = "Orders_"
+
+
+def archive_sheet_name(dt: datetime) -> str:
+    """Имя архивного листа для заказа с датой dt"""
+    return f"{ARCHIVE_PREFIX}{dt.year}_{dt.month:02d}"
+
+
+def _contiguous_ranges(rows: List[int]) -> List[Tuple[int, int]]:
+    """Сгруппировать номера строк в непрерывные диапазоны [start, end]"""
+    ranges: List[Tuple[int, int]] = []
+    for row in sorted(rows):
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
+
+
+def build_order_row(
+    user_id: int,
+    username: str,
+    room: str,
+    portions: int,
+    dt: str,
+    dish_name: str,
+    order_id: str,
+    canceled: str,
+) -> List[str]:
+    """Значения строки листа Orders в порядке ORDER_FIELDS"""
+    return [
+        str(user_id),
+        username,
+        room,
+        str(portions),
+        dt,
+        dish_name,
+        order_id,
+        canceled,
+    ]
+
+
+def _appended_row(response: Dict[str, Any]) -> Optional[int]:
+    """Номер строки, в которую append_row записал данные"""
+    from gspread.utils import a1_range_to_grid_range, get_a1_from_absolute_range
+
+    updated_range = response.get("updates", {}).get("updatedRange")
+    if not updated_range:
+        return None
+    grid = a1_range_to_grid_range(get_a1_from_absolute_range(updated_range))
+    return grid["startRowIndex"] + 1
+
+
+# Очереди к квоте: меньше - важнее
+PRIORITY_ORDER = 0  # заказы и действия жителей
+PRIORITY_ADMIN = 1  # решения админа по заказам
+PRIORITY_BACKGROUND = 2  # рассылка, обновление кэшей, архив
+PRIORITY_NAMES = ("order", "admin", "background")
+
+QUOTA_WAIT = histogram(
+    "sheets_quota_wait_seconds", "Time spent waiting for Sheets quota", ["lane"]
+)
+SHEETS_RETRIES = counter(
+    "sheets_retries_total", "Sheets calls retried after an API error", ["status"]
+)
+
+
+def api_error_status(error: BaseException) -> Optional[int]:
+    """HTTP-статус ошибки gspread (None - не ошибка API)"""
+    from gspread.exceptions import APIError
+
+    if isinstance(error, APIError):
+        return error.response.status_code
+    return None
+
+
+def is_retryable(error: BaseException, idempotent: bool = True) -> bool:
+    """Превышение квоты и ошибки сервера Google можно повторить.
+
+    При 5xx запрос мог успеть выполниться, поэтому неидемпотентные вызовы
+    (добавление строк) повторяются только при 429.
+    """
+    status = api_error_status(error)
+    if status == 429:
+        return True
+    return idempotent and status is not None and status >= 500
+
+
+class _QuotaBucket:
+    """Корзина токенов на квоту в минуту и очередь ожидающих по приоритету"""
+
+    def __init__(self, per_minute: float):
+        if per_minute <= 0:
+            raise ValueError(f"Sheets quota must be positive, got {per_minute}")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # Куча [priority, seq, event]
+        self.waiters: List[list] = []
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def remove(self, entry: list):
+        head = self.waiters[0]
+        self.waiters.remove(entry)
+        heapq.heapify(self.waiters)
+        if self.waiters and self.waiters[0] is not head:
+            self.waiters[0][2].set()
+
+
+class QuotaGovernor:
+    """Общий лимит запросов к Google Sheets API.
+
+    Квоты на чтение и запись в минуту ведутся отдельными корзинами токенов.
+    Токены выдаются строго по приоритету: заказы жителей, затем решения
+    админа, затем фоновая работа. Фоновым вызовам не отдается запас
+    reserve от квоты, чтобы после большой рассылки заказы не ждали.
+    Ошибки 429 и 5xx повторяются с экспоненциальной задержкой со случайной
+    составляющей, а 429 дополнительно приостанавливает всю квоту.
+    """
+
+    def __init__(
+        self,
+        read_per_minute: float = 60,
+        write_per_minute: float = 60,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 32.0,
+        reserve: float = 0.2,
+    ):
+        if not 0 <= reserve < 1:
+            raise ValueError(f"Quota reserve must be in [0, 1), got {reserve}")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reserve = reserve
+        self._buckets = {
+            "read": _QuotaBucket(read_per_minute),
+            "write": _QuotaBucket(write_per_minute),
+        }
+        self._seq = itertools.count()
+
+    async def acquire(self, kind: str, priority: int, cost: int = 1):
+        """Дождаться cost токенов квоты kind (read или write)"""
+        if cost <= 0:
+            return
+        bucket = self._buckets[kind]
+        # Чем ниже приоритет, тем больше токенов остается нетронутыми
+        floor = bucket.capacity * self.reserve * priority / PRIORITY_BACKGROUND
+        # Больше capacity - floor токенов в корзине не бывает: такой вызов
+        # ждал бы вечно и держал очередь. Он забирает всю доступную часть
+        cost = min(cost, bucket.capacity - floor)
+        entry = [priority, next(self._seq), asyncio.Event()]
+        previous = bucket.waiters[0] if bucket.waiters else None
+        heapq.heappush(bucket.waiters, entry)
+        if previous is not None and bucket.waiters[0] is entry:
+            previous[2].set()
+        started = time.monotonic()
+        try:
+            while True:
+                if bucket.waiters[0] is not entry:
+                    await entry[2].wait()
+                    entry[2].clear()
+                    continue
+                now = time.monotonic()
+                bucket.refill(now)
+                wait = max(
+                    bucket.paused_until - now,
+                    (cost + floor - bucket.tokens) / bucket.rate,
+                )
+                if wait <= 0:
+                    bucket.tokens -= cost
+                    break
+                try:
+                    await asyncio.wait_for(entry[2].wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                entry[2].clear()
+        finally:
+            bucket.remove(entry)
+        QUOTA_WAIT.observe(time.monotonic() - started, PRIORITY_NAMES[priority])
+
+    def pause(self, kinds: Iterable[str], delay: float):
+        """Не выдавать токены delay секунд (Google ответил 429)"""
+        until = time.monotonic() + delay
+        for kind in kinds:
+            bucket = self._buckets[kind]
+            bucket.paused_until = max(bucket.paused_until, until)
+            bucket.tokens = min(bucket.tokens, 0.0)
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        reads: int = 0,
+        writes: int = 0,
+        priority: int = PRIORITY_BACKGROUND,
+        idempotent: bool = True,
+    ) -> Any:
+        """Выполнить вызов в пределах квоты, повторяя его при 429 и 5xx"""
+        attempt = 0
+        while True:
+            await self.acquire("read", priority, reads)
+            await self.acquire("write", priority, writes)
+            try:
+                return await func()
+            except Exception as e:
+                if not is_retryable(e, idempotent) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                status = api_error_status(e)
+                delay = random.uniform(
+                    self.base_delay, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                if status == 429:
+                    costs = (("read", reads), ("write", writes))
+                    self.pause([kind for kind, cost in costs if cost], delay)
+                SHEETS_RETRIES.inc(status)
+                logger.warning(
+                    "Sheets API error, retrying",
+                    extra={"status": status, "attempt": attempt, "delay": delay},
+                )
+                await asyncio.sleep(delay)
+
+
+# Помощники схемы обычно отвечают из кэша и вызываются из других методов
+@instrument_methods(
+    SHEETS_LATENCY,
+    SHEETS_ERRORS,
+    skip=(
+        "get_worksheet",
+        "get_headers",
+        "set_headers",
+        "check_headers",
+        "invalidate_schema",
+        "get_column",
+    ),
+)
 class GoogleSheetsClient:
-    def __init__(self, creds_file: str):
+    """Синхронный клиент листов таблицы.
+
+    Конструктор не обращается к сети: таблица открывается при первом
+    запросе или заранее через connect().
+    """
+
+    def __init__(
+        self,
+        creds_file: str,
+        spreadsheet: Optional["gspread.Spreadsheet"] = None,
+        spreadsheet_key: str = "",
+        spreadsheet_title: str = "Gourmet",
+    ):
+        self.creds_file = creds_file
+        self.spreadsheet_key = spreadsheet_key
+        self.spreadsheet_title = spreadsheet_title
+        # Готовую таблицу можно передать напрямую (например, заглушку в бенчмарках)
+        self._given = spreadsheet
+        self._spreadsheet: Optional["gspread.Spreadsheet"] = None
+        self._connect_lock = threading.Lock()
+
+        # Кэш листов и схем (заголовок -> номер столбца)
+        self._worksheets: Dict[str, "gspread.Worksheet"] = {}
+        self._headers: Dict[str, List[str]] = {}
+        self._columns: Dict[str, Dict[str, int]] = {}
+        self._schema_lock = threading.Lock()
+
+    @property
+    def spreadsheet(self) -> "gspread.Spreadsheet":
+        if self._spreadsheet is None:
+            self.connect()
+        return self._spreadsheet
+
+    def connect(self):
+        """Открыть таблицу и проверить лист Users (повторный вызов ничего не делает)"""
+        with self._connect_lock:
+            if self._spreadsheet is not None:
+                return
+            spreadsheet = self._given or self._open()
+            self._ensure_users_sheet(spreadsheet)
+            self._spreadsheet = spreadsheet
+
+    def _open(self) -> "gspread.Spreadsheet":
+        import gspread
+        from google.oauth2.service_account import Credentials
+
         scopes = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive",
         ]
-        self.creds = Credentials.from_service_account_file(creds_file, scopes=scopes)
-        self.client = gspread.authorize(self.creds)
-        self.spreadsheet = self.client.open("Gourmet")
+        creds = Credentials.from_service_account_file(self.creds_file, scopes=scopes)
+        client = gspread.authorize(creds)
+        if self.spreadsheet_key:
+            # Один запрос к Sheets API вместо поиска по названию в Drive
+            return client.open_by_key(self.spreadsheet_key)
+        return client.open(self.spreadsheet_title)
+
+    def _ensure_users_sheet(self, spreadsheet: "gspread.Spreadsheet"):
+        """Создать лист Users или его заголовки, если их нет"""
+        from gspread.exceptions import WorksheetNotFound
 
-        # Проверка наличие листа Users и создаем его, если нет
         try:
-            users = self.get_worksheet("Users")
-            # Проверяем заголовки
+            users = spreadsheet.worksheet("Users")
             headers = users.row_values(1)
-            if not headers or len(headers) < 2:
-                print("Creating headers in Users worksheet")
-                users.update("A1:B1", [["user_id", "language"]])
-        except gspread.exceptions.WorksheetNotFound:
-            print("Creating Users worksheet...")
-            self.spreadsheet.add_worksheet(title="Users", rows=1000, cols=2)
-            users = self.get_worksheet("Users")
-            users.update("A1:B1", [["user_id", "language"]])
-            print("Users worksheet created successfully")
+            if not headers or len(headers) < len(USERS_HEADERS):
+                logger.info("Creating headers in Users worksheet")
+                users.update("A1:C1", [USERS_HEADERS])
+                headers = USERS_HEADERS
+        except WorksheetNotFound:
+            logger.info("Creating Users worksheet")
+            users = spreadsheet.add_worksheet(
+                title="Users", rows=1000, cols=len(USERS_HEADERS)
+            )
+            users.update("A1:C1", [USERS_HEADERS])
+            headers = USERS_HEADERS
+        self._worksheets["Users"] = users
+        self.set_headers("Users", headers)
 
     def get_worksheet(self, name: str):
-        return self.spreadsheet.worksheet(name)
+        """Получить лист (объект листа кэшируется)"""
+        worksheet = self._worksheets.get(name)
+        if worksheet is None:
+            worksheet = self.spreadsheet.worksheet(name)
+            self._worksheets[name] = worksheet
+        return worksheet
+
+    def get_headers(self, name: str, refresh: bool = False) -> List[str]:
+        """Получить заголовки листа (из кэша, если они уже известны)"""
+        headers = None if refresh else self._headers.get(name)
+        if headers is None:
+            headers = self.get_worksheet(name).row_values(1)
+            self.set_headers(name, headers)
+        return headers
+
+    def set_headers(self, name: str, headers: List[str]):
+        """Запомнить заголовки листа и пересобрать карту столбцов"""
+        with self._schema_lock:
+            self._headers[name] = list(headers)
+            self._columns[name] = {
+                header: index for index, header in enumerate(headers, start=1)
+            }
+
+    def check_headers(self, name: str, headers: List[str]):
+        """Сверить заголовки из свежего чтения с кэшем и обновить его при расхождении"""
+        if self._headers.get(name) != headers:
+            if name in self._headers:
+                logger.warning(
+                    "Header mismatch, schema cache invalidated", extra={"sheet": name}
+                )
+            self.set_headers(name, headers)
+
+    def invalidate_schema(self, name: str):
+        with self._schema_lock:
+            self._headers.pop(name, None)
+            self._columns.pop(name, None)
+
+    def get_column(self, name: str, header: str) -> int:
+        """Номер столбца (с 1) по названию заголовка"""
+        self.get_headers(name)
+        column = self._columns[name].get(header)
+        if column is None:
+            # Заголовки могли поменяться в таблице - перечитываем один раз
+            self.get_headers(name, refresh=True)
+            column = self._columns[name].get(header)
+            if column is None:
+                raise KeyError(f"Column {header!r} not found in {name}")
+        return column
 
     def get_all_users(self) -> List[Dict[str, str]]:
         """Получить список всех пользователей"""
@@ -37,7 +425,6 @@ class GoogleSheetsClient:
             users = self.get_worksheet("Users")
             #  все значения из таблицы
             all_values = users.get_all_values()
-            print(f"All values from Users: {all_values}")
 
             # Преобразуем данные
             result = []
@@ -51,27 +438,114 @@ class GoogleSheetsClient:
                 language = str(row[1]).strip() if len(row) > 1 and row[1] else "ru"
 
                 result.append({"user_id": user_id, "language": language})
-                print(f"Added user: {user_id} with language {language}")
 
-            print(f"Total users found: {len(result)}")
+            logger.debug("Users read", extra={"users": len(result)})
             return result
 
         except Exception as e:
-            print(f"Error getting users: {e}")
+            if is_retryable(e):
+                raise
+            logger.error("Error getting users: %s", e)
             return []
 
+    def get_user_rows(self) -> List[Tuple[int, str, str]]:
+        """Получить пользователей вместе с номерами строк одним запросом"""
+        users = self.get_worksheet("Users")
+        result = []
+        for row_index, row in enumerate(users.get_all_values(), start=1):
+            if not row or not row[0] or row[0] == "user_id":
+                continue
+            language = str(row[1]).strip() if len(row) > 1 and row[1] else "ru"
+            result.append((row_index, str(row[0]).strip(), language))
+        return result
+
+    def append_user(self, user_id: int, language: str = "ru") -> Optional[int]:
+        """Добавить строку пользователя и вернуть её номер"""
+        users = self.get_worksheet("Users")
+        response = users.append_row([str(user_id), language])
+        return _appended_row(response)
+
+    def set_user_language_at(self, row_index: int, language: str):
+        """Обновить язык пользователя по известному номеру строки"""
+        users = self.get_worksheet("Users")
+        users.update_cell(row_index, 2, language)
+
+    def get_column_values(self, name: str, col: int) -> List[str]:
+        """Значения столбца col листа name, начиная с заголовка"""
+        return self.get_worksheet(name).col_values(col)
+
+    def append_rows(self, name: str, rows: List[List[Any]]) -> Optional[int]:
+        """Добавить несколько строк одним запросом и вернуть номер первой"""
+        response = self.get_worksheet(name).append_rows(rows)
+        return _appended_row(response)
+
+    def update_cells(self, name: str, cells: List[Tuple[int, int, Any]]):
+        """Обновить несколько ячеек одним batch_update"""
+        from gspread.utils import rowcol_to_a1
+
+        data = [
+            {"range": rowcol_to_a1(row, col), "values": [[value]]}
+            for row, col, value in cells
+        ]
+        self.get_worksheet(name).batch_update(data, raw=False)
+
+    def update_keyed_cells(
+        self,
+        name: str,
+        key_column: int,
+        cells: List[Tuple[str, int, Any]],
+        hints: Optional[Dict[str, int]] = None,
+    ) -> List[str]:
+        """Обновить ячейки строк, найденных по значению в key_column.
+
+        hints - известные номера строк ключей: перед batch_update их ячейки
+        key_column читаются одним batch_get, и запись идет туда, где ключ
+        совпал. Остальные строки ищутся чтением всего столбца. Так запись
+        не попадет в чужую строку, если строки сдвинулись. Возвращает
+        найденные ключи.
+        """
+        from gspread.utils import rowcol_to_a1
+
+        worksheet = self.get_worksheet(name)
+        keys = {str(key) for key, _, _ in cells}
+        rows = {}
+        hinted = [(key, row) for key, row in (hints or {}).items() if key in keys]
+        if hinted:
+            values = worksheet.batch_get(
+                [rowcol_to_a1(row, key_column) for _, row in hinted]
+            )
+            for (key, row), value in zip(hinted, values):
+                if value and value[0] and str(value[0][0]) == key:
+                    rows[key] = row
+        if keys - rows.keys():
+            # Строка сдвинулась или не была известна - ищем по всему столбцу
+            for row_index, value in enumerate(
+                worksheet.col_values(key_column), start=1
+            ):
+                rows.setdefault(str(value), row_index)
+        found = [(str(key), col, value) for key, col, value in cells if str(key) in rows]
+        if found:
+            self.update_cells(
+                name, [(rows[key], col, value) for key, col, value in found]
+            )
+        return [key for key, _, _ in found]
+
     def get_unsent_announcements(self) -> List[Dict[str, Any]]:
         """Получить неотправленные анонсы"""
         anonce = self.get_worksheet("Anonces")
-        all_values = anonce.get_all_records()
-        headers = anonce.row_values(1)
+        all_values = anonce.get_all_values()
+        if not all_values:
+            return []
+        headers = all_values[0]
+        self.check_headers("Anonces", headers)
 
         unsent = []
-        for idx, row in enumerate(
-            all_values, start=2
+        for idx, values in enumerate(
+            all_values[1:], start=2
         ):  # start=2 потому что первая строка - заголовки
-            if row.get("Отправлено", "").lower() == "false":
-                announcement = dict(zip(headers, row.values()))
+            row = dict(zip(headers, values + [""] * (len(headers) - len(values))))
+            if str(row.get("Отправлено", "")).lower() == "false":
+                announcement = dict(row)
                 announcement["row_index"] = idx  # Добавляем индекс строки
                 unsent.append(announcement)
         return unsent
@@ -81,42 +555,41 @@ class GoogleSheetsClient:
         try:
             anonce = self.get_worksheet("Anonces")
             # Находим столбец "Отправлено"
-            headers = anonce.row_values(1)
-            sent_column = (
-                headers.index("Отправлено") + 1
-            )  # +1 потому что индексация с 1
-            print(f"Marking announcement in row {row_index} as sent")
+            sent_column = self.get_column("Anonces", "Отправлено")
             anonce.update_cell(row_index, sent_column, "TRUE")
-            print("Successfully marked as sent")
+            logger.info("Announcement marked as sent", extra={"row": row_index})
         except Exception as e:
-            print(f"Error marking announcement as sent: {e}")
+            logger.error(
+                "Error marking announcement as sent: %s", e, extra={"row": row_index}
+            )
             raise
 
     def add_user(self, user_id: int, language: str = "ru"):
         """Добавить нового пользователя"""
         try:
-            print(f"Attempting to add user {user_id} with language {language}")
             users = self.get_worksheet("Users")
-            print("Got worksheet 'Users'")
 
             # Проверяем, есть ли уже пользователь с таким user_id
             try:
                 user_cell = users.find(str(user_id))
                 if user_cell:
-                    print(f"User {user_id} already exists, updating language")
+                    logger.debug(
+                        "User already exists, updating language",
+                        extra={"user_id": user_id},
+                    )
                     users.update_cell(user_cell.row, 2, language)
                 else:
-                    print(f"Adding new user {user_id}")
                     users.append_row([str(user_id), language])
-                    print("User added successfully")
+                    logger.info("User added", extra={"user_id": user_id})
             except Exception as e:
-                print(f"Error in user operation: {e}")
+                if is_retryable(e):
+                    raise
+                logger.warning("Error looking up user, adding a new row: %s", e)
                 # Если не нашли пользователя, добавляем новую строку
-                print("Adding new user row")
                 users.append_row([str(user_id), language])
-                print("User added successfully")
+                logger.info("User added", extra={"user_id": user_id})
         except Exception as e:
-            print(f"Critical error in add_user: {e}")
+            logger.error("Error adding user: %s", e, extra={"user_id": user_id})
             raise
 
     def get_user_language(self, user_id: int) -> str:
@@ -144,38 +617,169 @@ class GoogleSheetsClient:
         dt: str,
         dish_name: str,
         order_id: str,
-        canceled: str = "Ожидает подтверждения",
+        canceled: str = PENDING_STATUS,
     ):
-        """Добавить новый заказ"""
+        """Добавить новый заказ и вернуть номер его строки"""
         orders = self.get_worksheet("Orders")
-        orders.append_row(
-            [
-                str(user_id),
-                username,
-                room,
-                str(portions),
-                dt,
-                dish_name,
-                order_id,
-                canceled,
-            ]
+        response = orders.append_row(
+            build_order_row(
+                user_id, username, room, portions, dt, dish_name, order_id, canceled
+            )
         )
+        return _appended_row(response)
 
-    def update_order_status(self, order_id: str, status: str):
-        """Обновить статус заказа"""
+    def get_order_index(self) -> List[Tuple[int, str, str, str, str]]:
+        """Строка, user_id, дата, ID и статус всех заказов одним batch_get"""
         orders = self.get_worksheet("Orders")
-        # Преобразуем order_id в строку для поиска
-        order_cell = orders.find(str(order_id))
-        if order_cell:
-            orders.update_cell(order_cell.row, 8, status)  # 8-й столбец - статус отмены
-            return True
-        return False
+        # Столбцы A (user_id), E (дата), G:H (ID заказа и статус)
+        user_ids, dates, ids_statuses = orders.batch_get(["A2:A", "E2:E", "G2:H"])
+
+        def value(rows, index, column=0):
+            if index < len(rows) and column < len(rows[index]):
+                return str(rows[index][column])
+            return ""
+
+        result = []
+        for index in range(max(len(user_ids), len(ids_statuses))):
+            result.append(
+                (
+                    index + 2,
+                    value(user_ids, index),
+                    value(dates, index),
+                    value(ids_statuses, index),
+                    value(ids_statuses, index, 1),
+                )
+            )
+        return result
+
+    def get_all_orders(self) -> List[Dict[str, Any]]:
+        """Все заказы листа Orders одним чтением"""
+        all_values = self.get_worksheet("Orders").get_all_values()
+        orders = []
+        for row_index, values in enumerate(all_values[1:], start=2):
+            if len(values) < ORDER_ID_COLUMN or not values[ORDER_ID_COLUMN - 1]:
+                continue
+            values = values + [""] * (len(ORDER_FIELDS) - len(values))
+            order = dict(zip(ORDER_FIELDS, values))
+            order["row"] = row_index
+            orders.append(order)
+        return orders
+
+    def get_order_row(self, row_index: int) -> List[str]:
+        """Прочитать всю строку заказа одним запросом"""
+        from gspread.utils import rowcol_to_a1
+
+        orders = self.get_worksheet("Orders")
+        last_column = rowcol_to_a1(row_index, len(ORDER_FIELDS))
+        values = orders.get(f"A{row_index}:{last_column}")
+        return list(values[0]) if values else []
+
+    def get_archive_names(self) -> List[str]:
+        """Архивные листы заказов, от новых к старым"""
+        names = [
+            worksheet.title
+            for worksheet in self.spreadsheet.worksheets()
+            if worksheet.title.startswith(ARCHIVE_PREFIX)
+        ]
+        return sorted(names, reverse=True)
+
+    def find_archived_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Найти заказ в архивных листах"""
+        order_id = str(order_id)
+        for name in self.get_archive_names():
+            archive = self.get_worksheet(name)
+            order_ids = archive.col_values(ORDER_ID_COLUMN)
+            if order_id not in order_ids:
+                continue
+            row_index = order_ids.index(order_id) + 1
+            values = archive.row_values(row_index)
+            values = values + [""] * (len(ORDER_FIELDS) - len(values))
+            order = dict(zip(ORDER_FIELDS, values))
+            order["row"] = None
+            order["archive"] = name
+            return order
+        return None
+
+    def _get_archive(self, name: str, headers: List[str]):
+        from gspread.exceptions import WorksheetNotFound
+
+        try:
+            return self.get_worksheet(name)
+        except WorksheetNotFound:
+            logger.info("Creating archive worksheet", extra={"sheet": name})
+            archive = self.spreadsheet.add_worksheet(
+                title=name, rows=1000, cols=len(ORDER_FIELDS)
+            )
+            archive.append_row(headers)
+            self._worksheets[name] = archive
+            return archive
+
+    def archive_orders(self, older_than: datetime) -> int:
+        """Перенести закрытые заказы старше older_than в помесячные архивы.
+
+        Возвращает количество перенесенных строк. Строки копируются одним
+        append_rows на месяц, а из Orders удаляются одним batch_update.
+        """
+        orders = self.get_worksheet("Orders")
+        all_values = orders.get_all_values()
+        if len(all_values) < 2:
+            return 0
+        headers = all_values[0]
+        self.check_headers("Orders", headers)
+
+        by_month: Dict[str, List[List[str]]] = {}
+        moved_rows = []
+        for row_index, values in enumerate(all_values[1:], start=2):
+            values = values + [""] * (len(ORDER_FIELDS) - len(values))
+            status = values[ORDER_STATUS_COLUMN - 1]
+            if not status or status == PENDING_STATUS:
+                continue
+            try:
+                dt = datetime.strptime(values[4], ORDER_DATE_FORMAT)
+            except ValueError:
+                continue
+            if dt >= older_than:
+                continue
+            by_month.setdefault(archive_sheet_name(dt), []).append(values)
+            moved_rows.append(row_index)
+
+        if not moved_rows:
+            return 0
+
+        for name, rows in by_month.items():
+            archive = self._get_archive(name, headers)
+            # Если прошлый перенос прервался после копирования, не дублируем строки
+            existing = set(archive.col_values(ORDER_ID_COLUMN))
+            new_rows = [row for row in rows if row[ORDER_ID_COLUMN - 1] not in existing]
+            if new_rows:
+                archive.append_rows(new_rows)
+
+        # Удаляем снизу вверх, чтобы номера оставшихся диапазонов не сдвигались
+        requests = [
+            {
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": orders.id,
+                        "dimension": "ROWS",
+                        "startIndex": start - 1,
+                        "endIndex": end,
+                    }
+                }
+            }
+            for start, end in reversed(_contiguous_ranges(moved_rows))
+        ]
+        self.spreadsheet.batch_update({"requests": requests})
+        logger.info(
+            "Archived orders",
+            extra={"orders": len(moved_rows), "sheets": ",".join(by_month)},
+        )
+        return len(moved_rows)
 
     def get_last_user_order(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получить последний заказ пользователя"""
         orders = self.get_worksheet("Orders")
         # Получаем заголовки таблицы
-        headers = orders.row_values(1)
+        headers = self.get_headers("Orders")
         # Получаем все заказы
         all_orders = orders.get_all_records()
         # Фильтруем заказы пользователя
@@ -190,7 +794,7 @@ class GoogleSheetsClient:
         """Получить анонс по ID (номеру строки)"""
         try:
             anonce = self.get_worksheet("Anonces")
-            headers = anonce.row_values(1)
+            headers = self.get_headers("Anonces")
             row_values = anonce.row_values(row_index)
 
             if not row_values:
@@ -198,5 +802,8 @@ class GoogleSheetsClient:
 
             return dict(zip(headers, row_values))
         except Exception as e:
-            print(f"Error getting announcement by id: {e}")
+            if is_retryable(e):
+                # Квоту исчерпали - пусть QuotaGovernor повторит вызов
+                raise
+            logger.error("Error getting announcement: %s", e, extra={"row": row_index})
             return None
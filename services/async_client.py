@@ -0,0 +1,298 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from services.api_client import (
+    PRIORITY_ADMIN,
+    PRIORITY_BACKGROUND,
+    PRIORITY_ORDER,
+    GoogleSheetsClient,
+    QuotaGovernor,
+)
+
+
+def _write_priority(name: str, append: bool) -> int:
+    """Новые строки Orders - заказы жителей, правки Orders - решения админа"""
+    if name != "Orders":
+        return PRIORITY_BACKGROUND
+    return PRIORITY_ORDER if append else PRIORITY_ADMIN
+
+
+def _release(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, _):
+    # Вызывается из потока пула, когда вызов Google Sheets завершился
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        pass  # цикл событий уже закрыт
+
+
+class AsyncSheetsClient:
+    """Асинхронный фасад над GoogleSheetsClient.
+
+    Все запросы к gspread выполняются в ограниченном пуле потоков, поэтому
+    цикл событий aiogram не блокируется на сетевых вызовах к Google Sheets.
+    Для каждого листа действует свой лимит одновременных запросов, а каждый
+    вызов ограничен таймаутом. Если задан governor, вызовы укладываются в
+    квоту Google API: для каждого метода указано число запросов на чтение и
+    запись и приоритет.
+    """
+
+    def __init__(
+        self,
+        client: GoogleSheetsClient,
+        max_workers: int = 4,
+        per_sheet_limit: int = 2,
+        timeout: float = 15.0,
+        governor: Optional[QuotaGovernor] = None,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.governor = governor
+        self.per_sheet_limit = per_sheet_limit
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="sheets"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_semaphore(self, sheet: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(sheet)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_sheet_limit)
+            self._semaphores[sheet] = semaphore
+        return semaphore
+
+    async def run(
+        self,
+        sheet: str,
+        func: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        wait: bool = False,
+        reads: int = 0,
+        writes: int = 0,
+        priority: int = PRIORITY_BACKGROUND,
+        idempotent: bool = True,
+        **kwargs,
+    ) -> Any:
+        """Выполнить синхронный вызов в пуле потоков с лимитом по листу.
+
+        С wait=True таймаута нет: вызов, который нельзя бросить на середине,
+        дожидается завершения потока. idempotent=False - вызов нельзя
+        повторять после 5xx (см. is_retryable).
+        """
+        loop = asyncio.get_running_loop()
+
+        async def call():
+            semaphore = self._get_semaphore(sheet)
+            await semaphore.acquire()
+            try:
+                thread_future = self._executor.submit(partial(func, *args, **kwargs))
+            except BaseException:
+                semaphore.release()
+                raise
+            # Место в лимите листа освобождается, когда поток действительно
+            # закончил: после таймаута вызов продолжает выполняться в пуле
+            thread_future.add_done_callback(partial(_release, loop, semaphore))
+            result = asyncio.wrap_future(thread_future)
+            if wait:
+                return await asyncio.shield(result)
+            # При таймауте или отмене результат потока просто отбрасывается
+            return await asyncio.wait_for(result, timeout or self.timeout)
+
+        if self.governor is None:
+            return await call()
+        return await self.governor.call(call, reads, writes, priority, idempotent)
+
+    async def connect(self):
+        """Открыть таблицу заранее, не дожидаясь первого запроса"""
+        await self.run("Users", self.client.connect, reads=2, priority=PRIORITY_ORDER)
+
+    async def close(self):
+        """Остановить пул потоков"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Заголовки почти всегда берутся из кэша - квоту не резервируем
+    async def get_headers(self, name: str) -> List[str]:
+        return await self.run(name, self.client.get_headers, name)
+
+    async def get_column(self, name: str, header: str) -> int:
+        return await self.run(name, self.client.get_column, name, header)
+
+    async def get_column_values(self, name: str, col: int) -> List[str]:
+        return await self.run(name, self.client.get_column_values, name, col, reads=1)
+
+    async def append_rows(self, name: str, rows: List[List[Any]]) -> Optional[int]:
+        return await self.run(
+            name,
+            self.client.append_rows,
+            name,
+            rows,
+            writes=1,
+            priority=_write_priority(name, append=True),
+            idempotent=False,
+        )
+
+    async def update_cells(self, name: str, cells: List[Tuple[int, int, Any]]):
+        return await self.run(
+            name,
+            self.client.update_cells,
+            name,
+            cells,
+            writes=1,
+            priority=_write_priority(name, append=False),
+        )
+
+    async def update_keyed_cells(
+        self,
+        name: str,
+        key_column: int,
+        cells: List[Tuple[str, int, Any]],
+        hints: Optional[Dict[str, int]] = None,
+    ) -> List[str]:
+        return await self.run(
+            name,
+            self.client.update_keyed_cells,
+            name,
+            key_column,
+            cells,
+            hints,
+            reads=1,
+            writes=1,
+            priority=_write_priority(name, append=False),
+        )
+
+    async def get_all_users(self) -> List[Dict[str, str]]:
+        return await self.run("Users", self.client.get_all_users, reads=1)
+
+    async def add_user(self, user_id: int, language: str = "ru"):
+        return await self.run(
+            "Users",
+            self.client.add_user,
+            user_id,
+            language,
+            reads=1,
+            writes=1,
+            priority=PRIORITY_ORDER,
+        )
+
+    async def get_user_language(self, user_id: int) -> str:
+        return await self.run(
+            "Users",
+            self.client.get_user_language,
+            user_id,
+            reads=2,
+            priority=PRIORITY_ORDER,
+        )
+
+    async def update_user_language(self, user_id: int, language: str):
+        return await self.run(
+            "Users",
+            self.client.update_user_language,
+            user_id,
+            language,
+            reads=1,
+            writes=1,
+            priority=PRIORITY_ORDER,
+        )
+
+    async def get_user_rows(self) -> List[Tuple[int, str, str]]:
+        return await self.run("Users", self.client.get_user_rows, reads=1)
+
+    async def append_user(self, user_id: int, language: str = "ru") -> Optional[int]:
+        return await self.run(
+            "Users",
+            self.client.append_user,
+            user_id,
+            language,
+            writes=1,
+            priority=PRIORITY_ORDER,
+            idempotent=False,
+        )
+
+    async def set_user_language_at(self, row_index: int, language: str):
+        return await self.run(
+            "Users",
+            self.client.set_user_language_at,
+            row_index,
+            language,
+            writes=1,
+            priority=PRIORITY_ORDER,
+        )
+
+    async def get_unsent_announcements(self) -> List[Dict[str, Any]]:
+        return await self.run("Anonces", self.client.get_unsent_announcements, reads=1)
+
+    async def mark_announcement_sent(self, row_index: int):
+        return await self.run(
+            "Anonces", self.client.mark_announcement_sent, row_index, writes=1
+        )
+
+    async def get_announcement_by_id(self, row_index: int) -> Optional[Dict[str, Any]]:
+        return await self.run(
+            "Anonces",
+            self.client.get_announcement_by_id,
+            row_index,
+            reads=1,
+            priority=PRIORITY_ORDER,
+        )
+
+    async def add_order(self, **order) -> Optional[int]:
+        return await self.run(
+            "Orders",
+            self.client.add_order,
+            writes=1,
+            priority=PRIORITY_ORDER,
+            idempotent=False,
+            **order,
+        )
+
+    async def get_order_index(self) -> List[Tuple[int, str, str, str, str]]:
+        return await self.run("Orders", self.client.get_order_index, reads=1)
+
+    async def get_all_orders(
+        self, priority: int = PRIORITY_BACKGROUND
+    ) -> List[Dict[str, Any]]:
+        return await self.run(
+            "Orders", self.client.get_all_orders, reads=1, priority=priority
+        )
+
+    async def get_order_row(self, row_index: int) -> List[str]:
+        return await self.run(
+            "Orders",
+            self.client.get_order_row,
+            row_index,
+            reads=1,
+            priority=PRIORITY_ADMIN,
+        )
+
+    async def find_archived_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        return await self.run(
+            "Orders",
+            self.client.find_archived_order,
+            order_id,
+            reads=2,
+            priority=PRIORITY_ADMIN,
+        )
+
+    async def archive_orders(self, older_than: datetime) -> int:
+        # Перенос удаляет строки: пока он идет, запись по номерам строк
+        # недопустима, поэтому ждем его до конца, а не по таймауту
+        return await self.run(
+            "Orders",
+            self.client.archive_orders,
+            older_than,
+            wait=True,
+            reads=2,
+            writes=3,
+        )
+
+    async def get_last_user_order(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.run(
+            "Orders",
+            self.client.get_last_user_order,
+            user_id,
+            reads=1,
+            priority=PRIORITY_ORDER,
+        )
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+from aiogram.types import Message
+
+from services.delivery_ledger import DeliveryLedger
+
+logger = logging.getLogger(__name__)
+
+# Размер словаря пауз по чатам, с которого начинается чистка устаревших
+_CHAT_PRUNE_MIN = 1024
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    # Клавиатура или ее готовый JSON (keyboards.builders.prepared_*)
+    reply_markup: Any = None
+
+
+class SendPreparedMessage(SendMessage):
+    """sendMessage с клавиатурой, уже сериализованной в JSON.
+
+    Строку сессия aiogram отправляет как есть - одна и та же клавиатура
+    рассылки не валидируется и не кодируется заново для каждого получателя.
+    """
+
+    reply_markup: Optional[str] = None
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    errors: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.sent - self.failed
+
+
+class RateLimiter:
+    """Равномерно распределяет вызовы: не больше rate штук в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause_until(self, moment: float):
+        self._next = max(self._next, moment)
+
+
+class BroadcastEngine:
+    """Конкурентная рассылка с учетом лимитов Telegram.
+
+    Сообщения отправляются несколькими воркерами, но не быстрее глобального
+    лимита (около 30 сообщений в секунду) и не чаще одного сообщения в
+    per_chat_interval в один чат. TelegramRetryAfter приостанавливает весь
+    конвейер. Рассылка идет в фоне, а прогресс показывается редактированием
+    одного сообщения администратора. Результат доставки каждому чату
+    записывается в журнал доставки, если он передан.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate_limit: float = 30.0,
+        per_chat_interval: float = 1.0,
+        workers: int = 10,
+        progress_interval: float = 3.0,
+        max_attempts: int = 3,
+        ledger: Optional[DeliveryLedger] = None,
+    ):
+        self.bot = bot
+        self.ledger = ledger
+        self.rate_limit = rate_limit
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.max_attempts = max_attempts
+        self._limiter = RateLimiter(rate_limit)
+        self._chat_next: Dict[int, float] = {}
+        self._chat_prune_at = _CHAT_PRUNE_MIN
+        self._paused_until = 0.0
+        self._jobs: Set[asyncio.Task] = set()
+
+    def start(
+        self,
+        messages: Iterable[OutgoingMessage],
+        progress_message: Optional[Message] = None,
+        title: str = "Рассылка",
+        on_done: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = None,
+    ) -> asyncio.Task:
+        """Запустить рассылку в фоне"""
+        task = asyncio.create_task(self.run(messages, progress_message, title, on_done))
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+        return task
+
+    async def stop(self):
+        """Отменить незавершенные рассылки"""
+        for task in list(self._jobs):
+            task.cancel()
+        if self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    async def run(
+        self,
+        messages: Iterable[OutgoingMessage],
+        progress_message: Optional[Message] = None,
+        title: str = "Рассылка",
+        on_done: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = None,
+        stats: Optional[BroadcastStats] = None,
+    ) -> BroadcastStats:
+        """Отправить все сообщения и вернуть статистику"""
+        messages = list(messages)
+        if stats is None:
+            stats = BroadcastStats()
+        stats.total = len(messages)
+        queue: asyncio.Queue = asyncio.Queue()
+        for outgoing in messages:
+            queue.put_nowait(outgoing)
+
+        workers = [
+            asyncio.create_task(self._worker(queue, stats))
+            for _ in range(min(self.workers, len(messages)) or 1)
+        ]
+        progress = None
+        if progress_message is not None:
+            progress = asyncio.create_task(
+                self._report_progress(progress_message, title, stats)
+            )
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if progress is not None:
+                progress.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if self.ledger is not None:
+                self.ledger.save()
+
+        if progress_message is not None:
+            await self._edit_progress(
+                progress_message, self.format_progress(title, stats, finished=True)
+            )
+        if on_done is not None:
+            try:
+                await on_done(stats)
+            except Exception:
+                logger.exception("Error in broadcast completion callback")
+        return stats
+
+    async def _worker(self, queue: asyncio.Queue, stats: BroadcastStats):
+        while True:
+            outgoing = await queue.get()
+            try:
+                await self._deliver(outgoing, stats)
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, outgoing: OutgoingMessage, stats: BroadcastStats):
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_slot(outgoing.chat_id)
+            try:
+                if isinstance(outgoing.reply_markup, str):
+                    await self.bot(
+                        SendPreparedMessage(
+                            chat_id=outgoing.chat_id,
+                            text=outgoing.text,
+                            reply_markup=outgoing.reply_markup,
+                        )
+                    )
+                else:
+                    await self.bot.send_message(
+                        chat_id=outgoing.chat_id,
+                        text=outgoing.text,
+                        reply_markup=outgoing.reply_markup,
+                    )
+                stats.sent += 1
+                if self.ledger is not None:
+                    self.ledger.record_sent(outgoing.chat_id)
+                return
+            except TelegramRetryAfter as e:
+                # Флуд-контроль касается всего бота - останавливаем всех воркеров
+                logger.warning(
+                    "Flood control, pausing broadcast",
+                    extra={"retry_after": e.retry_after},
+                )
+                self._paused_until = max(
+                    self._paused_until, loop.time() + e.retry_after
+                )
+                self._limiter.pause_until(self._paused_until)
+                if attempt == self.max_attempts:
+                    await self._failed(outgoing, stats, e)
+            except Exception as e:
+                logger.warning(
+                    "Error sending message: %s", e, extra={"chat_id": outgoing.chat_id}
+                )
+                await self._failed(outgoing, stats, e)
+                return
+
+    async def _failed(
+        self, outgoing: OutgoingMessage, stats: BroadcastStats, error: Exception
+    ):
+        stats.failed += 1
+        stats.errors[outgoing.chat_id] = str(error)
+        if self.ledger is not None:
+            await self.ledger.record_failed(outgoing.chat_id, error)
+
+    async def _wait_slot(self, chat_id: int):
+        loop = asyncio.get_running_loop()
+        pause = self._paused_until - loop.time()
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+        # Лимит на один чат: сообщения в один чат не чаще per_chat_interval
+        now = loop.time()
+        if len(self._chat_next) >= self._chat_prune_at:
+            # Прошедшие моменты ничего не ограничивают - иначе словарь рос бы
+            # с каждой рассылкой на всех получателей
+            self._chat_next = {
+                chat: until for chat, until in self._chat_next.items() if until > now
+            }
+            self._chat_prune_at = max(2 * len(self._chat_next), _CHAT_PRUNE_MIN)
+        chat_next = self._chat_next.get(chat_id, 0.0)
+        self._chat_next[chat_id] = max(now, chat_next) + self.per_chat_interval
+        if chat_next > now:
+            await asyncio.sleep(chat_next - now)
+
+        await self._limiter.acquire()
+
+    @staticmethod
+    def format_progress(
+        title: str, stats: BroadcastStats, finished: bool = False
+    ) -> str:
+        status = "завершена" if finished else "идет"
+        return (
+            f"📣 {title} {status}\n\n"
+            f"✅ Отправлено: {stats.sent}\n"
+            f"❌ Ошибок: {stats.failed}\n"
+            f"⏳ Осталось: {stats.remaining}"
+        )
+
+    async def _report_progress(
+        self, message: Message, title: str, stats: BroadcastStats
+    ):
+        last_text = None
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            text = self.format_progress(title, stats)
+            if text != last_text:
+                await self._edit_progress(message, text)
+                last_text = text
+
+    async def _edit_progress(self, message: Message, text: str):
+        try:
+            await self.bot.edit_message_text(
+                text=text, chat_id=message.chat.id, message_id=message.message_id
+            )
+        except Exception as e:
+            logger.warning("Error updating broadcast progress: %s", e)
@@ -0,0 +1,388 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS
+
+logger = logging.getLogger(__name__)
+
+# Необязательные столбцы листа Anonces
+CAPACITY_HEADER = "Лимит порций"
+BOOKED_HEADER = "Забронировано"
+
+
+def _parse_count(value: Any) -> Optional[int]:
+    try:
+        return max(int(str(value).strip()), 0)
+    except ValueError:
+        return None
+
+
+@dataclass
+class _Stock:
+    # Доля этого процесса и лимит анонса на все воркеры
+    capacity: int
+    total: int
+    booked: int = 0
+    # user_id -> (порции, момент истечения удержания)
+    holds: Dict[int, Tuple[int, float]] = field(default_factory=dict)
+    # В листе есть столбец "Забронировано" - счетчик нужно туда писать
+    persisted: bool = False
+    # Когда анонс последний раз читался или по нему списывали (time.time())
+    seen: float = field(default_factory=time.time)
+    # Порции, переданные другим воркерам (отрицательное - полученные от них)
+    moved: int = 0
+
+
+class PortionCapacity:
+    """Лимит порций по анонсам, который ведется в памяти.
+
+    Лимит задается необязательным столбцом "Лимит порций" листа Anonces.
+    Порции, которые житель ввел при бронировании, удерживаются на время
+    оформления (hold_ttl секунд) и списываются при создании заказа.
+    Проверка и списание не прерываются await, поэтому атомарны в цикле
+    событий: при наплыве после рассылки лимит не превышается. Счетчики из
+    таблицы читаются только при первом появлении анонса, а число списанных
+    порций пачками пишется в столбец "Забронировано" через persist.
+
+    С несколькими воркерами каждый получает свою долю лимита (shard из
+    shards), а счетчик в таблицу не пишется: у воркеров он разный. Когда
+    доля кончается, недостающие порции занимаются у других воркеров через
+    borrow. Отмену заказа, списанного другим воркером, передает ему forward.
+    Списанные порции и заказы этого процесса хранятся еще и в локальном
+    файле state_path. При запуске и затем каждые check_interval секунд
+    заказы сверяются с хранилищем через lookup: порции заказов, отмененных
+    пока бот не работал или на другом воркере, возвращаются. Анонсы, которые
+    не читались retention секунд, забываются.
+    """
+
+    def __init__(
+        self,
+        hold_ttl: float = 900.0,
+        shard: int = 0,
+        shards: int = 1,
+        flush_interval: float = 1.0,
+        state_path: Optional[str] = None,
+        retention: float = 14 * 86400.0,
+        check_interval: float = 1800.0,
+    ):
+        self.hold_ttl = hold_ttl
+        self.shard = shard
+        self.shards = shards
+        self.flush_interval = flush_interval
+        self.state_path = state_path
+        self.retention = retention
+        self.check_interval = check_interval
+        # Запись счетчиков {анонс: списано}; задает хранилище
+        self.persist: Optional[Callable[[Dict[int, int]], Awaitable[Any]]] = None
+        # Заказ по ID из хранилища (None - не найден); задает хранилище
+        self.lookup: Optional[Callable[[str], Awaitable[Optional[Dict[str, Any]]]]] = (
+            None
+        )
+        # Занять у других воркеров (анонс, порции, весь лимит) -> сколько дали
+        self.borrow: Optional[Callable[[int, int, int], Awaitable[int]]] = None
+        # Передать отмену чужого заказа воркеру, который его списал
+        self.forward: Optional[Callable[[str], Any]] = None
+        self._stocks: Dict[int, _Stock] = {}
+        # Счетчики из файла по анонсам, которые еще не читались:
+        # (списано, seen, передано)
+        self._saved: Dict[int, Tuple[int, float, int]] = {}
+        # order_id -> (анонс, порции): отмена заказа возвращает порции
+        self._orders: Dict[str, Tuple[int, int]] = {}
+        self._dirty: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._check_task: Optional[asyncio.Task] = None
+
+    def load(self):
+        """Прочитать списанные порции и заказы из файла состояния"""
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding="utf-8") as state_file:
+            raw = json.load(state_file)
+        self._saved = {
+            # В старых файлах переданных порций нет
+            int(announcement_id): (
+                entry[0],
+                entry[1],
+                entry[2] if len(entry) > 2 else 0,
+            )
+            for announcement_id, entry in raw["announcements"].items()
+        }
+        self._orders = {
+            order_id: (announcement_id, portions)
+            for order_id, (announcement_id, portions) in raw["orders"].items()
+        }
+
+    def save(self):
+        """Атомарно записать файл состояния"""
+        if self.state_path is None:
+            return
+        cutoff = time.time() - self.retention
+        for announcement_id in [
+            a for a, stock in self._stocks.items() if stock.seen < cutoff
+        ]:
+            del self._stocks[announcement_id]
+        self._saved = {a: v for a, v in self._saved.items() if v[1] >= cutoff}
+        announcements = {
+            str(a): [stock.booked, stock.seen, stock.moved]
+            for a, stock in self._stocks.items()
+        }
+        announcements.update((str(a), list(entry)) for a, entry in self._saved.items())
+        self._orders = {
+            order_id: entry
+            for order_id, entry in self._orders.items()
+            if str(entry[0]) in announcements
+        }
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as state_file:
+            json.dump(
+                {"announcements": announcements, "orders": self._orders}, state_file
+            )
+        os.replace(tmp_path, self.state_path)
+
+    def start(self):
+        """Загрузить состояние и сверять заказы из него с хранилищем в фоне"""
+        self.load()
+        if self.lookup is not None:
+            self._check_task = asyncio.create_task(self._check_loop())
+
+    async def _check_loop(self):
+        # check_interval=0 - сверка только при запуске
+        while True:
+            await self.check_orders()
+            if not self.check_interval:
+                return
+            await asyncio.sleep(self.check_interval)
+
+    async def check_orders(self):
+        """Вернуть порции заказов, которые в хранилище уже отменены"""
+        for order_id in list(self._orders):
+            try:
+                order = await self.lookup(order_id)
+            except Exception as e:
+                logger.warning("Error checking order for portions: %s", e)
+                return
+            # Не найденный заказ мог уйти в архив - порции остаются списанными
+            if order is None or order_id not in self._orders:
+                continue
+            status = order.get("status")
+            if status == CONFIRMED_STATUS:
+                # Подтвержденный заказ уже не отменяют - больше не проверяем
+                announcement_id, _ = self._orders.pop(order_id)
+                self._changed(announcement_id)
+            elif status != PENDING_STATUS:
+                self.release_order(order_id)
+
+    def _share(self, total: int) -> int:
+        share = total // self.shards
+        return share + (1 if self.shard < total % self.shards else 0)
+
+    def observe(self, announcement_id: int, announcement: Dict[str, Any]):
+        """Учесть лимит анонса, прочитанного из хранилища"""
+        announcement_id = int(announcement_id)
+        capacity = _parse_count(announcement.get(CAPACITY_HEADER, ""))
+        if capacity is None:
+            # Лимита нет или его убрали в таблице
+            self._stocks.pop(announcement_id, None)
+            return
+        stock = self._stocks.get(announcement_id)
+        if stock is not None:
+            # Лимит можно поменять в таблице, списанные порции ведутся в памяти
+            stock.capacity = self._share(capacity)
+            stock.total = capacity
+            stock.seen = time.time()
+            return
+        persisted = BOOKED_HEADER in announcement and self.shards == 1
+        saved, _, moved = self._saved.pop(announcement_id, (0, 0.0, 0))
+        if persisted:
+            booked = _parse_count(announcement.get(BOOKED_HEADER, "")) or 0
+        else:
+            # Своя доля счетчика в таблице не видна - берем ее из файла
+            booked = saved
+        self._stocks[announcement_id] = _Stock(
+            capacity=self._share(capacity),
+            total=capacity,
+            booked=booked,
+            persisted=persisted,
+            moved=moved,
+        )
+
+    def remaining(
+        self, announcement_id: int, user_id: Optional[int] = None
+    ) -> Optional[int]:
+        """Свободные порции (None - без лимита), не считая удержание user_id"""
+        stock = self._stocks.get(int(announcement_id))
+        if stock is None:
+            return None
+        now = time.monotonic()
+        for holder in [u for u, (_, until) in stock.holds.items() if until <= now]:
+            del stock.holds[holder]
+        held = sum(
+            portions
+            for holder, (portions, _) in stock.holds.items()
+            if holder != user_id
+        )
+        return max(stock.capacity - stock.moved - stock.booked - held, 0)
+
+    def hold(self, announcement_id: int, user_id: int, portions: int) -> bool:
+        """Удержать порции на время оформления (заменяет прежнее удержание)"""
+        left = self.remaining(announcement_id, user_id)
+        if left is None:
+            return True
+        if portions > left:
+            return False
+        stock = self._stocks[int(announcement_id)]
+        stock.holds[user_id] = (portions, time.monotonic() + self.hold_ttl)
+        return True
+
+    async def top_up(self, announcement_id: int, user_id: int, portions: int) -> bool:
+        """Занять у других воркеров порции, которых не хватает user_id.
+
+        True, если теперь свободных порций хватает.
+        """
+        announcement_id = int(announcement_id)
+        stock = self._stocks.get(announcement_id)
+        if stock is None:
+            return True
+        need = portions - self.remaining(announcement_id, user_id)
+        if need <= 0:
+            return True
+        if self.borrow is None:
+            return False
+        try:
+            got = await self.borrow(announcement_id, need, stock.total)
+        except Exception as e:
+            logger.warning("Error borrowing portions: %s", e)
+            return False
+        if got:
+            stock.moved -= got
+            self._changed(announcement_id)
+        return got >= need
+
+    def lend(self, announcement_id: int, portions: int, total: int) -> int:
+        """Отдать другому воркеру до portions свободных порций.
+
+        total - весь лимит анонса: по нему считается своя доля, если этот
+        воркер анонс еще не читал.
+        """
+        announcement_id = int(announcement_id)
+        if announcement_id not in self._stocks:
+            self.observe(announcement_id, {CAPACITY_HEADER: total})
+        granted = min(portions, self.remaining(announcement_id))
+        if granted > 0:
+            self._stocks[announcement_id].moved += granted
+            self._changed(announcement_id)
+        return granted
+
+    def release(self, announcement_id: int, user_id: int):
+        """Вернуть удержанные порции (оформление отменено)"""
+        stock = self._stocks.get(int(announcement_id))
+        if stock is not None:
+            stock.holds.pop(user_id, None)
+
+    def commit(
+        self, announcement_id: int, user_id: int, portions: int, order_id: str
+    ) -> bool:
+        """Списать порции под заказ.
+
+        Если удержание истекло, порции списываются из свободных - или False,
+        когда их уже не осталось.
+        """
+        announcement_id = int(announcement_id)
+        stock = self._stocks.get(announcement_id)
+        if stock is None:
+            return True
+        stock.holds.pop(user_id, None)
+        if portions > self.remaining(announcement_id):
+            return False
+        stock.booked += portions
+        stock.seen = time.time()
+        self._orders[str(order_id)] = (announcement_id, portions)
+        self._changed(announcement_id)
+        return True
+
+    def release_order(self, order_id: str, forward: bool = True):
+        """Вернуть порции отмененного заказа.
+
+        Заказ, которого здесь нет, мог списать другой воркер - отмена
+        передается ему через forward.
+        """
+        entry = self._orders.pop(str(order_id), None)
+        if entry is None:
+            if forward and self.forward is not None:
+                self.forward(str(order_id))
+            return
+        announcement_id, portions = entry
+        stock = self._stocks.get(announcement_id)
+        if stock is not None:
+            stock.booked = max(stock.booked - portions, 0)
+        elif announcement_id in self._saved:
+            booked, seen, moved = self._saved[announcement_id]
+            self._saved[announcement_id] = (max(booked - portions, 0), seen, moved)
+        else:
+            return
+        self._changed(announcement_id)
+
+    def _changed(self, announcement_id: int):
+        stock = self._stocks.get(announcement_id)
+        persisted = stock is not None and stock.persisted and self.persist is not None
+        if not persisted and self.state_path is None:
+            return
+        self._dirty.add(announcement_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Изменения за flush_interval уходят в таблицу одной пачкой. После
+        # ошибки счетчики остаются в _dirty - повторяем, пока не запишутся
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if not self._dirty:
+                return
+
+    async def flush(self):
+        """Записать измененные счетчики"""
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        counts = {
+            announcement_id: self._stocks[announcement_id].booked
+            for announcement_id in dirty
+            if announcement_id in self._stocks
+            and self._stocks[announcement_id].persisted
+        }
+        try:
+            self.save()
+            if counts and self.persist is not None:
+                await self.persist(counts)
+        except asyncio.CancelledError:
+            self._dirty |= dirty
+            raise
+        except Exception as e:
+            logger.warning("Error saving booked portions: %s", e)
+            self._dirty |= dirty
+
+    async def stop(self):
+        if self._check_task is not None:
+            self._check_task.cancel()
+            try:
+                await self._check_task
+            except asyncio.CancelledError:
+                pass
+            self._check_task = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,556 @@
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import uuid
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.types import InlineKeyboardMarkup, Message
+from aiohttp import web
+
+from config.settings import Config
+from services.broadcast import BroadcastEngine, BroadcastStats, OutgoingMessage
+from services.capacity import PortionCapacity
+from services.webhook import check_webhook_config
+
+logger = logging.getLogger(__name__)
+
+# Колбэки админа по заказу несут ID заказа "<chat_id>-<message_id>"
+_ORDER_CALLBACK_PREFIXES = ("confirm_", "reject_")
+
+
+class HashRing:
+    """Консистентное хеширование chat_id по воркерам.
+
+    Каждый воркер занимает replicas точек на кольце, поэтому при изменении
+    числа воркеров переезжает только часть чатов.
+    """
+
+    def __init__(self, workers: int, replicas: int = 64):
+        self.workers = workers
+        points = []
+        for worker in range(workers):
+            for replica in range(replicas):
+                points.append((self._hash(f"worker-{worker}-{replica}"), worker))
+        points.sort()
+        self._keys = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(
+            hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"
+        )
+
+    def owner(self, chat_id: int) -> int:
+        """Номер воркера, которому принадлежит чат"""
+        if self.workers == 1:
+            return 0
+        index = bisect.bisect(self._keys, self._hash(str(chat_id)))
+        return self._owners[index % len(self._owners)]
+
+
+def order_chat_id(order_id: str) -> Optional[int]:
+    """Чат жителя из ID заказа "<chat_id>-<message_id>" (None - ID другой)"""
+    order_chat, _, message_id = str(order_id).rpartition("-")
+    if order_chat.lstrip("-").isdigit() and message_id.isdigit():
+        return int(order_chat)
+    return None
+
+
+def affinity_chat_id(update: Dict[str, Any]) -> int:
+    """Чат, к которому относится сырой апдейт Telegram.
+
+    Решение админа по заказу относится к чату жителя, оформившего заказ:
+    так его обрабатывает воркер, который этот заказ создал.
+    """
+    callback = update.get("callback_query")
+    if callback is not None:
+        data = callback.get("data") or ""
+        if data.startswith(_ORDER_CALLBACK_PREFIXES):
+            order_chat = order_chat_id(data.split("_", 1)[1])
+            if order_chat is not None:
+                return order_chat
+        message = callback.get("message") or {}
+        chat = message.get("chat") or {}
+        return int(chat.get("id") or callback["from"]["id"])
+
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        if "chat" in value:
+            return int(value["chat"]["id"])
+        if "from" in value:
+            return int(value["from"]["id"])
+    return 0
+
+
+def _partition_path(path: str, index: int) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{index}{ext}"
+
+
+def partition_config(config: Config, index: int) -> Config:
+    """Конфигурация воркера: свои локальные файлы и доля лимита рассылки"""
+    workers = config.cluster.workers
+    db = replace(
+        config.db,
+        journal_file=_partition_path(config.db.journal_file, index),
+        delivery_ledger=_partition_path(config.db.delivery_ledger, index),
+        sqlite_path=_partition_path(config.db.sqlite_path, index),
+        fsm_path=_partition_path(config.db.fsm_path, index),
+        capacity_state=_partition_path(config.db.capacity_state, index),
+        # Квота Google API общая на всех воркеров
+        read_quota=config.db.read_quota / workers,
+        write_quota=config.db.write_quota / workers,
+        # Архив удаляет строки Orders, а другие воркеры в это время пишут
+        # статусы своих заказов - с несколькими воркерами архив не ведется
+        archive_interval=0,
+        # Лимит порций каждого анонса делится между воркерами
+        capacity_shard=index,
+        capacity_shards=workers,
+    )
+    tg_bot = replace(
+        config.tg_bot, broadcast_rate=config.tg_bot.broadcast_rate / workers
+    )
+    monitoring = config.monitoring
+    if monitoring.metrics_port:
+        # Каждый воркер отдает свои метрики на соседнем порту
+        monitoring = replace(monitoring, metrics_port=monitoring.metrics_port + index)
+    return replace(config, db=db, tg_bot=tg_bot, monitoring=monitoring)
+
+
+@dataclass
+class WorkerContext:
+    index: int
+    inboxes: List[Any]
+    ring: HashRing
+
+
+def _encode(outgoing: OutgoingMessage) -> Dict[str, Any]:
+    markup = outgoing.reply_markup
+    if isinstance(markup, InlineKeyboardMarkup):
+        markup = markup.model_dump(mode="json", exclude_none=True)
+    # Готовый JSON клавиатуры передается как есть
+    return {"chat_id": outgoing.chat_id, "text": outgoing.text, "reply_markup": markup}
+
+
+def _decode(data: Dict[str, Any]) -> OutgoingMessage:
+    markup = data["reply_markup"]
+    return OutgoingMessage(
+        chat_id=data["chat_id"],
+        text=data["text"],
+        reply_markup=(
+            InlineKeyboardMarkup.model_validate(markup)
+            if isinstance(markup, dict)
+            else markup
+        ),
+    )
+
+
+class ClusterBroadcaster:
+    """Рассылка, разделенная между воркерами.
+
+    Повторяет интерфейс BroadcastEngine.start. Каждое сообщение отправляет
+    воркер, которому принадлежит чат получателя, со своей долей общего
+    лимита. Воркер, запустивший рассылку, собирает их статистику, ведет
+    сообщение о прогрессе и один раз вызывает on_done.
+    """
+
+    def __init__(self, engine: BroadcastEngine, worker: WorkerContext):
+        self.engine = engine
+        self.worker = worker
+        self._remote: Dict[str, Dict[int, BroadcastStats]] = {}
+        self._waiters: Dict[str, Dict[int, asyncio.Future]] = {}
+        self._jobs: Set[asyncio.Task] = set()
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+        return task
+
+    def start(
+        self,
+        messages: Iterable[OutgoingMessage],
+        progress_message: Optional[Message] = None,
+        title: str = "Рассылка",
+        on_done: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = None,
+    ) -> asyncio.Task:
+        """Запустить рассылку в фоне"""
+        return self._spawn(self.run(messages, progress_message, title, on_done))
+
+    async def stop(self):
+        for task in list(self._jobs):
+            task.cancel()
+        if self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+        await self.engine.stop()
+
+    def _total(self, local: BroadcastStats, job_id: str) -> BroadcastStats:
+        total = BroadcastStats(total=local.total, sent=local.sent, failed=local.failed)
+        for stats in self._remote.get(job_id, {}).values():
+            total.total += stats.total
+            total.sent += stats.sent
+            total.failed += stats.failed
+        return total
+
+    async def run(
+        self,
+        messages: Iterable[OutgoingMessage],
+        progress_message: Optional[Message] = None,
+        title: str = "Рассылка",
+        on_done: Optional[Callable[[BroadcastStats], Awaitable[Any]]] = None,
+    ) -> BroadcastStats:
+        shares: Dict[int, List[OutgoingMessage]] = {}
+        for outgoing in messages:
+            owner = self.worker.ring.owner(outgoing.chat_id)
+            shares.setdefault(owner, []).append(outgoing)
+
+        job_id = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        local_share = shares.pop(self.worker.index, [])
+        self._remote[job_id] = {
+            owner: BroadcastStats(total=len(share)) for owner, share in shares.items()
+        }
+        waiters = {owner: loop.create_future() for owner in shares}
+        self._waiters[job_id] = waiters
+        for owner, share in shares.items():
+            self.worker.inboxes[owner].put(
+                (
+                    "broadcast",
+                    job_id,
+                    self.worker.index,
+                    [_encode(outgoing) for outgoing in share],
+                )
+            )
+
+        local = BroadcastStats(total=len(local_share))
+        progress = None
+        if progress_message is not None:
+            progress = asyncio.create_task(
+                self._report_progress(progress_message, title, local, job_id)
+            )
+        try:
+            await self.engine.run(local_share, stats=local)
+            if waiters:
+                # Воркер мог упасть - не ждем дольше, чем длилась бы вся рассылка
+                total = sum(len(share) for share in shares.values())
+                timeout = total / self.engine.rate_limit + 60
+                await asyncio.wait(list(waiters.values()), timeout=timeout)
+        finally:
+            if progress is not None:
+                progress.cancel()
+            stats = self._total(local, job_id)
+            self._remote.pop(job_id, None)
+            self._waiters.pop(job_id, None)
+
+        if progress_message is not None:
+            await self.engine._edit_progress(
+                progress_message,
+                self.engine.format_progress(title, stats, finished=True),
+            )
+        if on_done is not None:
+            try:
+                await on_done(stats)
+            except Exception:
+                logger.exception("Error in broadcast completion callback")
+        return stats
+
+    async def _report_progress(
+        self, message: Message, title: str, local: BroadcastStats, job_id: str
+    ):
+        last_text = None
+        while True:
+            await asyncio.sleep(self.engine.progress_interval)
+            text = self.engine.format_progress(title, self._total(local, job_id))
+            if text != last_text:
+                await self.engine._edit_progress(message, text)
+                last_text = text
+
+    def handle(self, item: tuple):
+        """Обработать служебное сообщение другого воркера"""
+        kind = item[0]
+        if kind == "broadcast":
+            _, job_id, origin, encoded = item
+            self._spawn(self._serve_share(job_id, origin, encoded))
+        elif kind in ("broadcast_progress", "broadcast_done"):
+            _, job_id, owner, total, sent, failed = item
+            stats = self._remote.get(job_id, {}).get(owner)
+            if stats is not None:
+                stats.total, stats.sent, stats.failed = total, sent, failed
+            if kind == "broadcast_done":
+                waiter = self._waiters.get(job_id, {}).get(owner)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+
+    async def _serve_share(self, job_id: str, origin: int, encoded: List[dict]):
+        """Отправить свою часть чужой рассылки и отчитаться инициатору"""
+        messages = [_decode(data) for data in encoded]
+        if self.engine.ledger is not None:
+            reachable = set(self.engine.ledger.filter(m.chat_id for m in messages))
+            messages = [m for m in messages if m.chat_id in reachable]
+        stats = BroadcastStats(total=len(messages))
+        inbox = self.worker.inboxes[origin]
+
+        async def report():
+            while True:
+                await asyncio.sleep(self.engine.progress_interval)
+                inbox.put(
+                    (
+                        "broadcast_progress",
+                        job_id,
+                        self.worker.index,
+                        stats.total,
+                        stats.sent,
+                        stats.failed,
+                    )
+                )
+
+        reporter = asyncio.create_task(report())
+        try:
+            await self.engine.run(messages, stats=stats)
+        finally:
+            reporter.cancel()
+            inbox.put(
+                (
+                    "broadcast_done",
+                    job_id,
+                    self.worker.index,
+                    stats.total,
+                    stats.sent,
+                    stats.failed,
+                )
+            )
+
+
+class ClusterCapacity:
+    """Лимит порций, согласованный между воркерами.
+
+    Воркер, у которого кончилась своя доля лимита, по очереди просит
+    порции у остальных. Отмену заказа, которого у воркера нет (например,
+    массовый отказ админа), получает воркер чата жителя: он этот заказ и
+    списывал. Ответа ждем не дольше timeout - упавший воркер порций не дает.
+    """
+
+    def __init__(
+        self, capacity: PortionCapacity, worker: WorkerContext, timeout: float = 2.0
+    ):
+        self.capacity = capacity
+        self.worker = worker
+        self.timeout = timeout
+        self._waiters: Dict[str, asyncio.Future] = {}
+        capacity.borrow = self.borrow
+        capacity.forward = self.forward
+
+    async def borrow(self, announcement_id: int, portions: int, total: int) -> int:
+        """Занять порции у других воркеров; возвращает, сколько дали"""
+        loop = asyncio.get_running_loop()
+        got = 0
+        for owner in range(len(self.worker.inboxes)):
+            if owner == self.worker.index or got >= portions:
+                continue
+            request_id = uuid.uuid4().hex
+            waiter = self._waiters[request_id] = loop.create_future()
+            self.worker.inboxes[owner].put(
+                (
+                    "capacity_borrow",
+                    request_id,
+                    self.worker.index,
+                    announcement_id,
+                    portions - got,
+                    total,
+                )
+            )
+            try:
+                got += await asyncio.wait_for(waiter, self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Worker did not answer portions request", extra={"worker": owner}
+                )
+            finally:
+                self._waiters.pop(request_id, None)
+        return got
+
+    def forward(self, order_id: str):
+        """Передать отмену заказа воркеру его чата"""
+        chat_id = order_chat_id(order_id)
+        if chat_id is None:
+            return
+        owner = self.worker.ring.owner(chat_id)
+        if owner != self.worker.index:
+            self.worker.inboxes[owner].put(("capacity_release", order_id))
+
+    def handle(self, item: tuple):
+        """Обработать служебное сообщение другого воркера"""
+        kind = item[0]
+        if kind == "capacity_borrow":
+            _, request_id, origin, announcement_id, portions, total = item
+            granted = self.capacity.lend(announcement_id, portions, total)
+            self.worker.inboxes[origin].put(("capacity_lent", request_id, granted))
+        elif kind == "capacity_lent":
+            _, request_id, granted = item
+            waiter = self._waiters.get(request_id)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(granted)
+            elif granted:
+                logger.warning(
+                    "Late portions answer, portions are lost",
+                    extra={"portions": granted},
+                )
+        elif kind == "capacity_release":
+            self.capacity.release_order(item[1], forward=False)
+
+
+async def serve_inbox(
+    dp: Dispatcher,
+    bot: Bot,
+    inbox: Any,
+    broadcaster: Optional[ClusterBroadcaster] = None,
+    capacity: Optional[ClusterCapacity] = None,
+):
+    """Цикл воркера: апдейты от фронта и служебные сообщения других воркеров"""
+    loop = asyncio.get_running_loop()
+    tasks: Set[asyncio.Task] = set()
+    while True:
+        item = await loop.run_in_executor(None, inbox.get)
+        kind = item[0]
+        if kind == "stop":
+            break
+        if kind == "update":
+            task = asyncio.create_task(dp.feed_raw_update(bot, item[1]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif kind.startswith("capacity_"):
+            if capacity is not None:
+                capacity.handle(item)
+        elif broadcaster is not None:
+            broadcaster.handle(item)
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class Front:
+    """Фронт-процесс: принимает апдейты и раскладывает их по воркерам"""
+
+    def __init__(
+        self,
+        config: Config,
+        worker_target: Callable[[Config, int, List[Any]], None],
+    ):
+        self.config = config
+        self.worker_target = worker_target
+        self.ring = HashRing(config.cluster.workers)
+        context = multiprocessing.get_context("spawn")
+        self.inboxes = [context.Queue() for _ in range(config.cluster.workers)]
+        self.processes = [
+            context.Process(
+                target=worker_target,
+                args=(config, index, self.inboxes),
+                name=f"bot-worker-{index}",
+            )
+            for index in range(config.cluster.workers)
+        ]
+
+    def route(self, update: Dict[str, Any]):
+        owner = self.ring.owner(affinity_chat_id(update))
+        self.inboxes[owner].put(("update", update))
+
+    async def run(self, allowed_updates: Optional[List[str]] = None):
+        if self.config.webhook.mode == "webhook":
+            # До запуска воркеров: без секрета фронт не стартует вовсе
+            check_webhook_config(self.config.webhook)
+        for process in self.processes:
+            process.start()
+        logger.info("Started bot workers", extra={"workers": len(self.processes)})
+        try:
+            if self.config.webhook.mode == "webhook":
+                await self._run_webhook(allowed_updates)
+            else:
+                await self._run_polling(allowed_updates)
+        finally:
+            for inbox in self.inboxes:
+                inbox.put(("stop",))
+            loop = asyncio.get_running_loop()
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join)
+
+    async def _run_polling(self, allowed_updates: Optional[List[str]]):
+        """Long polling сырыми запросами: фронт не разбирает апдейты в модели"""
+        bot = Bot(token=self.config.tg_bot.token)
+        try:
+            await bot.delete_webhook()
+            url = bot.session.api.api_url(bot.token, "getUpdates")
+        finally:
+            await bot.session.close()
+        offset = None
+        async with aiohttp.ClientSession() as session:
+            while True:
+                payload: Dict[str, Any] = {"timeout": 30}
+                if offset is not None:
+                    payload["offset"] = offset
+                if allowed_updates is not None:
+                    payload["allowed_updates"] = allowed_updates
+                try:
+                    async with session.post(
+                        url, json=payload, timeout=aiohttp.ClientTimeout(total=40)
+                    ) as response:
+                        body = await response.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning("Error polling updates: %s", e)
+                    await asyncio.sleep(1)
+                    continue
+                if not body.get("ok"):
+                    logger.warning(
+                        "Telegram rejected getUpdates: %s", body.get("description")
+                    )
+                    await asyncio.sleep(
+                        body.get("parameters", {}).get("retry_after", 1)
+                    )
+                    continue
+                for update in body["result"]:
+                    offset = update["update_id"] + 1
+                    self.route(update)
+
+    async def _run_webhook(self, allowed_updates: Optional[List[str]]):
+        config = self.config.webhook
+        secret = config.secret or None
+
+        async def handle(request: web.Request) -> web.Response:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if secret and not hmac.compare_digest(token, secret):
+                return web.Response(status=401, text="Unauthorized")
+            self.route(await request.json())
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post(config.path, handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host=config.host, port=config.port).start()
+        logger.info(
+            "Listening for webhook updates on %s:%s%s",
+            config.host,
+            config.port,
+            config.path,
+        )
+        try:
+            if config.url:
+                bot = Bot(token=self.config.tg_bot.token)
+                try:
+                    await bot.set_webhook(
+                        url=config.url.rstrip("/") + config.path,
+                        secret_token=secret,
+                        allowed_updates=allowed_updates,
+                    )
+                finally:
+                    await bot.session.close()
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
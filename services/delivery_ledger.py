@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from services.storage import Repository
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+UNREACHABLE = "unreachable"
+
+# Ответы Telegram, после которых писать в чат бесполезно
+_PERMANENT_BAD_REQUESTS = ("chat not found", "user is deactivated")
+
+
+@dataclass
+class DeliveryRecord:
+    status: str = ACTIVE
+    sent: int = 0
+    failed: int = 0
+    last_error: str = ""
+    updated: str = ""
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Ошибка означает, что чат недоступен навсегда (бот заблокирован, аккаунт удален)"""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    if isinstance(error, TelegramBadRequest):
+        return any(reason in str(error).lower() for reason in _PERMANENT_BAD_REQUESTS)
+    return False
+
+
+class DeliveryLedger:
+    """Журнал доставки сообщений по пользователям.
+
+    Хранится локально в JSON-файле, статус дублируется в хранилище
+    (столбец status листа Users). Пользователи, заблокировавшие бота или удалившие аккаунт,
+    исключаются из следующих рассылок и возвращаются после нового /start.
+    """
+
+    def __init__(self, path: str, repo: Optional[Repository] = None):
+        self.path = path
+        self.repo = repo
+        self._records: Dict[int, DeliveryRecord] = {}
+        self._dirty = False
+
+    def load(self):
+        """Прочитать журнал с диска"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as ledger_file:
+            raw = json.load(ledger_file)
+        self._records = {
+            int(user_id): DeliveryRecord(**data) for user_id, data in raw.items()
+        }
+        logger.info(
+            "Delivery ledger loaded", extra={"unreachable": len(self.unreachable())}
+        )
+
+    def save(self):
+        """Атомарно записать журнал на диск"""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as ledger_file:
+            json.dump(
+                {
+                    str(user_id): asdict(record)
+                    for user_id, record in self._records.items()
+                },
+                ledger_file,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _record(self, user_id: int) -> DeliveryRecord:
+        record = self._records.get(user_id)
+        if record is None:
+            record = DeliveryRecord()
+            self._records[user_id] = record
+        return record
+
+    def get(self, user_id: int) -> Optional[DeliveryRecord]:
+        return self._records.get(int(user_id))
+
+    def unreachable(self) -> Set[int]:
+        return {
+            user_id
+            for user_id, record in self._records.items()
+            if record.status != ACTIVE
+        }
+
+    def filter(self, user_ids: Iterable[int]) -> List[int]:
+        """Оставить только пользователей, которым можно писать"""
+        unreachable = self.unreachable()
+        return [user_id for user_id in user_ids if user_id not in unreachable]
+
+    def record_sent(self, user_id: int):
+        record = self._record(int(user_id))
+        record.sent += 1
+        self._dirty = True
+
+    async def record_failed(self, user_id: int, error: Exception):
+        user_id = int(user_id)
+        record = self._record(user_id)
+        record.failed += 1
+        record.last_error = str(error)[:200]
+        record.updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._dirty = True
+        if is_permanent_failure(error) and record.status == ACTIVE:
+            logger.info(
+                "User is unreachable, excluding from broadcasts",
+                extra={"user_id": user_id},
+            )
+            record.status = UNREACHABLE
+            await self._mirror(user_id, UNREACHABLE)
+
+    async def reactivate(self, user_id: int):
+        """Вернуть пользователя в рассылки (например, после /start)"""
+        user_id = int(user_id)
+        record = self._records.get(user_id)
+        if record is None or record.status == ACTIVE:
+            return
+        logger.info("User is reachable again", extra={"user_id": user_id})
+        record.status = ACTIVE
+        record.updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._dirty = True
+        self.save()
+        await self._mirror(user_id, ACTIVE)
+
+    async def _mirror(self, user_id: int, status: str):
+        """Отразить статус в хранилище"""
+        if self.repo is None:
+            return
+        try:
+            await self.repo.set_user_status(user_id, status)
+        except Exception as e:
+            logger.warning(
+                "Error mirroring delivery status: %s", e, extra={"user_id": user_id}
+            )
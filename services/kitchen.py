@@ -0,0 +1,227 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS
+
+logger = logging.getLogger(__name__)
+
+# Дата заказа хранится как "%Y-%m-%d %H:%M:%S" - день это первые 10 символов
+_DAY_LENGTH = 10
+
+
+def order_day(dt: str) -> str:
+    """День заказа в формате YYYY-MM-DD"""
+    return str(dt).strip()[:_DAY_LENGTH]
+
+
+@dataclass
+class DishSummary:
+    """Порции одного блюда за день"""
+
+    dish_name: str
+    confirmed: int = 0
+    pending: int = 0
+    # Блок -> подтвержденные порции, которые нужно туда доставить
+    rooms: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _Entry:
+    day: str
+    dish_name: str
+    room: str
+    portions: int
+    status: str
+
+
+class KitchenManifest:
+    """Сводка для кухни: порции по блюдам и доставка по блокам за день.
+
+    Счетчики обновляются в памяти при добавлении заказа и смене статуса,
+    поэтому /summary отвечает без запросов к хранилищу. Раз в interval
+    секунд сводка сверяется с хранилищем одним чтением fetch(since) - так
+    подхватываются правки, сделанные прямо в таблице. Заказы, изменившиеся
+    во время сверки, берутся из памяти: в прочитанных данных их может еще
+    не быть. Хранятся только последние days дней.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+        days: int = 2,
+    ):
+        self.fetch = fetch
+        self.days = days
+        self._orders: Dict[str, _Entry] = {}
+        self._days: Dict[str, Dict[str, DishSummary]] = {}
+        # Заказы, изменившиеся во время сверки, и их новый статус;
+        # None - сверка не идет
+        self._touched: Optional[Dict[str, Optional[str]]] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _tracking(self) -> bool:
+        # До первой сверки счетчики не ведем: она все равно прочитает все заказы
+        return self._loaded or self._touched is not None
+
+    @staticmethod
+    def _entry(
+        dish_name: str, room: str, portions: Any, dt: str, status: str
+    ) -> Optional[_Entry]:
+        try:
+            portions = int(portions)
+        except (TypeError, ValueError):
+            return None
+        day = order_day(dt)
+        if not day or not dish_name:
+            return None
+        return _Entry(day, str(dish_name), str(room).strip(), portions, status)
+
+    def _apply(self, entry: _Entry, sign: int):
+        if entry.status not in (CONFIRMED_STATUS, PENDING_STATUS):
+            return
+        dishes = self._days.setdefault(entry.day, {})
+        dish = dishes.get(entry.dish_name)
+        if dish is None:
+            dish = dishes[entry.dish_name] = DishSummary(entry.dish_name)
+        portions = sign * entry.portions
+        if entry.status == PENDING_STATUS:
+            dish.pending += portions
+        else:
+            dish.confirmed += portions
+            left = dish.rooms.get(entry.room, 0) + portions
+            if left:
+                dish.rooms[entry.room] = left
+            else:
+                dish.rooms.pop(entry.room, None)
+        if not dish.confirmed and not dish.pending:
+            del dishes[entry.dish_name]
+            if not dishes:
+                del self._days[entry.day]
+
+    def add(
+        self,
+        order_id: str,
+        dish_name: str,
+        room: str,
+        portions: Any,
+        dt: str,
+        status: str = PENDING_STATUS,
+    ):
+        """Учесть новый заказ"""
+        if not self._tracking():
+            return
+        order_id = str(order_id)
+        if self._touched is not None:
+            self._touched[order_id] = None
+        old = self._orders.pop(order_id, None)
+        if old is not None:
+            self._apply(old, -1)
+        entry = self._entry(dish_name, room, portions, dt, status)
+        if entry is not None:
+            self._orders[order_id] = entry
+            self._apply(entry, 1)
+
+    def set_status(self, order_id: str, status: str):
+        """Перенести порции заказа в счетчик нового статуса"""
+        if not self._tracking():
+            return
+        order_id = str(order_id)
+        if self._touched is not None:
+            self._touched[order_id] = status
+        entry = self._orders.get(order_id)
+        if entry is None or entry.status == status:
+            return
+        self._apply(entry, -1)
+        entry.status = status
+        self._apply(entry, 1)
+
+    def since(self) -> str:
+        """Первый день, который хранит сводка"""
+        first = datetime.now() - timedelta(days=max(self.days - 1, 0))
+        return first.strftime("%Y-%m-%d")
+
+    async def reconcile(self):
+        """Пересобрать счетчики по заказам из хранилища"""
+        async with self._lock:
+            since = self.since()
+            self._touched = {}
+            try:
+                orders = await self.fetch(since)
+            finally:
+                touched, self._touched = self._touched, None
+
+            entries: Dict[str, _Entry] = {}
+            for order in orders:
+                order_id = str(order.get("order_id") or "")
+                if not order_id or (order_id in touched and order_id in self._orders):
+                    continue
+                entry = self._entry(
+                    order.get("dish_name"),
+                    order.get("room", ""),
+                    order.get("portions"),
+                    order.get("date", ""),
+                    order.get("status", ""),
+                )
+                if entry is None or entry.day < since:
+                    continue
+                if touched.get(order_id):
+                    # Статус сменили до того, как заказ попал в память
+                    entry.status = touched[order_id]
+                entries[order_id] = entry
+            for order_id in touched:
+                entry = self._orders.get(order_id)
+                if entry is not None:
+                    entries[order_id] = entry
+
+            previous = self._days
+            self._orders = entries
+            self._days = {}
+            for entry in entries.values():
+                self._apply(entry, 1)
+            if self._loaded and previous != self._days:
+                logger.info("Kitchen manifest corrected from storage")
+            self._loaded = True
+            logger.debug(
+                "Kitchen manifest reconciled",
+                extra={"orders": len(entries), "since": since},
+            )
+
+    async def ensure_loaded(self):
+        if not self._loaded:
+            await self.reconcile()
+
+    def summary(self, day: Optional[str] = None) -> List[DishSummary]:
+        """Блюда за день (по умолчанию сегодня), по названию"""
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        dishes = self._days.get(day, {})
+        return [
+            replace(dish, rooms=dict(dish.rooms))
+            for _, dish in sorted(dishes.items())
+        ]
+
+    def start_reconciling(self, interval: float):
+        """Запустить периодическую сверку (первая - сразу)"""
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._reconcile_loop(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile_loop(self, interval: float):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.warning("Error reconciling kitchen manifest: %s", e)
+            await asyncio.sleep(interval)
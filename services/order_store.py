@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional, Any, Set, Tuple
+
+from services.api_client import (
+    ORDER_FIELDS,
+    ORDER_ID_COLUMN,
+    ORDER_STATUS_COLUMN,
+    PENDING_STATUS,
+    PRIORITY_ADMIN,
+    build_order_row,
+)
+from services.async_client import AsyncSheetsClient
+from services.write_buffer import WriteBuffer
+
+logger = logging.getLogger(__name__)
+
+_ORDER_ID_INDEX = ORDER_FIELDS.index("order_id")
+
+
+class OrderStore:
+    """Заказы с прямой адресацией строк в листе Orders.
+
+    Хранит индекс order_id -> номер строки, поэтому заказ читается одним
+    запросом диапазона, а статус обновляется одной записью по известной
+    строке, без find() по всему листу. Статус пишется с адресацией по
+    order_id: строка ищется в момент записи, так что перенос в архив или
+    правка таблицы не направят его в чужой заказ. Для /cancel поддерживается индекс
+    user_id -> заказы, ожидающие подтверждения, который обновляется при
+    добавлении заказа и смене статуса. Если передан буфер записи, новые
+    заказы и статусы уходят в таблицу пачками через него.
+
+    Закрытые заказы периодически переносятся в помесячные архивные листы,
+    чтобы Orders содержал только актуальные заказы. Из-за неизвестного
+    order_id индекс перечитывается не чаще раза в reload_interval секунд.
+    """
+
+    def __init__(
+        self,
+        sheets: AsyncSheetsClient,
+        buffer: Optional[WriteBuffer] = None,
+        reload_interval: float = 10.0,
+    ):
+        self.sheets = sheets
+        self.buffer = buffer
+        self.reload_interval = reload_interval
+        self._rows: Dict[str, int] = {}
+        # Заказы, ожидающие сброса буфера: номер строки еще неизвестен
+        self._pending: Dict[str, asyncio.Future] = {}
+        # Ожидающие подтверждения заказы: order_id -> (user_id, дата)
+        self._open: Dict[str, Tuple[int, str]] = {}
+        self._user_open: Dict[int, Set[str]] = {}
+        self._loaded = False
+        self._loaded_at = float("-inf")
+        self._load_lock = asyncio.Lock()
+        # Перенос в архив сдвигает строки - на это время запись статусов ждет
+        self._archive_lock = asyncio.Lock()
+        self._archive_task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Построить индексы по столбцам листа Orders одним запросом"""
+        self._loaded_at = time.monotonic()
+        index = await self.sheets.get_order_index()
+        rows = {}
+        open_orders = {}
+        for row_index, user_id, dt, order_id, status in index:
+            if not order_id:
+                continue
+            rows[order_id] = row_index
+            if status == PENDING_STATUS:
+                try:
+                    open_orders[order_id] = (int(user_id), dt)
+                except ValueError:
+                    continue
+        # Заказы, еще не сброшенные из буфера, в таблице пока отсутствуют
+        for order_id in self._pending:
+            if order_id in self._open:
+                open_orders[order_id] = self._open[order_id]
+
+        self._rows = rows
+        self._open = {}
+        self._user_open = {}
+        for order_id, (user_id, dt) in open_orders.items():
+            self._track_open(order_id, user_id, dt)
+        self._loaded = True
+        logger.info(
+            "Order index loaded",
+            extra={"orders": len(rows), "pending": len(open_orders)},
+        )
+
+    def _track_open(self, order_id: str, user_id: int, dt: str):
+        self._open[order_id] = (user_id, dt)
+        self._user_open.setdefault(user_id, set()).add(order_id)
+
+    def _untrack_open(self, order_id: str):
+        entry = self._open.pop(order_id, None)
+        if entry is None:
+            return
+        user_orders = self._user_open.get(entry[0])
+        if user_orders is not None:
+            user_orders.discard(order_id)
+            if not user_orders:
+                del self._user_open[entry[0]]
+
+    async def ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    async def _reload(self):
+        """Перечитать индекс, если он старше reload_interval.
+
+        Иначе каждый колбэк с неизвестным order_id (чужой, устаревший,
+        поддельный) стоил бы чтения всего листа.
+        """
+        if time.monotonic() - self._loaded_at < self.reload_interval:
+            return
+        async with self._load_lock:
+            if time.monotonic() - self._loaded_at >= self.reload_interval:
+                await self.load()
+
+    async def _find_row(self, order_id: str) -> Optional[int]:
+        pending = self._pending.get(order_id)
+        if pending is not None:
+            try:
+                row_index = await asyncio.wait_for(
+                    asyncio.shield(pending), self.sheets.timeout
+                )
+            except asyncio.TimeoutError:
+                return None
+            if row_index:
+                return row_index
+        await self.ensure_loaded()
+        row_index = self._rows.get(order_id)
+        if row_index is None:
+            # Заказ мог быть добавлен в таблицу вручную или другим процессом
+            await self._reload()
+            row_index = self._rows.get(order_id)
+        return row_index
+
+    async def add_order(
+        self,
+        user_id: int,
+        username: str,
+        room: str,
+        portions: int,
+        dt: str,
+        dish_name: str,
+        order_id: str,
+        canceled: str = PENDING_STATUS,
+    ):
+        """Добавить заказ и запомнить его строку"""
+        order_id = str(order_id)
+        if canceled == PENDING_STATUS:
+            self._track_open(order_id, int(user_id), dt)
+        if self.buffer is not None:
+            future = await self.buffer.append(
+                "Orders",
+                build_order_row(
+                    user_id, username, room, portions, dt, dish_name, order_id, canceled
+                ),
+            )
+            self._pending[order_id] = future
+            future.add_done_callback(partial(self._on_appended, order_id))
+            return
+
+        row_index = await self.sheets.add_order(
+            user_id=user_id,
+            username=username,
+            room=room,
+            portions=portions,
+            dt=dt,
+            dish_name=dish_name,
+            order_id=order_id,
+            canceled=canceled,
+        )
+        if row_index:
+            self._rows[order_id] = row_index
+        else:
+            self._loaded = False
+
+    def _on_appended(self, order_id: str, future: asyncio.Future):
+        self._pending.pop(order_id, None)
+        if not future.cancelled() and future.result():
+            self._rows[order_id] = future.result()
+        else:
+            self._loaded = False
+
+    async def get_order(
+        self, order_id: str, include_archive: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Получить заказ одним чтением строки.
+
+        Сначала проверяется Orders, архивные листы - только по запросу.
+        """
+        order_id = str(order_id)
+        row_index = await self._find_row(order_id)
+        if row_index is None:
+            if include_archive:
+                return await self.sheets.find_archived_order(order_id)
+            return None
+
+        values = await self.sheets.get_order_row(row_index)
+        if len(values) <= _ORDER_ID_INDEX or values[_ORDER_ID_INDEX] != order_id:
+            # Строки сдвинулись (например, удалили заказ) - перестраиваем индекс
+            await self.load()
+            row_index = self._rows.get(order_id)
+            if row_index is None:
+                return None
+            values = await self.sheets.get_order_row(row_index)
+
+        values = values + [""] * (len(ORDER_FIELDS) - len(values))
+        order = dict(zip(ORDER_FIELDS, values))
+        order["row"] = row_index
+        if order["status"] != PENDING_STATUS:
+            # Статус могли изменить прямо в таблице
+            self._untrack_open(order_id)
+        return order
+
+    async def get_last_pending_order(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Последний ожидающий подтверждения заказ пользователя.
+
+        Берется из индекса и проверяется одним чтением строки.
+        """
+        await self.ensure_loaded()
+        order_ids = self._user_open.get(int(user_id))
+        if not order_ids:
+            return None
+        order_id = max(order_ids, key=lambda oid: self._open[oid][1])
+        order = await self.get_order(order_id)
+        if order is None:
+            self._untrack_open(order_id)
+        return order
+
+    async def _write_statuses(self, order_ids: List[str], status: str) -> List[str]:
+        # Строка из индекса проверяется по order_id при записи: если она
+        # сдвинулась, строка ищется по всему столбцу
+        cells = [(order_id, ORDER_STATUS_COLUMN, status) for order_id in order_ids]
+        hints = {oid: self._rows[oid] for oid in order_ids if oid in self._rows}
+        if self.buffer is not None:
+            await self.buffer.update_keyed("Orders", ORDER_ID_COLUMN, cells, hints)
+            return order_ids
+        return await self.sheets.update_keyed_cells(
+            "Orders", ORDER_ID_COLUMN, cells, hints
+        )
+
+    async def update_status(self, order_id: str, status: str) -> bool:
+        """Обновить статус заказа одной записью"""
+        order_id = str(order_id)
+        if status != PENDING_STATUS:
+            self._untrack_open(order_id)
+        async with self._archive_lock:
+            if order_id not in self._pending and await self._find_row(order_id) is None:
+                return False
+            return bool(await self._write_statuses([order_id], status))
+
+    def is_pending(self, order_id: str) -> bool:
+        """Ожидает ли заказ подтверждения (по индексу)"""
+        return str(order_id) in self._open
+
+    async def list_pending(self) -> List[Dict[str, Any]]:
+        """Все ожидающие подтверждения заказы одним чтением листа Orders"""
+        async with self._archive_lock:
+            # Заказы и статусы из буфера должны попасть в лист до чтения
+            if self.buffer is not None:
+                await self.buffer.flush()
+            orders = await self.sheets.get_all_orders(priority=PRIORITY_ADMIN)
+        pending = []
+        for order in orders:
+            order_id = order["order_id"]
+            self._rows[order_id] = order["row"]
+            if order["status"] != PENDING_STATUS:
+                self._untrack_open(order_id)
+                continue
+            try:
+                self._track_open(order_id, int(order["user_id"]), order["date"])
+            except ValueError:
+                continue
+            pending.append(order)
+        return pending
+
+    async def update_statuses(
+        self, order_ids: List[str], status: str, only_pending: bool = False
+    ) -> List[str]:
+        """Обновить статусы нескольких заказов одним batch_update.
+
+        С only_pending изменяются только заказы, которые еще ожидают
+        подтверждения: проверка идет под той же блокировкой, что и отмена
+        жителем, поэтому отмена не затирается. Возвращает ID заказов,
+        строки которых нашлись.
+        """
+        order_ids = [str(order_id) for order_id in order_ids]
+        async with self._archive_lock:
+            await self.ensure_loaded()
+            if only_pending:
+                order_ids = [oid for oid in order_ids if self.is_pending(oid)]
+            missing = [oid for oid in order_ids if oid not in self._rows]
+            for order_id in missing:
+                if order_id in self._pending:
+                    # Строка станет известна после сброса буфера
+                    await self._find_row(order_id)
+            if any(order_id not in self._rows for order_id in missing):
+                await self._reload()
+
+            updated = [
+                oid
+                for oid in order_ids
+                if oid in self._rows and (not only_pending or self.is_pending(oid))
+            ]
+            if updated:
+                updated = await self._write_statuses(updated, status)
+        if status != PENDING_STATUS:
+            for order_id in updated:
+                self._untrack_open(order_id)
+        return updated
+
+    async def archive_closed(self, days: int) -> int:
+        """Перенести закрытые заказы старше days дней в архивные листы"""
+        # Отложенные изменения пишутся в таблицу до сдвига строк, а новые
+        # ждут конца переноса
+        paused = self.buffer.paused() if self.buffer is not None else nullcontext()
+        async with self._archive_lock, paused:
+            older_than = datetime.now() - timedelta(days=days)
+            moved = await self.sheets.archive_orders(older_than)
+            if moved:
+                await self.load()
+            return moved
+
+    def start_archiving(self, days: int, interval: float):
+        """Запустить периодический перенос закрытых заказов в архив"""
+        if self._archive_task is None and interval > 0:
+            self._archive_task = asyncio.create_task(
+                self._archive_loop(days, interval)
+            )
+
+    async def stop(self):
+        if self._archive_task is not None:
+            self._archive_task.cancel()
+            try:
+                await self._archive_task
+            except asyncio.CancelledError:
+                pass
+            self._archive_task = None
+
+    async def _archive_loop(self, days: int, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.archive_closed(days)
+            except Exception as e:
+                logger.warning("Error archiving orders: %s", e)
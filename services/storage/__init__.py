@@ -0,0 +1,12 @@
+from services.storage.base import Repository, new_order_id
+from services.storage.fsm import SqliteFSMStorage
+from services.storage.sheets import SheetsRepository
+from services.storage.sqlite import SqliteRepository
+
+__all__ = [
+    "Repository",
+    "SheetsRepository",
+    "SqliteFSMStorage",
+    "SqliteRepository",
+    "new_order_id",
+]
@@ -0,0 +1,139 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from aiogram.types import Message
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS
+from services.capacity import PortionCapacity
+from services.kitchen import DishSummary, KitchenManifest
+
+
+def new_order_id(message: Message) -> str:
+    """ID заказа, уникальный между чатами: message_id уникален только внутри чата"""
+    return f"{message.chat.id}-{message.message_id}"
+
+
+def dish_matches(order: Dict[str, Any], dish_name: Optional[str]) -> bool:
+    """Заказ относится к блюду dish_name (без учета регистра); None - к любому"""
+    if not dish_name:
+        return True
+    return str(order.get("dish_name", "")).strip().lower() == dish_name.strip().lower()
+
+
+class Repository(ABC):
+    """Хранилище пользователей, анонсов и заказов, которое получают хендлеры.
+
+    Анонсы и заказы возвращаются словарями в том же виде, что и раньше:
+    анонс - по заголовкам листа Anonces плюс row_index, заказ - по полям
+    ORDER_FIELDS плюс row.
+    """
+
+    # Сводка для кухни, которую хранилище обновляет при изменении заказов
+    manifest: KitchenManifest
+    # Лимиты порций анонсов, которые хранилище узнает при чтении анонсов
+    capacity: PortionCapacity
+
+    async def start(self):
+        """Подготовить хранилище к работе"""
+
+    async def stop(self):
+        """Дописать отложенные изменения и освободить ресурсы"""
+
+    # Пользователи
+
+    @abstractmethod
+    async def ensure_user(self, user_id: int, language: str = "ru") -> bool:
+        """Добавить пользователя, если его еще нет. Возвращает True для нового"""
+
+    @abstractmethod
+    async def get_language(self, user_id: int) -> str:
+        """Язык пользователя"""
+
+    @abstractmethod
+    async def set_language(self, user_id: int, language: str):
+        """Изменить язык пользователя"""
+
+    @abstractmethod
+    async def set_user_status(self, user_id: int, status: str):
+        """Изменить статус доставки пользователя"""
+
+    @abstractmethod
+    async def list_user_ids(self) -> List[int]:
+        """Все пользователи для рассылки"""
+
+    async def get_languages(self, user_ids: List[int]) -> Dict[int, str]:
+        """Языки нескольких пользователей (для рассылки)"""
+        return {user_id: await self.get_language(user_id) for user_id in user_ids}
+
+    # Анонсы
+
+    @abstractmethod
+    async def get_unsent_announcements(self) -> List[Dict[str, Any]]:
+        """Неотправленные анонсы"""
+
+    @abstractmethod
+    async def get_announcement(self, announcement_id: int) -> Optional[Dict[str, Any]]:
+        """Анонс по ID (номеру строки в Anonces)"""
+
+    @abstractmethod
+    async def mark_announcement_sent(self, announcement_id: int):
+        """Пометить анонс как отправленный"""
+
+    # Заказы
+
+    @abstractmethod
+    async def add_order(
+        self,
+        user_id: int,
+        username: str,
+        room: str,
+        portions: int,
+        dt: str,
+        dish_name: str,
+        order_id: str,
+        canceled: str = PENDING_STATUS,
+    ):
+        """Добавить заказ"""
+
+    @abstractmethod
+    async def get_order(
+        self, order_id: str, include_archive: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Заказ по ID"""
+
+    @abstractmethod
+    async def update_order_status(self, order_id: str, status: str) -> bool:
+        """Изменить статус заказа"""
+
+    @abstractmethod
+    async def get_last_pending_order(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Последний ожидающий подтверждения заказ пользователя"""
+
+    @abstractmethod
+    async def list_pending_orders(
+        self, dish_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Ожидающие подтверждения заказы, по блюду или все, одним чтением"""
+
+    @abstractmethod
+    async def resolve_pending_orders(
+        self, order_ids: List[str], status: str
+    ) -> List[str]:
+        """Изменить статус заказов, которые еще ожидают подтверждения, одной записью.
+
+        Заказы, которые житель успел отменить, пропускаются. Возвращает ID
+        измененных заказов.
+        """
+
+    def _status_changed(self, order_id: str, status: str):
+        """Учесть новый статус заказа в сводке и лимитах порций"""
+        self.manifest.set_status(order_id, status)
+        if status not in (PENDING_STATUS, CONFIRMED_STATUS):
+            self.capacity.release_order(order_id)
+
+    # Сводка для кухни
+
+    async def kitchen_summary(self, day: Optional[str] = None) -> List[DishSummary]:
+        """Порции по блюдам и доставка по блокам за день (по умолчанию сегодня)"""
+        await self.manifest.ensure_loaded()
+        return self.manifest.summary(day)
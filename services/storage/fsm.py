@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fsm_updated ON fsm (updated);
+"""
+
+
+class SqliteFSMStorage(BaseStorage):
+    """FSM-хранилище aiogram в файле SQLite.
+
+    Незавершенные сценарии (например, бронирование) переживают перезапуск
+    бота. Пустые записи удаляются сразу, а сценарии без активности дольше
+    ttl секунд считаются брошенными: при чтении они не видны и раз в
+    evict_interval секунд удаляются из базы.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 6 * 3600,
+        evict_interval: float = 600,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запустить периодическое удаление брошенных сценариев"""
+        self.evict()
+        if self._task is None and self.ttl > 0 and self.evict_interval > 0:
+            self._task = asyncio.create_task(self._evict_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._db.close()
+
+    def evict(self) -> int:
+        """Удалить записи без активности дольше ttl"""
+        if self.ttl <= 0:
+            return 0
+        with self._db:
+            cursor = self._db.execute(
+                "DELETE FROM fsm WHERE updated < ?", (time.time() - self.ttl,)
+            )
+        if cursor.rowcount:
+            logger.info("Evicted idle FSM records", extra={"records": cursor.rowcount})
+        return cursor.rowcount
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            try:
+                self.evict()
+            except Exception as e:
+                logger.warning("Error evicting FSM records: %s", e)
+
+    def _read(self, key: StorageKey):
+        row = self._db.execute(
+            "SELECT state, data, updated FROM fsm WHERE key = ?",
+            (self.key_builder.build(key),),
+        ).fetchone()
+        if row is None:
+            return None, None
+        state, data, updated = row
+        if self.ttl > 0 and updated < time.time() - self.ttl:
+            return None, None
+        return state, data
+
+    def _write(self, key: StorageKey, state: Optional[str], data: Optional[str]):
+        db_key = self.key_builder.build(key)
+        with self._db:
+            if state is None and data is None:
+                self._db.execute("DELETE FROM fsm WHERE key = ?", (db_key,))
+            else:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, updated) "
+                    "VALUES (?, ?, ?, ?)",
+                    (db_key, state, data, time.time()),
+                )
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        if isinstance(state, State):
+            state = state.state
+        _, data = self._read(key)
+        self._write(key, state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = self._read(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]):
+        state, _ = self._read(key)
+        encoded = (
+            json.dumps(dict(data), ensure_ascii=False, separators=(",", ":"))
+            if data
+            else None
+        )
+        self._write(key, state, encoded)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = self._read(key)
+        return json.loads(data) if data else {}
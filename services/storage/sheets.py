@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Optional
+
+from services.announcement_cache import AnnouncementCache
+from services.api_client import PENDING_STATUS, USERS_STATUS_COLUMN
+from services.async_client import AsyncSheetsClient
+from services.capacity import BOOKED_HEADER, PortionCapacity
+from services.kitchen import KitchenManifest
+from services.order_store import OrderStore
+from services.storage.base import Repository, dish_matches
+from services.user_registry import UserRegistry
+from services.write_buffer import WriteBuffer
+
+
+class SheetsRepository(Repository):
+    """Хранилище поверх Google Sheets.
+
+    Пользователи обслуживаются из UserRegistry, заказы - через OrderStore,
+    анонсы - через AnnouncementCache, а записи идут через буфер отложенной
+    записи. Сводка для кухни сверяется с листом Orders одним чтением.
+    """
+
+    def __init__(
+        self,
+        sheets: AsyncSheetsClient,
+        registry: UserRegistry,
+        orders: OrderStore,
+        writes: WriteBuffer,
+        announcements: Optional[AnnouncementCache] = None,
+        capacity: Optional[PortionCapacity] = None,
+    ):
+        self.sheets = sheets
+        self.registry = registry
+        self.orders = orders
+        self.writes = writes
+        self.announcements = announcements or AnnouncementCache(sheets)
+        self.manifest = KitchenManifest(self._manifest_orders)
+        self.capacity = capacity or PortionCapacity()
+        self.capacity.persist = self._persist_booked
+        self.capacity.lookup = self.get_order
+
+    async def start(self):
+        self.registry.start()
+        await self.writes.start()
+        self.capacity.start()
+
+    async def stop(self):
+        await self.manifest.stop()
+        await self.capacity.stop()
+        await self.orders.stop()
+        await self.registry.stop()
+        await self.writes.stop()
+
+    async def ensure_user(self, user_id: int, language: str = "ru") -> bool:
+        return await self.registry.ensure_user(user_id, language)
+
+    async def get_language(self, user_id: int) -> str:
+        await self.registry.ensure_loaded()
+        return self.registry.get_language(user_id)
+
+    async def set_language(self, user_id: int, language: str):
+        await self.registry.set_language(user_id, language)
+
+    async def get_languages(self, user_ids: List[int]) -> Dict[int, str]:
+        await self.registry.ensure_loaded()
+        return {user_id: self.registry.get_language(user_id) for user_id in user_ids}
+
+    async def set_user_status(self, user_id: int, status: str):
+        await self.registry.ensure_loaded()
+        user = self.registry.get(user_id)
+        if user is None or not user.row:
+            return
+        await self.writes.update_cell("Users", user.row, USERS_STATUS_COLUMN, status)
+
+    async def list_user_ids(self) -> List[int]:
+        await self.registry.ensure_loaded()
+        return self.registry.audience()
+
+    async def get_unsent_announcements(self) -> List[Dict[str, Any]]:
+        unsent = await self.sheets.get_unsent_announcements()
+        # Анонсы уходят в рассылку - нажатия "Забронировать" пойдут в кэш
+        self.announcements.put_many(unsent)
+        for announcement in unsent:
+            self.capacity.observe(announcement["row_index"], announcement)
+        return unsent
+
+    async def get_announcement(self, announcement_id: int) -> Optional[Dict[str, Any]]:
+        announcement = await self.announcements.get(announcement_id)
+        if announcement is not None:
+            self.capacity.observe(announcement_id, announcement)
+        return announcement
+
+    async def set_announcements_booked(self, counts: Dict[int, int]):
+        """Записать в Anonces число забронированных порций одним batch_update"""
+        column = await self.sheets.get_column("Anonces", BOOKED_HEADER)
+        await self.writes.update_cells(
+            "Anonces",
+            [(int(row), column, booked) for row, booked in counts.items()],
+        )
+
+    async def mark_announcement_sent(self, announcement_id: int):
+        await self.writes.mark_announcement_sent(announcement_id)
+        self.announcements.invalidate(announcement_id)
+
+    async def add_order(
+        self,
+        user_id: int,
+        username: str,
+        room: str,
+        portions: int,
+        dt: str,
+        dish_name: str,
+        order_id: str,
+        canceled: str = PENDING_STATUS,
+    ):
+        await self.orders.add_order(
+            user_id=user_id,
+            username=username,
+            room=room,
+            portions=portions,
+            dt=dt,
+            dish_name=dish_name,
+            order_id=order_id,
+            canceled=canceled,
+        )
+        self.manifest.add(order_id, dish_name, room, portions, dt, canceled)
+
+    async def get_order(
+        self, order_id: str, include_archive: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        return await self.orders.get_order(order_id, include_archive=include_archive)
+
+    async def update_order_status(self, order_id: str, status: str) -> bool:
+        updated = await self.orders.update_status(order_id, status)
+        if updated:
+            self._status_changed(order_id, status)
+        return updated
+
+    async def get_last_pending_order(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return await self.orders.get_last_pending_order(user_id)
+
+    async def list_pending_orders(
+        self, dish_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return [
+            order
+            for order in await self.orders.list_pending()
+            if dish_matches(order, dish_name)
+        ]
+
+    async def resolve_pending_orders(
+        self, order_ids: List[str], status: str
+    ) -> List[str]:
+        return await self.update_order_statuses(order_ids, status, only_pending=True)
+
+    async def update_order_statuses(
+        self, order_ids: List[str], status: str, only_pending: bool = False
+    ) -> List[str]:
+        """Изменить статус нескольких заказов одним batch_update"""
+        updated = await self.orders.update_statuses(order_ids, status, only_pending)
+        for order_id in updated:
+            self._status_changed(order_id, status)
+        return updated
+
+    async def export_users(self) -> List[Dict[str, Any]]:
+        """Все пользователи для импорта в другое хранилище"""
+        await self.registry.ensure_loaded()
+        return [
+            {"user_id": user_id, "language": self.registry.get_language(user_id)}
+            for user_id in self.registry.audience()
+        ]
+
+    async def export_orders(self) -> List[Dict[str, Any]]:
+        """Все заказы листа Orders для импорта в другое хранилище"""
+        return await self.sheets.get_all_orders()
+
+    async def _persist_booked(self, counts: Dict[int, int]):
+        await self.set_announcements_booked(counts)
+
+    async def _manifest_orders(self, since: str) -> List[Dict[str, Any]]:
+        # Отложенные заказы и статусы должны попасть в лист до чтения.
+        # Старые заказы отсекает сама сводка: лист Orders ограничен архивом
+        await self.writes.flush()
+        return await self.sheets.get_all_orders()
@@ -0,0 +1,569 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from services.api_client import ORDER_FIELDS, PENDING_STATUS, is_retryable
+from services.capacity import BOOKED_HEADER, PortionCapacity
+from services.kitchen import KitchenManifest
+from services.storage.base import Repository, dish_matches
+from services.storage.sheets import SheetsRepository
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    language TEXT NOT NULL DEFAULT 'ru',
+    status TEXT NOT NULL DEFAULT 'active'
+);
+CREATE TABLE IF NOT EXISTS announcements (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    room TEXT,
+    portions TEXT,
+    date TEXT,
+    dish_name TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_user_status ON orders (user_id, status, date);
+CREATE INDEX IF NOT EXISTS orders_date ON orders (date);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox_parked (
+    id INTEGER PRIMARY KEY,
+    op TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SqliteRepository(Repository):
+    """Локальное хранилище на SQLite для горячего пути.
+
+    Хендлеры читают и пишут только локальную базу. Каждое изменение вместе
+    с записью в базе попадает в таблицу outbox, которую фоновая задача
+    переносит в Google Sheets (mirror), поэтому администраторы по-прежнему
+    видят данные в таблице. Анонсы создаются администраторами в таблице и
+    подтягиваются из нее периодически и при /send_menu, пользователи и
+    заказы, добавленные в таблицу мимо бота, - раз в import_interval.
+    Операцию outbox, которая max_attempts раз упала не из-за сети или
+    квоты, фоновая задача откладывает в outbox_parked. Сводка для кухни
+    сверяется с локальной базой.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mirror: Optional[SheetsRepository] = None,
+        sync_interval: float = 1.0,
+        pull_interval: float = 60.0,
+        import_interval: float = 300.0,
+        max_attempts: int = 5,
+        capacity: Optional[PortionCapacity] = None,
+    ):
+        self.path = path
+        self.mirror = mirror
+        self.sync_interval = sync_interval
+        self.pull_interval = pull_interval
+        self.import_interval = import_interval
+        self.max_attempts = max_attempts
+        # id операции outbox -> число неудачных попыток
+        self._attempts: Dict[int, int] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        # Перенос outbox дорабатывает текущую операцию, чтение таблицы отменяется
+        self._sync_task: Optional[asyncio.Task] = None
+        self._pull_task: Optional[asyncio.Task] = None
+        self._outbox_event = asyncio.Event()
+        self._closing = False
+        # user_id -> язык: handler-ам язык нужен на каждый апдейт
+        self._languages: Dict[int, str] = {}
+        self.manifest = KitchenManifest(self._manifest_orders)
+        self.capacity = capacity or PortionCapacity()
+        self.capacity.persist = self._persist_booked
+        self.capacity.lookup = self.get_order
+
+    async def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.row_factory = sqlite3.Row
+        # WAL и synchronous=NORMAL: коммит не ждет fsync на каждую запись
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+        if self.mirror is not None:
+            await self.mirror.start()
+            if self._get_meta("imported") is None:
+                # Только при первом запуске: без импорта локальная база пуста
+                await self._import_from_mirror()
+            self._sync_task = asyncio.create_task(self._sync_loop())
+            self._pull_task = asyncio.create_task(self._pull_loop())
+        self.capacity.start()
+
+    async def stop(self):
+        await self.manifest.stop()
+        await self.capacity.stop()
+        # Синхронизацию не прерываем посреди операции, иначе она повторится
+        self._closing = True
+        self._outbox_event.set()
+        if self._pull_task is not None:
+            self._pull_task.cancel()
+        tasks = [task for task in (self._sync_task, self._pull_task) if task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sync_task = self._pull_task = None
+        if self.mirror is not None:
+            try:
+                await self._drain_outbox()
+            except Exception as e:
+                logger.error("Error syncing outbox on shutdown: %s", e)
+            await self.mirror.stop()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row["value"] if row else None
+
+    def _enqueue(self, op: str, **payload):
+        """Добавить операцию для переноса в таблицу (в той же транзакции)"""
+        if self.mirror is None:
+            return
+        self._db.execute(
+            "INSERT INTO outbox (op, payload) VALUES (?, ?)",
+            (op, json.dumps(payload, ensure_ascii=False)),
+        )
+        self._outbox_event.set()
+
+    def _outbox_seq(self) -> int:
+        row = self._db.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'outbox'"
+        ).fetchone()
+        return row["seq"] if row else 0
+
+    async def _import_from_mirror(self):
+        """Импорт пользователей и заказов из таблицы.
+
+        Новые строки добавляются всегда. Статусы заказов обновляются, только
+        если за время чтения не появилось и не осталось локальных изменений:
+        иначе снимок таблицы затер бы их.
+        """
+        seq = self._outbox_seq()
+        users = await self.mirror.export_users()
+        orders = await self.mirror.export_orders()
+        orders = [
+            order
+            for order in orders
+            if order["order_id"] and str(order["user_id"]).isdigit()
+        ]
+        synced = (
+            self._outbox_seq() == seq
+            and self._db.execute("SELECT 1 FROM outbox LIMIT 1").fetchone() is None
+        )
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO users (user_id, language) VALUES (?, ?)",
+                [(user["user_id"], user["language"]) for user in users],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._order_params(order) for order in orders],
+            )
+            if synced:
+                self._db.executemany(
+                    "UPDATE orders SET status = ? "
+                    "WHERE order_id = ? AND status IS NOT ?",
+                    [
+                        (order["status"], str(order["order_id"]), order["status"])
+                        for order in orders
+                    ],
+                )
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', '1')"
+            )
+        logger.info(
+            "Imported data from Sheets",
+            extra={"users": len(users), "orders": len(orders)},
+        )
+
+    @staticmethod
+    def _order_params(order: Dict[str, Any]) -> tuple:
+        return (
+            str(order["order_id"]),
+            int(order["user_id"]),
+            order["username"],
+            order["room"],
+            str(order["portions"]),
+            order["date"],
+            order["dish_name"],
+            order["status"],
+        )
+
+    async def _pull_announcements(self) -> List[int]:
+        """Подтянуть неотправленные анонсы из таблицы"""
+        unsent = await self.mirror.get_unsent_announcements()
+        with self._db:
+            # Флаг sent не сбрасываем: отметка могла еще не дойти до таблицы
+            self._db.executemany(
+                "INSERT INTO announcements (id, data) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+                [
+                    (
+                        announcement["row_index"],
+                        json.dumps(announcement, ensure_ascii=False),
+                    )
+                    for announcement in unsent
+                ],
+            )
+        return [announcement["row_index"] for announcement in unsent]
+
+    async def _pull_loop(self):
+        # Первое чтение анонсов - сразу, но уже после начала приема апдейтов.
+        # Пользователи и заказы, добавленные в таблицу мимо бота, подтягиваются
+        # реже: это чтение всего листа Orders
+        imported = time.monotonic()
+        while True:
+            try:
+                await self._pull_announcements()
+            except Exception as e:
+                logger.warning("Error pulling announcements: %s", e)
+            if time.monotonic() - imported >= self.import_interval:
+                imported = time.monotonic()
+                try:
+                    await self._import_from_mirror()
+                except Exception as e:
+                    logger.warning("Error importing data from Sheets: %s", e)
+            await asyncio.sleep(self.pull_interval)
+
+    async def _sync_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._outbox_event.wait(), self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._outbox_event.clear()
+            try:
+                await self._drain_outbox()
+            except Exception as e:
+                logger.warning("Error syncing to Sheets: %s", e)
+                if not self._closing:
+                    await asyncio.sleep(self.sync_interval * 10)
+
+    async def _drain_outbox(self):
+        """Перенести накопленные изменения в таблицу по порядку"""
+        while True:
+            rows = self._db.execute(
+                "SELECT id, op, payload FROM outbox ORDER BY id LIMIT 100"
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                try:
+                    await self._apply(row["op"], json.loads(row["payload"]))
+                except Exception as e:
+                    if not self._should_park(row["id"], e):
+                        raise
+                    # Операция, которая падает не из-за сети и квоты, иначе
+                    # навсегда остановила бы перенос всех следующих
+                    logger.error(
+                        "Outbox operation parked: %s",
+                        e,
+                        extra={"op": row["op"], "outbox_id": row["id"]},
+                    )
+                    with self._db:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO outbox_parked "
+                            "(id, op, payload, error) VALUES (?, ?, ?, ?)",
+                            (row["id"], row["op"], row["payload"], repr(e)),
+                        )
+                        self._db.execute(
+                            "DELETE FROM outbox WHERE id = ?", (row["id"],)
+                        )
+                    continue
+                self._attempts.pop(row["id"], None)
+                with self._db:
+                    self._db.execute("DELETE FROM outbox WHERE id = ?", (row["id"],))
+
+    def _should_park(self, outbox_id: int, error: Exception) -> bool:
+        """Отложить операцию в outbox_parked после max_attempts ошибок.
+
+        Недоступность таблицы и превышение квоты не считаются: такие операции
+        ждут, сколько нужно.
+        """
+        if is_retryable(error) or isinstance(error, (asyncio.TimeoutError, OSError)):
+            return False
+        attempts = self._attempts.get(outbox_id, 0) + 1
+        if attempts < self.max_attempts:
+            self._attempts[outbox_id] = attempts
+            return False
+        self._attempts.pop(outbox_id, None)
+        return True
+
+    async def _apply(self, op: str, payload: Dict[str, Any]):
+        if op == "ensure_user":
+            await self.mirror.ensure_user(payload["user_id"], payload["language"])
+        elif op == "set_language":
+            await self.mirror.set_language(payload["user_id"], payload["language"])
+        elif op == "set_user_status":
+            await self.mirror.set_user_status(payload["user_id"], payload["status"])
+        elif op == "mark_announcement_sent":
+            await self.mirror.mark_announcement_sent(payload["announcement_id"])
+        elif op == "add_order":
+            await self.mirror.add_order(**payload)
+        elif op == "update_order_status":
+            await self.mirror.update_order_status(
+                payload["order_id"], payload["status"]
+            )
+        elif op == "set_announcements_booked":
+            await self.mirror.set_announcements_booked(
+                {int(key): value for key, value in payload["counts"].items()}
+            )
+        elif op == "update_order_statuses":
+            await self.mirror.update_order_statuses(
+                payload["order_ids"], payload["status"]
+            )
+        else:
+            logger.error("Unknown outbox operation", extra={"op": op})
+
+    async def ensure_user(self, user_id: int, language: str = "ru") -> bool:
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO users (user_id, language) VALUES (?, ?)",
+                (int(user_id), language),
+            )
+            created = cursor.rowcount > 0
+            if created:
+                self._enqueue("ensure_user", user_id=int(user_id), language=language)
+        if created:
+            self._languages[int(user_id)] = language
+        return created
+
+    async def get_language(self, user_id: int) -> str:
+        user_id = int(user_id)
+        language = self._languages.get(user_id)
+        if language is None:
+            row = self._db.execute(
+                "SELECT language FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            language = row["language"] if row and row["language"] else "ru"
+            self._languages[user_id] = language
+        return language
+
+    async def get_languages(self, user_ids: List[int]) -> Dict[int, str]:
+        if any(int(user_id) not in self._languages for user_id in user_ids):
+            # Рассылке нужны почти все пользователи - читаем таблицу целиком
+            rows = self._db.execute("SELECT user_id, language FROM users").fetchall()
+            for row in rows:
+                self._languages[row["user_id"]] = row["language"] or "ru"
+        return {
+            user_id: self._languages.get(int(user_id), "ru") for user_id in user_ids
+        }
+
+    async def set_language(self, user_id: int, language: str):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO users (user_id, language) VALUES (?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET language = excluded.language",
+                (int(user_id), language),
+            )
+            self._enqueue("set_language", user_id=int(user_id), language=language)
+        self._languages[int(user_id)] = language
+
+    async def set_user_status(self, user_id: int, status: str):
+        with self._db:
+            self._db.execute(
+                "UPDATE users SET status = ? WHERE user_id = ?", (status, int(user_id))
+            )
+            self._enqueue("set_user_status", user_id=int(user_id), status=status)
+
+    async def list_user_ids(self) -> List[int]:
+        rows = self._db.execute("SELECT user_id FROM users").fetchall()
+        return [row["user_id"] for row in rows]
+
+    async def get_unsent_announcements(self) -> List[Dict[str, Any]]:
+        if self.mirror is not None:
+            # Анонсы заводят в таблице - перед рассылкой берем свежие
+            try:
+                await self._pull_announcements()
+            except Exception as e:
+                logger.warning("Error pulling announcements, using local copy: %s", e)
+        rows = self._db.execute(
+            "SELECT data FROM announcements WHERE sent = 0 ORDER BY id"
+        ).fetchall()
+        unsent = [json.loads(row["data"]) for row in rows]
+        for announcement in unsent:
+            self.capacity.observe(announcement["row_index"], announcement)
+        return unsent
+
+    async def get_announcement(self, announcement_id: int) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT data FROM announcements WHERE id = ?", (int(announcement_id),)
+        ).fetchone()
+        if row is not None:
+            announcement = json.loads(row["data"])
+            announcement.pop("row_index", None)
+        elif self.mirror is not None:
+            announcement = await self.mirror.get_announcement(announcement_id)
+        else:
+            announcement = None
+        if announcement is not None:
+            self.capacity.observe(announcement_id, announcement)
+        return announcement
+
+    async def _persist_booked(self, counts: Dict[int, int]):
+        with self._db:
+            # Локальная копия анонса тоже обновляется: ее читают после перезапуска
+            self._db.executemany(
+                "UPDATE announcements SET data = json_set(data, ?, ?) WHERE id = ?",
+                [
+                    (f'$."{BOOKED_HEADER}"', str(booked), announcement_id)
+                    for announcement_id, booked in counts.items()
+                ],
+            )
+            self._enqueue(
+                "set_announcements_booked",
+                counts={str(key): value for key, value in counts.items()},
+            )
+
+    async def mark_announcement_sent(self, announcement_id: int):
+        with self._db:
+            self._db.execute(
+                "UPDATE announcements SET sent = 1 WHERE id = ?",
+                (int(announcement_id),),
+            )
+            self._enqueue(
+                "mark_announcement_sent", announcement_id=int(announcement_id)
+            )
+
+    async def add_order(
+        self,
+        user_id: int,
+        username: str,
+        room: str,
+        portions: int,
+        dt: str,
+        dish_name: str,
+        order_id: str,
+        canceled: str = PENDING_STATUS,
+    ):
+        order = dict(
+            user_id=int(user_id),
+            username=username,
+            room=room,
+            portions=portions,
+            dt=dt,
+            dish_name=dish_name,
+            order_id=str(order_id),
+            canceled=canceled,
+        )
+        with self._db:
+            self._db.execute(
+                "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(order_id),
+                    int(user_id),
+                    username,
+                    room,
+                    str(portions),
+                    dt,
+                    dish_name,
+                    canceled,
+                ),
+            )
+            self._enqueue("add_order", **order)
+        self.manifest.add(order_id, dish_name, room, portions, dt, canceled)
+
+    def _order_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        order = {field: row[field] for field in ORDER_FIELDS}
+        order["user_id"] = str(order["user_id"])
+        order["row"] = None
+        return order
+
+    async def get_order(
+        self, order_id: str, include_archive: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT * FROM orders WHERE order_id = ?", (str(order_id),)
+        ).fetchone()
+        if row is not None:
+            return self._order_from_row(row)
+        if include_archive and self.mirror is not None:
+            return await self.mirror.get_order(order_id, include_archive=True)
+        return None
+
+    async def update_order_status(self, order_id: str, status: str) -> bool:
+        with self._db:
+            cursor = self._db.execute(
+                "UPDATE orders SET status = ? WHERE order_id = ?",
+                (status, str(order_id)),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._enqueue("update_order_status", order_id=str(order_id), status=status)
+        self._status_changed(order_id, status)
+        return True
+
+    async def get_last_pending_order(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT * FROM orders WHERE user_id = ? AND status = ? "
+            "ORDER BY date DESC LIMIT 1",
+            (int(user_id), PENDING_STATUS),
+        ).fetchone()
+        return self._order_from_row(row) if row is not None else None
+
+    async def list_pending_orders(
+        self, dish_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        rows = self._db.execute(
+            "SELECT * FROM orders WHERE status = ? ORDER BY date", (PENDING_STATUS,)
+        ).fetchall()
+        orders = [self._order_from_row(row) for row in rows]
+        return [order for order in orders if dish_matches(order, dish_name)]
+
+    async def resolve_pending_orders(
+        self, order_ids: List[str], status: str
+    ) -> List[str]:
+        updated = []
+        with self._db:
+            for order_id in order_ids:
+                cursor = self._db.execute(
+                    "UPDATE orders SET status = ? WHERE order_id = ? AND status = ?",
+                    (status, str(order_id), PENDING_STATUS),
+                )
+                if cursor.rowcount:
+                    updated.append(str(order_id))
+            if updated:
+                # Одна операция - в таблицу уходит одним batch_update
+                self._enqueue("update_order_statuses", order_ids=updated, status=status)
+        for order_id in updated:
+            self._status_changed(order_id, status)
+        return updated
+
+    async def _manifest_orders(self, since: str) -> List[Dict[str, Any]]:
+        rows = self._db.execute(
+            "SELECT * FROM orders WHERE date >= ?", (since,)
+        ).fetchall()
+        return [self._order_from_row(row) for row in rows]
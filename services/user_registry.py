@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from services.async_client import AsyncSheetsClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UserRecord:
+    row: int
+    language: str = "ru"
+
+
+class UserRegistry:
+    """Реестр пользователей в памяти.
+
+    Лист Users загружается один раз и затем периодически обновляется одним
+    запросом. Все изменения записываются в таблицу сразу (write-through),
+    поэтому после прогрева /start, определение языка и сбор аудитории
+    рассылки не обращаются к Google Sheets.
+    """
+
+    def __init__(self, sheets: AsyncSheetsClient, refresh_interval: float = 300.0):
+        self.sheets = sheets
+        self.refresh_interval = refresh_interval
+        self._users: Dict[int, UserRecord] = {}
+        # Когда пользователь был добавлен ботом: чтение листа, начатое раньше,
+        # не должно его потерять
+        self._added: Dict[int, float] = {}
+        # user_id -> future добавления строки, которое сейчас идет
+        self._adding: Dict[int, asyncio.Future] = {}
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Загрузить всех пользователей из листа Users"""
+        started = asyncio.get_running_loop().time()
+        rows = await self.sheets.get_user_rows()
+        users = {}
+        for row_index, user_id, language in rows:
+            try:
+                users[int(user_id)] = UserRecord(row=row_index, language=language)
+            except ValueError:
+                logger.warning(
+                    "Skipping invalid user_id",
+                    extra={"row": row_index, "user_id": user_id},
+                )
+        # Дальше без await: слияние не пересекается с добавлением
+        for user_id, added in list(self._added.items()):
+            if added >= started and user_id in self._users:
+                users.setdefault(user_id, self._users[user_id])
+            elif added < started - self.refresh_interval:
+                del self._added[user_id]
+        self._users = users
+        self._loaded = True
+        logger.info("User registry loaded", extra={"users": len(users)})
+
+    async def ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    def start(self):
+        """Запустить периодическое обновление реестра"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning("Error refreshing user registry: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        return self._users.get(int(user_id))
+
+    def __contains__(self, user_id: int) -> bool:
+        return int(user_id) in self._users
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get_language(self, user_id: int) -> str:
+        """Получить язык пользователя"""
+        record = self.get(user_id)
+        return record.language if record else "ru"
+
+    def audience(self) -> List[int]:
+        """Список user_id для рассылки"""
+        return list(self._users)
+
+    async def _add(self, user_id: int, language: str) -> bool:
+        """Добавить строку пользователя, если его еще нет.
+
+        Запрос к таблице идет без общей блокировки: /start разных жителей не
+        ждут друг друга. Повторный вызов для того же user_id дожидается уже
+        идущего добавления, а если оно не удалось - пробует сам.
+        """
+        while True:
+            if user_id in self._users:
+                return False
+            adding = self._adding.get(user_id)
+            if adding is None:
+                break
+            # shield: отмена ожидающего не должна отменить чужое добавление
+            await asyncio.shield(adding)
+        adding = asyncio.get_running_loop().create_future()
+        self._adding[user_id] = adding
+        try:
+            row_index = await self.sheets.append_user(user_id, language)
+            self._users[user_id] = UserRecord(row=row_index, language=language)
+            self._added[user_id] = asyncio.get_running_loop().time()
+        finally:
+            del self._adding[user_id]
+            adding.set_result(None)
+        return True
+
+    async def ensure_user(self, user_id: int, language: str = "ru") -> bool:
+        """Добавить пользователя, если его еще нет. Возвращает True для нового"""
+        await self.ensure_loaded()
+        return await self._add(int(user_id), language)
+
+    async def set_language(self, user_id: int, language: str):
+        """Обновить язык пользователя"""
+        await self.ensure_loaded()
+        user_id = int(user_id)
+        if await self._add(user_id, language):
+            return
+        record = self._users[user_id]
+        if record.row:
+            await self.sheets.set_user_language_at(record.row, language)
+        else:
+            await self.sheets.update_user_language(user_id, language)
+        record.language = language
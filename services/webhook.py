@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config.settings import WebhookConfig
+
+logger = logging.getLogger(__name__)
+
+
+def check_webhook_config(config: WebhookConfig):
+    """Не регистрировать публичный вебхук без секрета.
+
+    Без него любой, кто знает URL, может прислать боту поддельный апдейт,
+    например нажатие кнопки подтверждения заказа от имени админа.
+    """
+    if not config.secret:
+        if config.url:
+            raise ValueError("WEBHOOK_SECRET must be set when WEBHOOK_URL is set")
+        logger.warning("WEBHOOK_SECRET is not set, webhook requests are not verified")
+
+
+def build_webhook_app(
+    dp: Dispatcher, bot: Bot, config: WebhookConfig
+) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты Telegram по config.path.
+
+    Ответ 200 отдается сразу, апдейт обрабатывается в фоне. Запросы без
+    правильного заголовка X-Telegram-Bot-Api-Secret-Token отклоняются.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=config.secret or None,
+    ).register(app, path=config.path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: WebhookConfig):
+    """Запустить веб-сервер и зарегистрировать вебхук в Telegram.
+
+    Если публичный URL не задан, вебхук не регистрируется - так сервер
+    можно проверить локально, отправляя сохраненные апдейты POST-запросом.
+    """
+    check_webhook_config(config)
+    runner = web.AppRunner(build_webhook_app(dp, bot, config))
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.host, port=config.port)
+    await site.start()
+    logger.info(
+        "Listening for webhook updates on %s:%s%s", config.host, config.port, config.path
+    )
+
+    try:
+        if config.url:
+            await bot.set_webhook(
+                url=config.url.rstrip("/") + config.path,
+                secret_token=config.secret or None,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info("Webhook registered at %s%s", config.url.rstrip("/"), config.path)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
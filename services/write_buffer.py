@@ -0,0 +1,427 @@
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.api_client import ORDER_ID_COLUMN, api_error_status
+from services.async_client import AsyncSheetsClient
+
+logger = logging.getLogger(__name__)
+
+# Столбец с уникальным ключом строки: по нему повторное добавление
+# проверяет, не дошла ли строка до таблицы в прошлый раз
+APPEND_KEYS = {"Orders": ORDER_ID_COLUMN}
+
+
+@dataclass
+class _PendingAppend:
+    seq: int
+    values: List[Any]
+    future: asyncio.Future
+    # Прошлая попытка могла записать строку (5xx, таймаут, падение процесса)
+    uncertain: bool = False
+
+
+@dataclass
+class _SheetBatch:
+    appends: List[_PendingAppend] = field(default_factory=list)
+    # (row, col) -> (seq, value): повторная запись в ту же ячейку заменяет старую
+    cells: Dict[Tuple[int, int], Tuple[int, Any]] = field(default_factory=dict)
+    # (key_column, key, col) -> (seq, value): ячейки строк, которые ищутся по
+    # значению в key_column в момент сброса
+    keyed: Dict[Tuple[int, str, int], Tuple[int, Any]] = field(default_factory=dict)
+    # (key_column, key) -> известный номер строки: при сбросе проверяется
+    # только он, а столбец читается целиком, если ключ там уже другой
+    hints: Dict[Tuple[int, str], int] = field(default_factory=dict)
+
+
+class WriteBuffer:
+    """Буфер отложенной записи в Google Sheets.
+
+    Новые строки собираются в append_rows, изменения ячеек - в batch_update,
+    сброс происходит раз в flush_interval секунд или по накоплении max_ops
+    операций. Каждая операция сначала пишется в локальный журнал, поэтому
+    при падении до сброса ничего не теряется: при запуске журнал
+    проигрывается заново. Если прошлая попытка добавить строки могла
+    дойти до таблицы, перед повтором строки с уже записанным ключом из
+    append_keys пропускаются; в листах без ключа строка может повториться.
+    """
+
+    def __init__(
+        self,
+        sheets: AsyncSheetsClient,
+        journal_path: str,
+        flush_interval: float = 0.3,
+        max_ops: int = 50,
+        append_keys: Optional[Dict[str, int]] = None,
+    ):
+        self.sheets = sheets
+        self.append_keys = APPEND_KEYS if append_keys is None else append_keys
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.max_ops = max_ops
+        self._batches: Dict[str, _SheetBatch] = {}
+        self._seq = 0
+        self._pending = 0
+        self._journal = None
+        self._lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self):
+        """Проиграть журнал и запустить фоновый сброс"""
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        replayed, superseded = self._replay_journal()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if superseded:
+            self._write_journal({"done": superseded})
+        self._task = asyncio.create_task(self._flush_loop())
+        if replayed:
+            # Сбрасываем в фоне: запуск бота не ждет Google Sheets
+            logger.info("Replaying journaled writes", extra={"writes": replayed})
+            self._wakeup.set()
+
+    async def stop(self):
+        """Остановить фоновый сброс и записать все, что осталось"""
+        if self._task is not None:
+            # Не отменяем сброс на середине: снятая с очереди пачка потерялась бы
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def _replay_journal(self) -> Tuple[int, List[int]]:
+        """Вернуть в очередь неподтвержденные операции журнала.
+
+        Возвращает их число и seq старых изменений ячеек, замененных более
+        новыми: их нужно отметить выполненными, иначе после следующего
+        падения старое значение записалось бы поверх нового.
+        """
+        if not os.path.exists(self.journal_path):
+            return 0, []
+        ops = []
+        done: Set[int] = set()
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Недописанная строка при падении - пропускаем
+                    continue
+                if "done" in entry:
+                    done.update(entry["done"])
+                else:
+                    ops.append(entry)
+                    self._seq = max(self._seq, entry["seq"])
+
+        loop = asyncio.get_running_loop()
+        replayed = 0
+        superseded: List[int] = []
+        for entry in sorted(ops, key=lambda op: op["seq"]):
+            if entry["seq"] in done:
+                continue
+            batch = self._batches.setdefault(entry["sheet"], _SheetBatch())
+            if entry["op"] == "append":
+                batch.appends.append(
+                    _PendingAppend(
+                        entry["seq"], entry["values"], loop.create_future(), True
+                    )
+                )
+            else:
+                if entry["op"] == "update_keyed":
+                    cells = batch.keyed
+                    key = (entry["key_column"], entry["key"], entry["col"])
+                    if entry.get("row"):
+                        batch.hints[key[:2]] = entry["row"]
+                else:
+                    cells = batch.cells
+                    key = (entry["row"], entry["col"])
+                if key in cells:
+                    superseded.append(cells[key][0])
+                    replayed -= 1
+                cells[key] = (entry["seq"], entry["value"])
+            replayed += 1
+        self._pending = replayed
+        return replayed, superseded
+
+    def _write_journal(self, entry: Dict[str, Any]):
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        # flush достаточно, чтобы пережить падение процесса; fsync - при сбросе
+        self._journal.flush()
+
+    def _enqueued(self):
+        self._pending += 1
+        if self._pending >= self.max_ops:
+            self._wakeup.set()
+
+    async def append(self, sheet: str, values: List[Any]) -> asyncio.Future:
+        """Поставить в очередь новую строку.
+
+        Возвращает future с номером строки, который станет известен после сброса.
+        """
+        async with self._lock:
+            self._seq += 1
+            self._write_journal(
+                {"seq": self._seq, "op": "append", "sheet": sheet, "values": values}
+            )
+            future = asyncio.get_running_loop().create_future()
+            batch = self._batches.setdefault(sheet, _SheetBatch())
+            batch.appends.append(_PendingAppend(self._seq, values, future))
+            self._enqueued()
+            return future
+
+    async def update_cell(self, sheet: str, row: int, col: int, value: Any):
+        """Поставить в очередь изменение ячейки"""
+        await self.update_cells(sheet, [(row, col, value)])
+
+    async def update_cells(self, sheet: str, cells: List[Tuple[int, int, Any]]):
+        """Поставить в очередь изменения нескольких ячеек.
+
+        Все они попадают в одну пачку и уходят одним batch_update.
+        """
+        async with self._lock:
+            batch = self._batches.setdefault(sheet, _SheetBatch())
+            superseded = []
+            for row, col, value in cells:
+                old = batch.cells.get((row, col))
+                if old is not None:
+                    superseded.append(old[0])
+                self._seq += 1
+                self._write_journal(
+                    {
+                        "seq": self._seq,
+                        "op": "update",
+                        "sheet": sheet,
+                        "row": row,
+                        "col": col,
+                        "value": value,
+                    }
+                )
+                batch.cells[(row, col)] = (self._seq, value)
+                if old is None:
+                    self._enqueued()
+            if superseded:
+                # Старое значение уже не будет записано - при проигрывании
+                # журнала оно не должно затереть новое
+                self._write_journal({"done": superseded})
+
+    async def update_keyed(
+        self,
+        sheet: str,
+        key_column: int,
+        cells: List[Tuple[str, int, Any]],
+        hints: Optional[Dict[str, int]] = None,
+    ):
+        """Поставить в очередь изменения ячеек строк, заданных значением key_column.
+
+        Строка проверяется при сбросе, вместе с записью: строки могут
+        сдвинуться, пока изменение ждет в очереди (перенос в архив, правка
+        таблицы, другой воркер). hints - известные номера строк ключей:
+        читается только ячейка ключа в этой строке, а не весь столбец.
+        """
+        hints = hints or {}
+        async with self._lock:
+            batch = self._batches.setdefault(sheet, _SheetBatch())
+            superseded = []
+            for key, col, value in cells:
+                old = batch.keyed.get((key_column, key, col))
+                if old is not None:
+                    superseded.append(old[0])
+                self._seq += 1
+                self._write_journal(
+                    {
+                        "seq": self._seq,
+                        "op": "update_keyed",
+                        "sheet": sheet,
+                        "key_column": key_column,
+                        "key": key,
+                        "col": col,
+                        "value": value,
+                        "row": hints.get(key),
+                    }
+                )
+                batch.keyed[(key_column, key, col)] = (self._seq, value)
+                if key in hints:
+                    batch.hints[(key_column, key)] = hints[key]
+                if old is None:
+                    self._enqueued()
+            if superseded:
+                self._write_journal({"done": superseded})
+
+    async def mark_announcement_sent(self, row_index: int):
+        """Пометить анонс как отправленный"""
+        sent_column = await self.sheets.get_column("Anonces", "Отправлено")
+        await self.update_cell("Anonces", row_index, sent_column, "TRUE")
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Error flushing write buffer: %s", e)
+                # Операции остаются в очереди и в журнале до следующей попытки
+                if not self._closing:
+                    await asyncio.sleep(self.flush_interval * 10)
+
+    async def flush(self):
+        """Записать накопленные операции в таблицу"""
+        async with self._flush_lock:
+            await self._flush()
+
+    @asynccontextmanager
+    async def paused(self):
+        """Записать накопленное и не сбрасывать новое до выхода из блока.
+
+        Для операций, которые сдвигают строки в таблице (перенос в архив).
+        """
+        async with self._flush_lock:
+            await self._flush()
+            yield
+
+    async def _flush(self):
+        async with self._lock:
+            batches, self._batches = self._batches, {}
+            self._pending = 0
+        if not batches:
+            return
+        if self._journal is not None:
+            os.fsync(self._journal.fileno())
+
+        failed: Dict[str, _SheetBatch] = {}
+        error = None
+        for sheet, batch in batches.items():
+            try:
+                await self._flush_sheet(sheet, batch)
+            except Exception as e:
+                failed[sheet] = batch
+                error = e
+
+        async with self._lock:
+            for sheet, batch in failed.items():
+                self._requeue(sheet, batch)
+            if not self._batches and self._journal is not None:
+                # Все подтверждено - журнал можно обнулить
+                self._journal.truncate(0)
+                self._journal.seek(0)
+        if error is not None:
+            raise error
+
+    async def _mark_done(self, seqs: List[int]):
+        async with self._lock:
+            if self._journal is not None:
+                self._write_journal({"done": seqs})
+
+    async def _skip_written(self, sheet: str, batch: _SheetBatch):
+        """Убрать из пачки строки, которые прошлая попытка успела записать"""
+        key_column = self.append_keys.get(sheet)
+        if key_column is None or not any(item.uncertain for item in batch.appends):
+            return
+        rows = {
+            value: row_index
+            for row_index, value in enumerate(
+                await self.sheets.get_column_values(sheet, key_column), start=1
+            )
+        }
+        written, rest = [], []
+        for item in batch.appends:
+            row_index = rows.get(str(item.values[key_column - 1]))
+            if item.uncertain and row_index is not None:
+                if not item.future.done():
+                    item.future.set_result(row_index)
+                written.append(item.seq)
+            else:
+                rest.append(item)
+        if written:
+            logger.info(
+                "Skipping rows already written",
+                extra={"sheet": sheet, "rows": len(written)},
+            )
+            await self._mark_done(written)
+            batch.appends = rest
+
+    async def _flush_sheet(self, sheet: str, batch: _SheetBatch):
+        await self._skip_written(sheet, batch)
+        if batch.appends:
+            try:
+                first_row = await self.sheets.append_rows(
+                    sheet, [item.values for item in batch.appends]
+                )
+            except Exception as e:
+                if api_error_status(e) != 429:
+                    # Запрос мог выполниться - перед повтором проверим таблицу
+                    for item in batch.appends:
+                        item.uncertain = True
+                raise
+            for offset, item in enumerate(batch.appends):
+                if not item.future.done():
+                    item.future.set_result(
+                        first_row + offset if first_row is not None else None
+                    )
+            await self._mark_done([item.seq for item in batch.appends])
+            batch.appends = []
+        if batch.cells:
+            cells = [(row, col, value) for (row, col), (_, value) in batch.cells.items()]
+            await self.sheets.update_cells(sheet, cells)
+            await self._mark_done([seq for seq, _ in batch.cells.values()])
+            batch.cells = {}
+        if batch.keyed:
+            by_column: Dict[int, List[Tuple[str, int, Any]]] = {}
+            for (key_column, key, col), (_, value) in batch.keyed.items():
+                by_column.setdefault(key_column, []).append((key, col, value))
+            for key_column, cells in by_column.items():
+                hints = {
+                    key: row
+                    for (column, key), row in batch.hints.items()
+                    if column == key_column
+                }
+                found = set(
+                    await self.sheets.update_keyed_cells(
+                        sheet, key_column, cells, hints
+                    )
+                )
+                missing = {key for key, _, _ in cells} - found
+                if missing:
+                    # Строку удалили из листа - изменять нечего
+                    logger.warning(
+                        "Rows not found for keyed writes",
+                        extra={"sheet": sheet, "keys": ",".join(sorted(missing))},
+                    )
+            await self._mark_done([seq for seq, _ in batch.keyed.values()])
+            batch.keyed = {}
+            batch.hints = {}
+
+    def _requeue(self, sheet: str, batch: _SheetBatch):
+        current = self._batches.setdefault(sheet, _SheetBatch())
+        current.appends = batch.appends + current.appends
+        # Более новые изменения тех же ячеек имеют приоритет
+        superseded = []
+        for name in ("cells", "keyed"):
+            cells = dict(getattr(batch, name))
+            newer = getattr(current, name)
+            superseded += [seq for key, (seq, _) in cells.items() if key in newer]
+            cells.update(newer)
+            setattr(current, name, cells)
+        current.hints = {**batch.hints, **current.hints}
+        self._pending += (
+            len(batch.appends) + len(batch.cells) + len(batch.keyed) - len(superseded)
+        )
+        if superseded and self._journal is not None:
+            self._write_journal({"done": superseded})
@@ -0,0 +1,34 @@
+import asyncio
+
+from services.announcement_cache import AnnouncementCache
+
+
+class FakeSheets:
+    def __init__(self):
+        self.reads = 0
+
+    async def get_announcement_by_id(self, row_index):
+        self.reads += 1
+        await asyncio.sleep(0.01)
+        return {"Название блюда": "Плов", "Цена": "250"}
+
+
+def test_concurrent_misses_share_one_read():
+    sheets = FakeSheets()
+
+    async def scenario():
+        cache = AnnouncementCache(sheets, ttl=60)
+        results = await asyncio.gather(*(cache.get(5) for _ in range(20)))
+        # Запись уже в кэше - следующее нажатие таблицу не читает
+        results.append(await cache.get(5))
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert sheets.reads == 1
+    assert (cache.misses, cache.hits) == (20, 1)
+    assert all(
+        result == {"Название блюда": "Плов", "Цена": "250"} for result in results
+    )
+    # Каждый получает свою копию
+    results[0]["Цена"] = "0"
+    assert results[1]["Цена"] == "250"
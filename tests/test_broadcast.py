@@ -0,0 +1,27 @@
+import asyncio
+
+from services.broadcast import BroadcastEngine
+
+
+def test_per_chat_pacing_forgets_past_chats():
+    async def scenario():
+        engine = BroadcastEngine(None, rate_limit=1e6, per_chat_interval=0.001)
+        for chat_id in range(5000):
+            await engine._wait_slot(chat_id)
+            if chat_id % 500 == 0:
+                await asyncio.sleep(0.002)
+        return len(engine._chat_next)
+
+    assert asyncio.run(scenario()) < 2100
+
+
+def test_per_chat_pacing_still_spaces_one_chat():
+    async def scenario():
+        engine = BroadcastEngine(None, rate_limit=1e6, per_chat_interval=0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await engine._wait_slot(1)
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.09
@@ -0,0 +1,167 @@
+import asyncio
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS, REJECTED_STATUS
+from services.capacity import BOOKED_HEADER, CAPACITY_HEADER, PortionCapacity
+from services.cluster import ClusterCapacity, HashRing, WorkerContext
+
+
+def make_capacity(tmp_path, **kwargs) -> PortionCapacity:
+    return PortionCapacity(
+        state_path=str(tmp_path / "capacity.json"), flush_interval=0.01, **kwargs
+    )
+
+
+def test_shard_keeps_booked_portions_after_restart(tmp_path):
+    announcement = {CAPACITY_HEADER: "10", BOOKED_HEADER: ""}
+
+    async def first_run():
+        capacity = make_capacity(tmp_path, shard=0, shards=2)
+        capacity.start()
+        capacity.observe(2, announcement)
+        assert capacity.commit(2, 100, 3, "A1")
+        await capacity.stop()
+
+    async def second_run():
+        capacity = make_capacity(tmp_path, shard=0, shards=2)
+        capacity.start()
+        capacity.observe(2, announcement)
+        remaining = capacity.remaining(2)
+        capacity.release_order("A1")
+        return remaining, capacity.remaining(2)
+
+    asyncio.run(first_run())
+    assert asyncio.run(second_run()) == (2, 5)
+
+
+def test_order_closed_while_stopped_returns_portions(tmp_path):
+    statuses = {"A1": REJECTED_STATUS, "A2": CONFIRMED_STATUS}
+
+    async def lookup(order_id):
+        return {"order_id": order_id, "status": statuses[order_id]}
+
+    async def first_run():
+        capacity = make_capacity(tmp_path)
+        capacity.start()
+        capacity.observe(2, {CAPACITY_HEADER: "10"})
+        assert capacity.commit(2, 100, 3, "A1")
+        assert capacity.commit(2, 101, 2, "A2")
+        await capacity.stop()
+
+    async def second_run():
+        capacity = make_capacity(tmp_path, check_interval=0)
+        capacity.lookup = lookup
+        capacity.start()
+        await capacity._check_task
+        capacity.observe(2, {CAPACITY_HEADER: "10"})
+        return capacity.remaining(2)
+
+    asyncio.run(first_run())
+    assert asyncio.run(second_run()) == 8
+
+
+def test_failed_persist_is_retried(tmp_path):
+    writes = []
+
+    async def persist(counts):
+        writes.append(counts)
+        if len(writes) == 1:
+            raise RuntimeError("Sheets unavailable")
+
+    async def scenario():
+        capacity = PortionCapacity(flush_interval=0.01)
+        capacity.persist = persist
+        capacity.observe(2, {CAPACITY_HEADER: "10", BOOKED_HEADER: "1"})
+        assert capacity.commit(2, 100, 3, "A1")
+        await asyncio.sleep(0.1)
+        await capacity.stop()
+
+    asyncio.run(scenario())
+    assert writes == [{2: 4}, {2: 4}]
+
+
+class _Inbox:
+    """Очередь воркера в том же цикле событий"""
+
+    def __init__(self, peers, index):
+        self.peers = peers
+        self.index = index
+
+    def put(self, item):
+        asyncio.get_running_loop().call_soon(self.peers[self.index].handle, item)
+
+
+def make_cluster(tmp_path, workers: int):
+    peers = []
+    inboxes = [_Inbox(peers, index) for index in range(workers)]
+    ring = HashRing(workers)
+    for index in range(workers):
+        capacity = PortionCapacity(
+            shard=index,
+            shards=workers,
+            state_path=str(tmp_path / f"capacity.w{index}.json"),
+        )
+        peers.append(ClusterCapacity(capacity, WorkerContext(index, inboxes, ring)))
+    return [peer.capacity for peer in peers], ring
+
+
+def test_worker_borrows_portions_from_peers(tmp_path):
+    async def scenario():
+        (first, second), _ = make_cluster(tmp_path, 2)
+        # Лимит 5: доли 3 и 2, второй воркер анонс еще не читал
+        first.observe(2, {CAPACITY_HEADER: "5"})
+        assert first.commit(2, 100, 3, "100-1")
+        assert not first.hold(2, 101, 2)
+        assert await first.top_up(2, 101, 2)
+        assert first.hold(2, 101, 2)
+        # Больше порций нет ни у кого
+        assert not await first.top_up(2, 102, 1)
+        second.observe(2, {CAPACITY_HEADER: "5"})
+        left = second.remaining(2)
+        await first.stop()
+        await second.stop()
+        return left
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_release_reaches_worker_that_committed(tmp_path):
+    async def scenario():
+        capacities, ring = make_cluster(tmp_path, 2)
+        owner = ring.owner(100)
+        committed, other = capacities[owner], capacities[1 - owner]
+        for capacity in capacities:
+            capacity.observe(2, {CAPACITY_HEADER: "10"})
+        assert committed.commit(2, 100, 4, "100-1")
+        # Массовый отказ админа пришел на чужой воркер
+        other.release_order("100-1")
+        await asyncio.sleep(0)
+        left = committed.remaining(2), other.remaining(2)
+        for capacity in capacities:
+            await capacity.stop()
+        return left
+
+    assert asyncio.run(scenario()) == (5, 5)
+
+
+def test_orders_are_rechecked_on_timer(tmp_path):
+    statuses = {"A1": PENDING_STATUS}
+
+    async def lookup(order_id):
+        return {"order_id": order_id, "status": statuses[order_id]}
+
+    async def scenario():
+        capacity = make_capacity(tmp_path, check_interval=0.01)
+        capacity.lookup = lookup
+        capacity.start()
+        capacity.observe(2, {CAPACITY_HEADER: "10"})
+        assert capacity.commit(2, 100, 3, "A1")
+        await asyncio.sleep(0.05)
+        before = capacity.remaining(2)
+        # Заказ отклонили на другом воркере - здесь release_order не вызывался
+        statuses["A1"] = REJECTED_STATUS
+        await asyncio.sleep(0.05)
+        after = capacity.remaining(2)
+        await capacity.stop()
+        return before, after
+
+    assert asyncio.run(scenario()) == (7, 10)
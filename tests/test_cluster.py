@@ -0,0 +1,66 @@
+from config.settings import ClusterConfig, Config, DbConfig, TgBot
+from services.cluster import HashRing, affinity_chat_id, partition_config
+
+
+def admin_callback(data: str) -> dict:
+    return {
+        "update_id": 1,
+        "callback_query": {
+            "id": "1",
+            "from": {"id": 999, "is_bot": False, "first_name": "Admin"},
+            "chat_instance": "admin",
+            "message": {"message_id": 5, "chat": {"id": 999, "type": "private"}},
+            "data": data,
+        },
+    }
+
+
+def test_ring_maps_chats_stably():
+    chats = range(-500, 2000)
+    ring = HashRing(4)
+    owners = [ring.owner(chat_id) for chat_id in chats]
+
+    # Другой процесс строит то же кольцо и получает то же распределение
+    assert owners == [HashRing(4).owner(chat_id) for chat_id in chats]
+    assert set(owners) == {0, 1, 2, 3}
+    # С новым воркером переезжает только часть чатов
+    grown = HashRing(5)
+    moved = sum(owner != grown.owner(chat_id) for chat_id, owner in zip(chats, owners))
+    assert moved < len(owners) * 0.4
+
+
+def test_admin_decision_is_routed_to_resident_chat():
+    assert affinity_chat_id(admin_callback("confirm_100500-42")) == 100500
+    assert affinity_chat_id(admin_callback("reject_-100123-7")) == -100123
+    # Прочие кнопки админа остаются в его чате
+    assert affinity_chat_id(admin_callback("bulk:confirm:3")) == 999
+    assert affinity_chat_id(admin_callback("confirm_broken")) == 999
+    message = {
+        "update_id": 2,
+        "message": {
+            "message_id": 1,
+            "chat": {"id": 100500, "type": "private"},
+            "from": {"id": 100500, "is_bot": False, "first_name": "Resident"},
+        },
+    }
+    assert affinity_chat_id(message) == 100500
+
+
+def test_partition_config_splits_shared_limits():
+    config = Config(
+        tg_bot=TgBot(token="1:TOKEN", admin_ids=[999], broadcast_rate=30.0),
+        db=DbConfig(creds_file="", read_quota=60.0, write_quota=40.0),
+        cluster=ClusterConfig(workers=4),
+    )
+
+    worker = partition_config(config, 2)
+
+    assert worker.db.read_quota == 15.0
+    assert worker.db.write_quota == 10.0
+    assert worker.tg_bot.broadcast_rate == 7.5
+    assert (worker.db.capacity_shard, worker.db.capacity_shards) == (2, 4)
+    assert worker.db.archive_interval == 0
+    assert worker.db.journal_file == "data/writes.w2.journal"
+    assert worker.db.capacity_state == "data/capacity.w2.json"
+    # Общая конфигурация не меняется
+    assert config.db.read_quota == 60.0
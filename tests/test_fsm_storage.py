@@ -0,0 +1,42 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from services.storage import SqliteFSMStorage
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def count_rows(storage: SqliteFSMStorage) -> int:
+    return storage._db.execute("SELECT COUNT(*) FROM fsm").fetchone()[0]
+
+
+def test_abandoned_state_expires_and_is_evicted(tmp_path):
+    path = str(tmp_path / "fsm.db")
+
+    async def scenario():
+        storage = SqliteFSMStorage(path, ttl=0.3, evict_interval=0.05)
+        storage.start()
+        await storage.set_state(key(1), "ReserveStates:waiting_for_amount")
+        await storage.set_data(key(1), {"announcement_id": 2})
+        await asyncio.sleep(0.2)
+        await storage.set_state(key(2), "ReserveStates:waiting_for_room")
+        await asyncio.sleep(0.2)
+        # Первый сценарий брошен: при чтении его нет, а фоновая очистка
+        # удалила его из базы
+        expired = await storage.get_state(key(1)), await storage.get_data(key(1))
+        rows = count_rows(storage)
+        await storage.close()
+        return expired, rows
+
+    async def restart():
+        storage = SqliteFSMStorage(path, ttl=3600)
+        state = await storage.get_state(key(2))
+        await storage.close()
+        return state
+
+    assert asyncio.run(scenario()) == ((None, {}), 1)
+    # Живой сценарий переживает перезапуск
+    assert asyncio.run(restart()) == "ReserveStates:waiting_for_room"
@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS
+from services.kitchen import KitchenManifest
+
+
+def order(order_id: str, portions: int, status: str = PENDING_STATUS) -> dict:
+    return {
+        "order_id": order_id,
+        "dish_name": "Плов",
+        "room": "804a",
+        "portions": portions,
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "status": status,
+    }
+
+
+def test_order_changed_during_reconcile_keeps_new_state():
+    # Хранилище отдает снимок, снятый до изменений
+    snapshot = [order("A", 2), order("B", 3)]
+
+    async def scenario():
+        reading = asyncio.Event()
+        proceed = asyncio.Event()
+        slow = False
+
+        async def fetch(since):
+            if slow:
+                reading.set()
+                await proceed.wait()
+            return [dict(row) for row in snapshot]
+
+        manifest = KitchenManifest(fetch)
+        await manifest.ensure_loaded()
+
+        slow = True
+        reconcile = asyncio.create_task(manifest.reconcile())
+        await reading.wait()
+        # Пока идет чтение, админ подтверждает A, а житель оформляет C
+        manifest.set_status("A", CONFIRMED_STATUS)
+        manifest.add("C", "Плов", "805b", 1, order("C", 1)["date"])
+        proceed.set()
+        await reconcile
+        return manifest.summary()
+
+    (dish,) = asyncio.run(scenario())
+    assert dish.confirmed == 2
+    assert dish.pending == 3 + 1
+    assert dish.rooms == {"804a": 2}
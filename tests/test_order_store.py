@@ -0,0 +1,146 @@
+import asyncio
+
+from benchmarks.fake_sheets import FakeSpreadsheet
+from services.api_client import (
+    CONFIRMED_STATUS,
+    PENDING_STATUS,
+    GoogleSheetsClient,
+)
+from services.async_client import AsyncSheetsClient
+from services.order_store import OrderStore
+from services.write_buffer import WriteBuffer
+
+
+def test_status_follows_order_after_rows_shift(tmp_path):
+    spreadsheet = FakeSpreadsheet()
+
+    async def scenario():
+        sheets = AsyncSheetsClient(GoogleSheetsClient("", spreadsheet=spreadsheet))
+        writes = WriteBuffer(sheets, str(tmp_path / "writes.jsonl"), flush_interval=60)
+        await writes.start()
+        store = OrderStore(sheets, writes)
+        for index in range(3):
+            await store.add_order(
+                user_id=100 + index,
+                username="-",
+                room="804a",
+                portions=1,
+                dt="2024-05-20 12:00:00",
+                dish_name="Плов",
+                order_id=f"order-{index}",
+            )
+        await writes.flush()
+        await store.ensure_loaded()
+
+        # Другой воркер перенес первый заказ в архив: строки сдвинулись,
+        # а индекс строк этого процесса об этом не знает
+        del spreadsheet.worksheet("Orders").rows[1]
+
+        assert await store.update_status("order-2", CONFIRMED_STATUS)
+        await writes.stop()
+        await sheets.close()
+
+    asyncio.run(scenario())
+    statuses = {row[6]: row[7] for row in spreadsheet.worksheet("Orders").rows[1:]}
+    assert statuses == {"order-1": PENDING_STATUS, "order-2": CONFIRMED_STATUS}
+
+
+def test_bulk_decision_skips_order_canceled_while_waiting(tmp_path):
+    spreadsheet = FakeSpreadsheet()
+
+    async def scenario():
+        sheets = AsyncSheetsClient(GoogleSheetsClient("", spreadsheet=spreadsheet))
+        store = OrderStore(sheets)
+        for index in range(2):
+            await store.add_order(
+                user_id=100 + index,
+                username="-",
+                room="804a",
+                portions=1,
+                dt="2024-05-20 12:00:00",
+                dish_name="Плов",
+                order_id=f"order-{index}",
+            )
+        await store.ensure_loaded()
+
+        # Пока решение админа ждет блокировку, житель отменяет заказ
+        async with store._archive_lock:
+            resolve = asyncio.create_task(
+                store.update_statuses(
+                    ["order-0", "order-1"], CONFIRMED_STATUS, only_pending=True
+                )
+            )
+            await asyncio.sleep(0)
+            cancel = asyncio.create_task(
+                store.update_status("order-0", "Отменен пользователем")
+            )
+            await asyncio.sleep(0)
+        updated, _ = await asyncio.gather(resolve, cancel)
+        await sheets.close()
+        return updated
+
+    assert asyncio.run(scenario()) == ["order-1"]
+    statuses = {row[6]: row[7] for row in spreadsheet.worksheet("Orders").rows[1:]}
+    assert statuses == {
+        "order-0": "Отменен пользователем",
+        "order-1": CONFIRMED_STATUS,
+    }
+
+
+def test_unknown_orders_do_not_reload_index_each_time():
+    spreadsheet = FakeSpreadsheet()
+
+    async def scenario():
+        sheets = AsyncSheetsClient(GoogleSheetsClient("", spreadsheet=spreadsheet))
+        store = OrderStore(sheets, reload_interval=60)
+        await store.ensure_loaded()
+        spreadsheet.calls.clear()
+        for index in range(5):
+            assert await store.get_order(f"missing-{index}") is None
+            assert not await store.update_status(f"missing-{index}", CONFIRMED_STATUS)
+        await sheets.close()
+
+    asyncio.run(scenario())
+    assert spreadsheet.calls[("Orders", "batch_get")] == 0
+
+
+def test_status_write_checks_only_indexed_row(tmp_path):
+    spreadsheet = FakeSpreadsheet()
+
+    async def scenario():
+        sheets = AsyncSheetsClient(GoogleSheetsClient("", spreadsheet=spreadsheet))
+        writes = WriteBuffer(sheets, str(tmp_path / "writes.jsonl"), flush_interval=60)
+        await writes.start()
+        store = OrderStore(sheets, writes)
+        for index in range(3):
+            await store.add_order(
+                user_id=100 + index,
+                username="-",
+                room="804a",
+                portions=1,
+                dt="2024-05-20 12:00:00",
+                dish_name="Плов",
+                order_id=f"order-{index}",
+            )
+        await writes.flush()
+        await store.ensure_loaded()
+        spreadsheet.calls.clear()
+
+        assert await store.update_status("order-1", CONFIRMED_STATUS)
+        assert await store.update_statuses(["order-2"], CONFIRMED_STATUS) == [
+            "order-2"
+        ]
+        await writes.flush()
+        await writes.stop()
+        await sheets.close()
+
+    asyncio.run(scenario())
+    # Столбец ID не читается: проверяются только ячейки ключей в строках индекса
+    assert spreadsheet.calls[("Orders", "col_values")] == 0
+    assert spreadsheet.calls[("Orders", "batch_get")] == 1
+    statuses = {row[6]: row[7] for row in spreadsheet.worksheet("Orders").rows[1:]}
+    assert statuses == {
+        "order-0": PENDING_STATUS,
+        "order-1": CONFIRMED_STATUS,
+        "order-2": CONFIRMED_STATUS,
+    }
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+
+from services.api_client import (
+    PRIORITY_ADMIN,
+    PRIORITY_BACKGROUND,
+    PRIORITY_ORDER,
+    QuotaGovernor,
+)
+
+
+def api_error(status: int) -> APIError:
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status}}).encode()
+    return APIError(response)
+
+
+def failing_call(statuses):
+    """Вызов, который падает с ошибками statuses, затем отвечает ok"""
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) <= len(statuses):
+            raise api_error(statuses[len(calls) - 1])
+        return "ok"
+
+    return call, calls
+
+
+def test_cost_above_capacity_does_not_block():
+    async def scenario():
+        governor = QuotaGovernor(read_per_minute=6, write_per_minute=6)
+        await asyncio.wait_for(governor.acquire("read", PRIORITY_ADMIN, 6), 1)
+        # Следующий вызов ждет пополнения, а не вечно
+        waiter = asyncio.ensure_future(governor.acquire("read", PRIORITY_ORDER, 1))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("quota", [0, -1])
+def test_quota_must_be_positive(quota):
+    with pytest.raises(ValueError):
+        QuotaGovernor(read_per_minute=quota)
+
+
+def test_reserve_must_leave_room():
+    with pytest.raises(ValueError):
+        QuotaGovernor(reserve=1)
+
+
+def test_higher_priority_is_served_first():
+    async def scenario():
+        # 100 токенов в секунду
+        governor = QuotaGovernor(read_per_minute=6000, write_per_minute=6000)
+        await governor.acquire("read", PRIORITY_ORDER, 6000)
+        background = asyncio.ensure_future(
+            governor.acquire("read", PRIORITY_BACKGROUND, 1)
+        )
+        await asyncio.sleep(0)
+        order = asyncio.ensure_future(governor.acquire("read", PRIORITY_ORDER, 1))
+        await asyncio.wait_for(order, 1)
+        # Фоновой работе нужен еще и запас reserve - она продолжает ждать
+        assert not background.done()
+        background.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_releases_queue():
+    async def scenario():
+        governor = QuotaGovernor(read_per_minute=6000, write_per_minute=6000)
+        await governor.acquire("read", PRIORITY_ORDER, 6000)
+        first = asyncio.ensure_future(governor.acquire("read", PRIORITY_ORDER, 50))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(governor.acquire("read", PRIORITY_ORDER, 1))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+
+    asyncio.run(scenario())
+
+
+def test_server_error_is_not_retried_for_non_idempotent_call():
+    async def scenario():
+        governor = QuotaGovernor(6000, 6000, base_delay=0, max_delay=0)
+        call, calls = failing_call([500])
+        with pytest.raises(APIError):
+            await governor.call(
+                call, writes=1, priority=PRIORITY_ORDER, idempotent=False
+            )
+        assert len(calls) == 1
+
+        call, calls = failing_call([429, 500])
+        with pytest.raises(APIError):
+            await governor.call(
+                call, writes=1, priority=PRIORITY_ORDER, idempotent=False
+            )
+        assert len(calls) == 2
+
+        call, calls = failing_call([500, 503])
+        assert await governor.call(call, reads=1, priority=PRIORITY_ORDER) == "ok"
+        assert len(calls) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from services.api_client import CONFIRMED_STATUS, PENDING_STATUS, REJECTED_STATUS
+from services.storage import SqliteRepository
+
+
+class FakeMirror:
+    """Таблица: запоминает перенесенные операции, ensure_user для broken падает"""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.applied = []
+        self.users = []
+        self.orders = []
+
+    async def ensure_user(self, user_id, language):
+        if user_id in self.broken:
+            raise ValueError("Malformed row")
+        self.applied.append(("ensure_user", user_id))
+
+    async def set_language(self, user_id, language):
+        self.applied.append(("set_language", user_id))
+
+    async def export_users(self):
+        return self.users
+
+    async def export_orders(self):
+        return self.orders
+
+
+def order(order_id, status):
+    return {
+        "order_id": order_id,
+        "user_id": "100",
+        "username": "-",
+        "room": "101",
+        "portions": "1",
+        "date": "2026-01-01 12:00:00",
+        "dish_name": "Суп",
+        "status": status,
+    }
+
+
+async def open_repository(tmp_path, mirror):
+    # Без mirror при запуске фоновые задачи не стартуют - outbox разбирает тест
+    repo = SqliteRepository(str(tmp_path / "bot.db"), max_attempts=3)
+    await repo.start()
+    repo.mirror = mirror
+    return repo
+
+
+def test_failing_outbox_operation_is_parked(tmp_path):
+    async def scenario():
+        mirror = FakeMirror(broken={1})
+        repo = await open_repository(tmp_path, mirror)
+        await repo.ensure_user(1)
+        await repo.set_language(2, "en")
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await repo._drain_outbox()
+        assert mirror.applied == []
+        await repo._drain_outbox()
+        parked = repo._db.execute("SELECT op FROM outbox_parked").fetchall()
+        return mirror.applied, [row["op"] for row in parked]
+
+    applied, parked = asyncio.run(scenario())
+    assert applied == [("set_language", 2)]
+    assert parked == ["ensure_user"]
+
+
+def test_network_errors_do_not_park(tmp_path):
+    async def scenario():
+        mirror = FakeMirror()
+
+        async def unavailable(user_id, language):
+            raise asyncio.TimeoutError()
+
+        mirror.ensure_user = unavailable
+        repo = await open_repository(tmp_path, mirror)
+        await repo.ensure_user(1)
+        for _ in range(5):
+            with pytest.raises(asyncio.TimeoutError):
+                await repo._drain_outbox()
+        return repo._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_import_adds_new_rows_and_statuses(tmp_path):
+    async def scenario():
+        mirror = FakeMirror()
+        repo = await open_repository(tmp_path, mirror)
+        mirror.users = [{"user_id": 7, "language": "en"}]
+        mirror.orders = [order("A1", PENDING_STATUS)]
+        await repo._import_from_mirror()
+        # Статус поменяли в таблице, и появился новый заказ
+        mirror.orders = [order("A1", CONFIRMED_STATUS), order("A2", PENDING_STATUS)]
+        await repo._import_from_mirror()
+        first = (await repo.get_order("A1"))["status"]
+        # Локальное изменение еще не перенесено - снимок таблицы его не затирает
+        await repo.update_order_status("A2", REJECTED_STATUS)
+        await repo._import_from_mirror()
+        second = (await repo.get_order("A2"))["status"]
+        return await repo.list_user_ids(), first, second
+
+    users, first, second = asyncio.run(scenario())
+    assert users == [7]
+    assert first == CONFIRMED_STATUS
+    assert second == REJECTED_STATUS
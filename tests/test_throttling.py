@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from middlewares.throttling import ThrottlingMiddleware
+from utils.formatters import CATALOG
+
+USER = User(id=100, is_bot=False, first_name="Resident")
+
+
+class _Message(Message):
+    def answer(self, text, **kwargs):
+        self.__dict__.setdefault("answers", []).append(text)
+        return asyncio.sleep(0)
+
+
+class _Callback(CallbackQuery):
+    def answer(self, text=None, **kwargs):
+        self.__dict__.setdefault("answers", []).append(text)
+        return asyncio.sleep(0)
+
+
+def make_message(text: str = "1") -> _Message:
+    return _Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=USER.id, type="private"),
+        from_user=USER,
+        text=text,
+    )
+
+
+def make_callback(data: str) -> _Callback:
+    return _Callback(id="1", from_user=USER, chat_instance="chat", data=data)
+
+
+def test_burst_is_rejected_with_one_warning():
+    async def language(user_id):
+        return "en"
+
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def scenario():
+        throttling = ThrottlingMiddleware(rate=0.01, burst=3, language=language)
+        messages = [make_message() for _ in range(6)]
+        for message in messages:
+            await throttling(handler, message, {"event_from_user": USER})
+        return [text for m in messages for text in m.__dict__.get("answers", [])]
+
+    answers = asyncio.run(scenario())
+    assert len(handled) == 3
+    assert answers == [CATALOG.get("en")("throttled_message")]
+
+
+def test_duplicate_callback_is_dropped_while_first_is_in_flight():
+    handled = []
+
+    async def scenario():
+        done = asyncio.Event()
+
+        async def handler(event, data):
+            handled.append(event.data)
+            await done.wait()
+
+        throttling = ThrottlingMiddleware(rate=1.0, burst=5)
+        first = asyncio.create_task(
+            throttling(handler, make_callback("confirm_1-1"), {"event_from_user": USER})
+        )
+        await asyncio.sleep(0)
+        duplicate = make_callback("confirm_1-1")
+        await throttling(handler, duplicate, {"event_from_user": USER})
+        done.set()
+        await first
+        # После обработки первого нажатия кнопка снова доступна
+        await throttling(
+            handler, make_callback("confirm_1-1"), {"event_from_user": USER}
+        )
+        return duplicate.__dict__.get("answers")
+
+    assert asyncio.run(scenario()) == [None]
+    assert handled == ["confirm_1-1", "confirm_1-1"]
+
+
+def test_bucket_refills_over_time():
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def scenario():
+        throttling = ThrottlingMiddleware(rate=20.0, burst=1)
+        await throttling(handler, make_message(), {"event_from_user": USER})
+        await throttling(handler, make_message(), {"event_from_user": USER})
+        rejected = len(handled)
+        await asyncio.sleep(0.1)
+        await throttling(handler, make_message(), {"event_from_user": USER})
+        return rejected
+
+    assert asyncio.run(scenario()) == 1
+    assert len(handled) == 2
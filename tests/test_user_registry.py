@@ -0,0 +1,76 @@
+import asyncio
+
+from services.user_registry import UserRegistry
+
+
+class SlowUsers:
+    """Лист Users, в который строка добавляется за delay секунд"""
+
+    def __init__(self, delay=0.05, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.rows = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_user_rows(self):
+        return [(index, user_id, "ru") for index, user_id in enumerate(self.rows, 2)]
+
+    async def append_user(self, user_id, language):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise TimeoutError()
+            self.rows.append(user_id)
+            return len(self.rows) + 1
+        finally:
+            self.in_flight -= 1
+
+    async def set_user_language_at(self, row_index, language):
+        pass
+
+
+def test_different_users_are_added_concurrently():
+    async def scenario():
+        sheets = SlowUsers()
+        registry = UserRegistry(sheets)
+        created = await asyncio.gather(*(registry.ensure_user(i) for i in range(5)))
+        return sheets, created
+
+    sheets, created = asyncio.run(scenario())
+    assert created == [True] * 5
+    assert sheets.max_in_flight == 5
+
+
+def test_same_user_is_added_once():
+    async def scenario():
+        sheets = SlowUsers()
+        registry = UserRegistry(sheets)
+        created = await asyncio.gather(
+            registry.ensure_user(1),
+            registry.ensure_user(1),
+            registry.set_language(1, "ru"),
+        )
+        return sheets.rows, created
+
+    rows, created = asyncio.run(scenario())
+    assert rows == [1]
+    assert created[:2] == [True, False]
+
+
+def test_waiter_retries_after_failed_add():
+    async def scenario():
+        sheets = SlowUsers(failures=1)
+        registry = UserRegistry(sheets)
+        first, second = await asyncio.gather(
+            registry.ensure_user(1), registry.ensure_user(1), return_exceptions=True
+        )
+        return sheets.rows, first, second
+
+    rows, first, second = asyncio.run(scenario())
+    assert isinstance(first, TimeoutError)
+    assert second is True
+    assert rows == [1]
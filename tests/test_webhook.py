@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+
+from config.settings import WebhookConfig
+from services.webhook import check_webhook_config, run_webhook
+
+
+def test_public_webhook_requires_secret():
+    config = WebhookConfig(mode="webhook", url="https://bot.example.com")
+    with pytest.raises(ValueError):
+        # Сервер не поднимается: проверка идет до запуска
+        asyncio.run(run_webhook(None, None, config))
+
+
+def test_local_webhook_without_secret_is_allowed():
+    check_webhook_config(WebhookConfig(mode="webhook"))
+    check_webhook_config(
+        WebhookConfig(mode="webhook", url="https://bot.example.com", secret="s")
+    )
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from services.write_buffer import WriteBuffer
+
+
+class FakeSheets:
+    """Запоминает записи; append_rows в листы из failing падает"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.cells = []
+        self.appends = []
+
+    async def append_rows(self, sheet, rows):
+        if sheet in self.failing:
+            raise RuntimeError("Sheets unavailable")
+        self.appends.append((sheet, rows))
+        return 2
+
+    async def update_cells(self, sheet, cells):
+        self.cells.append((sheet, cells))
+
+
+def crash(buffer: WriteBuffer):
+    """Бросить буфер как при падении процесса: без stop и сброса"""
+    buffer._task.cancel()
+    buffer._journal.close()
+
+
+def test_replay_skips_cell_value_replaced_before_flush(tmp_path):
+    journal = str(tmp_path / "writes.jsonl")
+
+    async def first_run():
+        buffer = WriteBuffer(FakeSheets(failing={"Users"}), journal)
+        await buffer.start()
+        await buffer.update_cell("Orders", 5, 9, "Ожидает подтверждения")
+        await buffer.update_cell("Orders", 5, 9, "Подтвержден")
+        # Зависшая запись в другой лист не дает обнулить журнал
+        await buffer.append("Users", [1, "ru"])
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        crash(buffer)
+
+    async def second_run():
+        sheets = FakeSheets()
+        buffer = WriteBuffer(sheets, journal)
+        await buffer.start()
+        await buffer.stop()
+        return sheets
+
+    asyncio.run(first_run())
+    sheets = asyncio.run(second_run())
+    assert sheets.cells == []
+    assert sheets.appends == [("Users", [[1, "ru"]])]
+
+
+def test_replay_writes_only_latest_value_and_forgets_older(tmp_path):
+    journal = str(tmp_path / "writes.jsonl")
+
+    async def crashed_before_flush():
+        buffer = WriteBuffer(FakeSheets(), journal, flush_interval=60)
+        await buffer.start()
+        await buffer.update_cell("Orders", 5, 9, "Ожидает подтверждения")
+        await buffer.update_cell("Orders", 5, 9, "Подтвержден")
+        crash(buffer)
+
+    async def replay_then_crash():
+        sheets = FakeSheets(failing={"Users"})
+        buffer = WriteBuffer(sheets, journal, flush_interval=60)
+        await buffer.start()
+        await buffer.append("Users", [1, "ru"])
+        with pytest.raises(RuntimeError):
+            await buffer.flush()
+        crash(buffer)
+        return sheets
+
+    async def last_run():
+        sheets = FakeSheets()
+        buffer = WriteBuffer(sheets, journal)
+        await buffer.start()
+        await buffer.stop()
+        return sheets
+
+    asyncio.run(crashed_before_flush())
+    replayed = asyncio.run(replay_then_crash())
+    assert replayed.cells == [("Orders", [(5, 9, "Подтвержден")])]
+    assert asyncio.run(last_run()).cells == []
+
+
+class LossyOrders:
+    """Лист Orders, у которого первый append_rows записывает строки,
+    но отвечает ошибкой (ответ потерялся по таймауту)"""
+
+    def __init__(self):
+        self.rows = [["header"]]
+        self.lost = 1
+
+    async def get_column_values(self, sheet, col):
+        return [str(row[col - 1]) if len(row) >= col else "" for row in self.rows]
+
+    async def append_rows(self, sheet, rows):
+        first_row = len(self.rows) + 1
+        self.rows.extend(rows)
+        if self.lost:
+            self.lost -= 1
+            raise asyncio.TimeoutError()
+        return first_row
+
+
+def test_append_is_not_repeated_after_ambiguous_failure(tmp_path):
+    order = ["1", "user", "101", 1, "2026-01-01 12:00", "Суп", "A1", "pending"]
+    other = ["2", "user", "102", 1, "2026-01-01 12:01", "Суп", "A2", "pending"]
+
+    async def scenario():
+        sheets = LossyOrders()
+        buffer = WriteBuffer(sheets, str(tmp_path / "writes.jsonl"), flush_interval=60)
+        await buffer.start()
+        first = await buffer.append("Orders", order)
+        with pytest.raises(asyncio.TimeoutError):
+            await buffer.flush()
+        second = await buffer.append("Orders", other)
+        await buffer.stop()
+        return sheets.rows, first.result(), second.result()
+
+    rows, first_row, second_row = asyncio.run(scenario())
+    assert rows == [["header"], order, other]
+    assert (first_row, second_row) == (2, 3)
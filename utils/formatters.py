@@ -0,0 +1,568 @@
+from html import escape
+from string import Formatter
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+from services.kitchen import DishSummary
+
+# Ограничение Telegram на длину текста сообщения
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+DEFAULT_LANGUAGE = "ru"
+
+# Сообщения бота по языкам. Ключ, которого нет в языке, берется из
+# DEFAULT_LANGUAGE; подстановки в переводе должны совпадать с ним.
+MESSAGES: Dict[str, Dict[str, str]] = {
+    "ru": {
+        "start": (
+            "Привет! Я бот для управления анонсами блюд.\n"
+            "Текущий язык: {language}\n"
+            "Используйте /language для смены языка."
+        ),
+        "choose_language": "Выберите язык / Choose language:",
+        "language_changed": "Язык успешно изменен!",
+        "no_access": "Нет доступа.",
+        "help": (
+            "🤖 *Dormitory Gourmet Bot*\n\n"
+            "Этот бот помогает организовать заказы еды в общежитии.\n\n"
+            "*Доступные команды:*\n"
+            "• /start - Начать работу с ботом\n"
+            "• /language - Изменить язык бота\n"
+            "• /cancel - Отменить последний заказ\n"
+            "• /help - Показать это сообщение\n\n"
+            "*Как пользоваться ботом:*\n"
+            "1. Дождитесь анонса блюда от администратора\n"
+            "2. Нажмите кнопку 'Забронировать'\n"
+            "3. Укажите количество порций\n"
+            "4. Укажите ваш блок\n"
+            "5. Оплатите заказ и отправьте скриншот чека\n"
+            "6. Дождитесь подтверждения от администратора\n\n"
+            "Если у вас возникли вопросы, обратитесь к администратору."
+        ),
+        # Анонсы
+        "announcement": (
+            "🍽 *{dish_name}*\n\n"
+            "{description}\n\n"
+            "💰 Цена: {price}\n"
+            "⏰ Время: {time}"
+        ),
+        "digest_header": "📋 *Меню*\n\n",
+        "nofood": (
+            "⚠️ *Важное объявление*\n\n"
+            "Сегодня еды не будет.\n"
+            "Приносим извинения за неудобства."
+        ),
+        "reserve_button": "Забронировать",
+        "reserve_dish_button": "Забронировать: {dish_name}",
+        "sold_out_button": "🚫 Распродано",
+        "sold_out_dish_button": "🚫 Распродано: {dish_name}",
+        "cancel_button": "❌ Отменить",
+        # Бронирование
+        "announcement_not_found": "Анонс не найден",
+        "sold_out": "😔 Все порции уже разобраны",
+        "ask_amount": (
+            "🍽 *{dish_name}*\n\n"
+            "💰 Цена за порцию: {price}\n\n"
+            "Пожалуйста, введите количество порций:"
+        ),
+        "invalid_amount": (
+            "Пожалуйста, введите корректное количество порций "
+            "(целое положительное число):"
+        ),
+        "portions_left": (
+            "Осталось только {left} порц. Введите количество не больше {left}:"
+        ),
+        "ask_block": "Укажите ваш блок (например: 804a):",
+        "payment_details": (
+            "🍽 *{dish_name}*\n"
+            "Блок: {room}\n"
+            "Количество порций: {portions}\n"
+            "💰 Общая сумма: {total}\n\n"
+            "💳 Реквизиты для оплаты:\n"
+            "Тинькофф: +777777777777\n\n"
+            "Пожалуйста, переведите {total} рублей и отправьте скриншот чека:"
+        ),
+        "order_data_missing": (
+            "Ошибка: не все данные сохранены. Попробуйте начать бронирование заново."
+        ),
+        "paid_sold_out": (
+            "😔 Пока вы оформляли заказ, порции закончились. "
+            "Администраторы уведомлены и вернут оплату."
+        ),
+        "order_created": (
+            "✅ Заказ успешно создан!\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}\n\n"
+            "Спасибо за заказ! Мы проверим оплату и подтвердим ваш заказ."
+        ),
+        "reservation_canceled": "❌ Бронирование отменено.",
+        "error": "Произошла ошибка",
+        "reservation_error": (
+            "Произошла ошибка. Попробуйте начать бронирование заново."
+        ),
+        "order_error": (
+            "Произошла ошибка при обработке заказа. Пожалуйста, попробуйте позже."
+        ),
+        "cancel_error": "Произошла ошибка при отмене",
+        # Заказы
+        "order_not_found": "Заказ не найден",
+        "order_already_processed": "Заказ уже отменен жителем или обработан",
+        "order_confirmed": (
+            "✅ Ваш заказ подтвержден!\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}\n\n"
+            "Приятного аппетита! 🍽"
+        ),
+        "order_rejected": (
+            "❌ Ваш заказ был отменен администратором.\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}\n\n"
+            "Если у вас есть вопросы, пожалуйста, свяжитесь с администратором."
+        ),
+        "no_active_orders": "У вас нет активных заказов для отмены.",
+        "order_processed": "Этот заказ уже обработан и не может быть отменен.",
+        "order_canceled": (
+            "✅ Ваш последний заказ отменен:\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}\n\n"
+            "Администраторы уведомлены об отмене."
+        ),
+        # Подтверждение заказов списком (/confirm_all)
+        "pending_orders_header": "⏳ <b>Ожидают подтверждения: {title}</b> ({count})",
+        "pending_orders_all": "все блюда",
+        "pending_order_line": (
+            "• {dish_name}, блок {room}: {portions} порц. (@{username})"
+        ),
+        "bulk_confirm_button": "✅ Подтвердить все показанные ({count})",
+        "bulk_reject_button": "❌ Отклонить все показанные ({count})",
+        "bulk_no_pending": "Нет заказов, ожидающих подтверждения.",
+        "bulk_stale": "Список устарел, запросите /confirm_all заново",
+        "bulk_confirmed": "✅ Подтверждено заказов: {count}",
+        "bulk_rejected": "❌ Отклонено заказов: {count}",
+        "bulk_skipped": "Пропущено (уже обработаны или отменены): {count}",
+        "bulk_sending": "📨 Отправка уведомлений...",
+        "bulk_notified": "📨 Уведомлено жителей: {sent} из {total}",
+        "bulk_title": "Уведомления",
+        # Администратор
+        "menu_no_announcements": "Нет новых анонсов для отправки.",
+        "no_recipients": "Нет пользователей для рассылки.",
+        "broadcast_started": "📣 Рассылка запущена...",
+        "menu_title": "Рассылка",
+        "nofood_title": "Уведомление",
+        "nofood_sent": "✅ Уведомление отправлено {sent} пользователям из {total}",
+        "confirm_button": "✅ Подтвердить",
+        "reject_button": "❌ Отклонить",
+        "admin_new_order": (
+            "🆕 Новый заказ!\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "👤 Пользователь: {user_id} (@{username})\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}"
+        ),
+        "admin_paid_sold_out": (
+            "⚠️ Оплата без заказа: порции закончились\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "👤 Пользователь: {user_id} (@{username})\n"
+            "🍽 Количество порций: {portions}"
+        ),
+        "admin_order_rejected": (
+            "❌ Заказ отменен!\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "👤 Пользователь: {user_id} (@{username})\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}"
+        ),
+        "admin_order_canceled": (
+            "❌ Заказ отменен пользователем!\n\n"
+            "🍽 Блюдо: {dish_name}\n"
+            "👤 Пользователь: {user_id} (@{username})\n"
+            "🏢 Блок: {room}\n"
+            "🍽 Количество порций: {portions}\n"
+            "⏰ Время отмены: {time}"
+        ),
+        # Сводка для кухни (/summary)
+        "summary_bad_date": (
+            "Укажите дату в формате ГГГГ-ММ-ДД, например /summary 2024-05-20"
+        ),
+        "summary_retention": (
+            "Сводка хранится за последние {days} дн., начиная с {since}."
+        ),
+        "summary_header": "📋 <b>Сводка на {day}</b>",
+        "summary_empty": "Заказов нет.",
+        "summary_confirmed": "✅ Подтверждено: {count}",
+        "summary_pending": "⏳ Ожидает подтверждения: {count}",
+        "summary_delivery": "🏢 Доставка:",
+        # Ограничение частоты
+        "throttled_callback": "Слишком часто, подождите немного",
+        "throttled_message": "Слишком много сообщений, подождите немного.",
+    },
+    "en": {
+        "start": (
+            "Hi! I am the bot for dish announcements.\n"
+            "Current language: {language}\n"
+            "Use /language to change the language."
+        ),
+        "language_changed": "Language successfully changed!",
+        "no_access": "Access denied.",
+        "help": (
+            "🤖 *Dormitory Gourmet Bot*\n\n"
+            "This bot helps to organize food orders in the dormitory.\n\n"
+            "*Available commands:*\n"
+            "• /start - Start using the bot\n"
+            "• /language - Change the bot language\n"
+            "• /cancel - Cancel your last order\n"
+            "• /help - Show this message\n\n"
+            "*How to use the bot:*\n"
+            "1. Wait for a dish announcement from the administrator\n"
+            "2. Press the 'Reserve' button\n"
+            "3. Enter the number of portions\n"
+            "4. Enter your block\n"
+            "5. Pay for the order and send a screenshot of the receipt\n"
+            "6. Wait for the administrator to confirm the order\n\n"
+            "If you have any questions, contact the administrator."
+        ),
+        "announcement": (
+            "🍽 *{dish_name}*\n\n"
+            "{description}\n\n"
+            "💰 Price: {price}\n"
+            "⏰ Time: {time}"
+        ),
+        "digest_header": "📋 *Menu*\n\n",
+        "nofood": (
+            "⚠️ *Important announcement*\n\n"
+            "There will be no food today.\n"
+            "We apologize for the inconvenience."
+        ),
+        "reserve_button": "Reserve",
+        "reserve_dish_button": "Reserve: {dish_name}",
+        "sold_out_button": "🚫 Sold out",
+        "sold_out_dish_button": "🚫 Sold out: {dish_name}",
+        "cancel_button": "❌ Cancel",
+        "announcement_not_found": "Announcement not found",
+        "sold_out": "😔 All portions are already taken",
+        "ask_amount": (
+            "🍽 *{dish_name}*\n\n"
+            "💰 Price per portion: {price}\n\n"
+            "Please enter the number of portions:"
+        ),
+        "invalid_amount": (
+            "Please enter a valid number of portions (a positive integer):"
+        ),
+        "portions_left": (
+            "Only {left} portions left. Enter a number no greater than {left}:"
+        ),
+        "ask_block": "Enter your block (for example: 804a):",
+        "payment_details": (
+            "🍽 *{dish_name}*\n"
+            "Block: {room}\n"
+            "Portions: {portions}\n"
+            "💰 Total: {total}\n\n"
+            "💳 Payment details:\n"
+            "Tinkoff: +777777777777\n\n"
+            "Please transfer {total} rubles and send a screenshot of the receipt:"
+        ),
+        "order_data_missing": (
+            "Error: not all data was saved. Please start the reservation again."
+        ),
+        "paid_sold_out": (
+            "😔 The portions ran out while you were placing the order. "
+            "The administrators have been notified and will refund the payment."
+        ),
+        "order_created": (
+            "✅ Order created!\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}\n\n"
+            "Thank you! We will check the payment and confirm your order."
+        ),
+        "reservation_canceled": "❌ Reservation canceled.",
+        "error": "An error occurred",
+        "reservation_error": "An error occurred. Please start the reservation again.",
+        "order_error": (
+            "An error occurred while processing the order. Please try again later."
+        ),
+        "cancel_error": "An error occurred while canceling",
+        "order_not_found": "Order not found",
+        "order_already_processed": "The order was already canceled or processed",
+        "order_confirmed": (
+            "✅ Your order is confirmed!\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}\n\n"
+            "Enjoy your meal! 🍽"
+        ),
+        "order_rejected": (
+            "❌ Your order was canceled by the administrator.\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}\n\n"
+            "If you have any questions, please contact the administrator."
+        ),
+        "no_active_orders": "You have no active orders to cancel.",
+        "order_processed": (
+            "This order has already been processed and cannot be canceled."
+        ),
+        "order_canceled": (
+            "✅ Your last order is canceled:\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}\n\n"
+            "The administrators have been notified."
+        ),
+        "pending_orders_header": (
+            "⏳ <b>Waiting for confirmation: {title}</b> ({count})"
+        ),
+        "pending_orders_all": "all dishes",
+        "pending_order_line": (
+            "• {dish_name}, block {room}: {portions} portions (@{username})"
+        ),
+        "bulk_confirm_button": "✅ Confirm all shown ({count})",
+        "bulk_reject_button": "❌ Reject all shown ({count})",
+        "bulk_no_pending": "No orders are waiting for confirmation.",
+        "bulk_stale": "The list is outdated, request /confirm_all again",
+        "bulk_confirmed": "✅ Orders confirmed: {count}",
+        "bulk_rejected": "❌ Orders rejected: {count}",
+        "bulk_skipped": "Skipped (already processed or canceled): {count}",
+        "bulk_sending": "📨 Sending notifications...",
+        "bulk_notified": "📨 Residents notified: {sent} of {total}",
+        "bulk_title": "Notifications",
+        "menu_no_announcements": "No new announcements to send.",
+        "no_recipients": "No users to send to.",
+        "broadcast_started": "📣 Broadcast started...",
+        "menu_title": "Broadcast",
+        "nofood_title": "Notice",
+        "nofood_sent": "✅ Notice sent to {sent} of {total} users",
+        "confirm_button": "✅ Confirm",
+        "reject_button": "❌ Reject",
+        "admin_new_order": (
+            "🆕 New order!\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "👤 User: {user_id} (@{username})\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}"
+        ),
+        "admin_paid_sold_out": (
+            "⚠️ Payment without an order: portions ran out\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "👤 User: {user_id} (@{username})\n"
+            "🍽 Portions: {portions}"
+        ),
+        "admin_order_rejected": (
+            "❌ Order rejected!\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "👤 User: {user_id} (@{username})\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}"
+        ),
+        "admin_order_canceled": (
+            "❌ Order canceled by the user!\n\n"
+            "🍽 Dish: {dish_name}\n"
+            "👤 User: {user_id} (@{username})\n"
+            "🏢 Block: {room}\n"
+            "🍽 Portions: {portions}\n"
+            "⏰ Canceled at: {time}"
+        ),
+        "summary_bad_date": (
+            "Specify the date as YYYY-MM-DD, for example /summary 2024-05-20"
+        ),
+        "summary_retention": (
+            "The summary is kept for the last {days} days, starting from {since}."
+        ),
+        "summary_header": "📋 <b>Summary for {day}</b>",
+        "summary_empty": "No orders.",
+        "summary_confirmed": "✅ Confirmed: {count}",
+        "summary_pending": "⏳ Waiting for confirmation: {count}",
+        "summary_delivery": "🏢 Delivery:",
+        "throttled_callback": "Too fast, please wait a moment",
+        "throttled_message": "Too many messages, please wait a moment.",
+    },
+}
+
+
+def _fields(template: str) -> Set[str]:
+    return {field for _, field, _, _ in Formatter().parse(template) if field}
+
+
+class Translator:
+    """Сообщения одного языка: translator("key", **values) -> текст"""
+
+    __slots__ = ("language", "_templates")
+
+    def __init__(self, language: str, templates: Dict[str, Callable[..., str]]):
+        self.language = language
+        self._templates = templates
+
+    def __call__(self, key: str, **values: Any) -> str:
+        return self._templates[key](**values)
+
+
+class Catalog:
+    """Каталог сообщений, скомпилированный по языкам при загрузке.
+
+    Шаблоны разбираются и проверяются один раз: у каждого языка полный
+    набор ключей (недостающие - из языка по умолчанию) и те же подстановки,
+    что в языке по умолчанию. Дальше текст собирается одним вызовом
+    str.format без обращений к хранилищу.
+    """
+
+    def __init__(
+        self, messages: Dict[str, Dict[str, str]], default: str = DEFAULT_LANGUAGE
+    ):
+        self.default = default
+        base = messages[default]
+        self._translators: Dict[str, Translator] = {}
+        for language, templates in messages.items():
+            unknown = set(templates) - set(base)
+            if unknown:
+                raise ValueError(f"Unknown messages in {language}: {sorted(unknown)}")
+            compiled = {}
+            for key, fallback in base.items():
+                template = templates.get(key, fallback)
+                if _fields(template) != _fields(fallback):
+                    raise ValueError(f"Placeholders of {language}.{key} differ")
+                compiled[key] = template.format
+            self._translators[language] = Translator(language, compiled)
+
+    @property
+    def languages(self) -> Iterable[str]:
+        return self._translators.keys()
+
+    def get(self, language: str) -> Translator:
+        """Сообщения языка (неизвестный язык - язык по умолчанию)"""
+        return self._translators.get(language) or self._translators[self.default]
+
+
+CATALOG = Catalog(MESSAGES)
+
+
+def format_announcement(
+    announcement: Dict[str, Any], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Текст анонса одного блюда"""
+    return CATALOG.get(language)(
+        "announcement",
+        dish_name=announcement["Название блюда"],
+        description=announcement["Описание блюда"],
+        price=announcement["Цена"],
+        time=announcement["Время"],
+    )
+
+
+def format_digest(
+    announcements: List[Dict[str, Any]], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Один текст со всеми анонсами"""
+    return CATALOG.get(language)("digest_header") + DIGEST_SEPARATOR.join(
+        format_announcement(announcement, language) for announcement in announcements
+    )
+
+
+def split_digest(
+    announcements: List[Dict[str, Any]], language: str = DEFAULT_LANGUAGE
+) -> List[List[Dict[str, Any]]]:
+    """Разбить анонсы на группы, каждая из которых помещается в одно сообщение"""
+    header = len(CATALOG.get(language)("digest_header"))
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    length = header
+    for announcement in announcements:
+        size = len(format_announcement(announcement, language)) + len(DIGEST_SEPARATOR)
+        if current and length + size > MAX_MESSAGE_LENGTH:
+            chunks.append(current)
+            current = []
+            length = header
+        current.append(announcement)
+        length += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def format_kitchen_summary(
+    day: str, dishes: List[DishSummary], language: str = DEFAULT_LANGUAGE
+) -> List[str]:
+    """Сводка для кухни (HTML), разбитая на сообщения по MAX_MESSAGE_LENGTH"""
+    i18n = CATALOG.get(language)
+    header = i18n("summary_header", day=escape(day)) + "\n\n"
+    if not dishes:
+        return [header + i18n("summary_empty")]
+    blocks = []
+    for dish in dishes:
+        lines = [
+            f"🍽 <b>{escape(dish.dish_name)}</b>",
+            i18n("summary_confirmed", count=dish.confirmed),
+            i18n("summary_pending", count=dish.pending),
+        ]
+        if dish.rooms:
+            lines.append(i18n("summary_delivery"))
+            lines.extend(
+                f"  • {escape(room or '-')}: {portions}"
+                for room, portions in sorted(dish.rooms.items())
+            )
+        blocks.append("\n".join(lines))
+
+    messages = []
+    current = header
+    for block in blocks:
+        if current != header and len(current) + len(block) + 2 > MAX_MESSAGE_LENGTH:
+            messages.append(current.rstrip())
+            current = header
+        current += block + "\n\n"
+    messages.append(current.rstrip())
+    return messages
+
+
+def format_order_confirmed(
+    order: Dict[str, Any], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Уведомление жителю о подтверждении заказа"""
+    return CATALOG.get(language)(
+        "order_confirmed",
+        dish_name=order["dish_name"],
+        room=order["room"],
+        portions=order["portions"],
+    )
+
+
+def format_order_rejected(
+    order: Dict[str, Any], language: str = DEFAULT_LANGUAGE
+) -> str:
+    """Уведомление жителю об отмене заказа администратором"""
+    return CATALOG.get(language)(
+        "order_rejected",
+        dish_name=order["dish_name"],
+        room=order["room"],
+        portions=order["portions"],
+    )
+
+
+def format_pending_orders(
+    dish_name: str, orders: List[Dict[str, Any]], language: str = DEFAULT_LANGUAGE
+) -> List[str]:
+    """Список ожидающих заказов (HTML), разбитый на сообщения"""
+    i18n = CATALOG.get(language)
+    title = escape(dish_name) if dish_name else i18n("pending_orders_all")
+    header = i18n("pending_orders_header", title=title, count=len(orders)) + "\n\n"
+    lines = [
+        i18n(
+            "pending_order_line",
+            dish_name=escape(order["dish_name"]),
+            room=escape(order["room"] or "-"),
+            portions=order["portions"],
+            username=escape(order["username"] or "-"),
+        )
+        for order in orders
+    ]
+    messages = []
+    current = header
+    for line in lines:
+        if current != header and len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            messages.append(current.rstrip())
+            current = header
+        current += line + "\n"
+    messages.append(current.rstrip())
+    return messages
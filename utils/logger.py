@@ -0,0 +1,50 @@
+import json
+import logging
+from typing import Any, Dict
+
+# Атрибуты LogRecord, которые не считаются структурными полями
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """Поля, переданные через extra={...}"""
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Текстовый формат: сообщение и поля key=value в конце строки"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись - для сборщиков логов"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text"):
+    """Настроить корневой логгер: fmt - text или json"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
@@ -0,0 +1,205 @@
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+# Границы бакетов гистограмм задержек, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Счетчик с метками, в формате Prometheus"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        key = tuple(str(value) for value in label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(tuple(str(value) for value in label_values), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Значение, которое задается целиком"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *label_values: str):
+        key = tuple(str(label) for label in label_values)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Гистограмма задержек с метками, в формате Prometheus"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> (счетчики по бакетам, сумма, количество)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        key = tuple(str(label) for label in label_values)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def count(self, *label_values: str) -> int:
+        entry = self._values.get(tuple(str(value) for value in label_values))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labels: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+def instrument_methods(
+    latency: Histogram, errors: Counter, skip: Sequence[str] = ()
+) -> Callable[[type], type]:
+    """Декоратор класса: время, число вызовов и ошибки каждого публичного метода.
+
+    Учитывается только внешний вызов: методы, вызванные из другого метода
+    того же объекта в том же потоке, отдельно не считаются.
+    """
+    local = threading.local()
+
+    def wrap(name: str, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(local, "depth", 0):
+                return method(*args, **kwargs)
+            local.depth = 1
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                errors.inc(name, type(e).__name__)
+                raise
+            finally:
+                local.depth = 0
+                latency.observe(time.perf_counter() - started, name)
+
+        return wrapper
+
+    def decorate(cls: type) -> type:
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or name in skip or not callable(method):
+                continue
+            setattr(cls, name, wrap(name, method))
+        return cls
+
+    return decorate
+
+
+async def start_metrics_server(
+    host: str, port: int, registry: Optional[Registry] = None
+) -> web.AppRunner:
+    """Отдавать метрики по http://host:port/metrics"""
+    registry = registry or REGISTRY
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            text=registry.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    # Прометей опрашивает эндпоинт постоянно - без access-лога
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner